@@ -9,20 +9,31 @@ from framework.sessions import session
 
 from flask import request
 
+from . import timeseries
+
 
 collection = database['pagecounters']
 
+#: Collections holding the monthly buckets of daily counts; see `timeseries`
+PAGE_BUCKETS = 'pagecounterbuckets'
+USER_ACTIVITY_BUCKETS = 'useractivitycounterbuckets'
+
+
+def user_activity_series(user_id, action=None):
+    """Series key of a user's daily activity, optionally for a single action.
+    """
+    if action is None:
+        return user_id
+    return '{0}:{1}'.format(user_id, action)
+
 
 def increment_user_activity_counters(user_id, action, date, db=None):
     db = db or database  # default to local proxy
-    collection = database['useractivitycounters']
-    date = date.strftime('%Y/%m/%d')
+    collection = db['useractivitycounters']
     query = {
         '$inc': {
             'total': 1,
-            'date.{0}.total'.format(date): 1,
             'action.{0}.total'.format(action): 1,
-            'action.{0}.date.{1}'.format(action, date): 1,
         }
     }
     collection.update(
@@ -31,9 +42,29 @@ def increment_user_activity_counters(user_id, action, date, db=None):
         upsert=True,
         manipulate=False,
     )
+    buckets = db[USER_ACTIVITY_BUCKETS]
+    timeseries.increment(buckets, user_activity_series(user_id), date, {'total': 1})
+    timeseries.increment(buckets, user_activity_series(user_id, action), date, {'total': 1})
     return True
 
 
+def get_user_activity_by_date(user_id, start, end, action=None, db=None):
+    """Return daily activity counts of a user between `start` and `end`,
+    inclusive, as a list of `(date, total)` tuples.
+
+    :param str user_id: User primary key
+    :param start: First `date` of the range
+    :param end: Last `date` of the range
+    :param str action: Restrict counts to this action, e.g. `'project_created'`
+    """
+    db = db or database
+    series = user_activity_series(user_id, action)
+    return [
+        (day, total)
+        for day, _, total in timeseries.get_range(db[USER_ACTIVITY_BUCKETS], series, start, end)
+    ]
+
+
 def get_total_activity_count(user_id, db=None):
     db = db or database
     collection = database['useractivitycounters']
@@ -81,12 +112,13 @@ def update_counter(page, db=None):
     db = db or database
     collection = db['pagecounters']
 
-    date = datetime.utcnow()
-    date = date.strftime('%Y/%m/%d')
+    now = datetime.utcnow()
+    date = now.strftime('%Y/%m/%d')
 
     page = clean_page(page)
 
     d = {'$inc': {}}
+    daily = {'total': 1}
 
     visited_by_date = session.data.get('visited_by_date')
     if not visited_by_date:
@@ -94,18 +126,16 @@ def update_counter(page, db=None):
 
     if date == visited_by_date['date']:
         if page not in visited_by_date['pages']:
-            d['$inc']['date.%s.unique' % date] = 1
+            daily['unique'] = 1
             visited_by_date['pages'].append(page)
             session.data['visited_by_date'] = visited_by_date
     else:
         visited_by_date['date'] = date
         visited_by_date['pages'] = []
-        d['$inc']['date.%s.unique' % date] = 1
+        daily['unique'] = 1
         visited_by_date['pages'].append(page)
         session.data['visited_by_date'] = visited_by_date
 
-    d['$inc']['date.%s.total' % date] = 1
-
     visited = session.data.get('visited')  # '/project/x/, project/y/'
     if not visited:
         visited = []
@@ -115,6 +145,7 @@ def update_counter(page, db=None):
         session.data['visited'] = visited
     d['$inc']['total'] = 1
     collection.update({'_id': page}, d, True, False)
+    timeseries.increment(db[PAGE_BUCKETS], page, now, daily)
 
 
 def update_counters(rex, db=None):
@@ -141,7 +172,6 @@ def get_basic_counters(page, db=None):
     collection = db['pagecounters']
     unique = 0
     total = 0
-    collection = database['pagecounters']
     result = collection.find_one(
         {'_id': clean_page(page)},
         {'total': 1, 'unique': 1}
@@ -154,3 +184,30 @@ def get_basic_counters(page, db=None):
         return unique, total
     else:
         return None, None
+
+
+def get_total_counts(pages, db=None):
+    """Return the total counts of several pages in a single query.
+
+    :return dict: Counts keyed by page; pages never visited are omitted
+    """
+    db = db or database
+    collection = db['pagecounters']
+    keys = dict((clean_page(page), page) for page in pages)
+    return dict(
+        (keys[result['_id']], result.get('total', 0))
+        for result in collection.find({'_id': {'$in': list(keys)}}, {'total': 1})
+    )
+
+
+def get_counters_by_date(page, start, end, db=None):
+    """Return daily counters for a page between `start` and `end`, inclusive,
+    as a list of `(date, unique, total)` tuples. Reads only the monthly buckets
+    spanned by the range.
+
+    :param str page: Colon-delimited page key in analytics collection
+    :param start: First `date` of the range
+    :param end: Last `date` of the range
+    """
+    db = db or database
+    return timeseries.get_range(db[PAGE_BUCKETS], clean_page(page), start, end)
@@ -2,13 +2,35 @@
 
 import json
 import uuid
+import logging
+import datetime
 from hashlib import md5
 from urllib import urlencode
 
 import requests
+from modularodm import Q
+
+from framework.mongo import database
 
 from website import settings
 
+logger = logging.getLogger(__name__)
+
+# Nodes waiting for a sync, see `queue_node`
+QUEUE_COLLECTION = 'piwiksyncqueue'
+# Logins granted view access to each site by the OSF, by site ID
+ACCESS_COLLECTION = 'piwikaccess'
+
+#: Counters for this process, see `get_metrics`
+stats = {
+    'queued': 0,  # Saves that queued a sync
+    'coalesced': 0,  # Saves whose node was already queued
+    'synced': 0,  # Nodes synced
+    'failed': 0,  # Queued nodes that failed to sync and were queued again
+    'requests': 0,  # Requests sent to Piwik
+    'calls': 0,  # API calls made within bulk requests
+}
+
 
 class PiwikException(Exception):
     pass
@@ -43,145 +65,247 @@ def _create_user(user):
 
 
 def _update_node_object(node, updated_fields=None):
-    """ Given a node, provisions a Piwik site if necessary and sets
-    contributors to "view".
+    """ Given a node, provisions a Piwik site if necessary and syncs view
+    access right away; see ``sync_nodes``.
 
     :param node:            Instance of ``website.models.Node`` to update or
                             provision
-    :param updated_fields:  Iterator containing the names of fields that have
-                            been updated on the ``node``
+    :param updated_fields:  Ignored; access is diffed against the local
+                            mirror, which is cheap
     """
-    # If no site has been created for the node, create one.
-    if not node.piwik_site_id:
-        return _provision_node(node)
-
-    # If contributors have changed
-    if updated_fields is None or 'contributors' in updated_fields:
-        # Hit Piwik API to get a list of users with view access
-        users = _users_with_view_access(node)
-
-        # figure out what's changed
-        removed_users = users - set(('osf.' + x._id for x in node.contributors if x))
-        added_users = set(('osf.' + x._id for x in node.contributors if x)) - users
-
-        # Deal with changes appropriately
-        if removed_users:
-            _change_view_access(removed_users, node, 'noaccess')
-
-        if added_users:
-            _change_view_access(added_users, node, 'view')
-
-    # If public/private setting has changed
-    if updated_fields is None or 'is_public' in updated_fields:
-        _change_view_access(
-            users=('anonymous',),
-            node=node,
-            access='view' if node.is_public else 'noaccess'
-        )
+    if sync_nodes([node]):
+        raise PiwikException('Failed to sync Piwik site for {}'.format(node._id))
+
+
+def _api_request(method, **params):
+    data = {
+        'module': 'API',
+        'method': method,
+        'format': 'json',
+        'token_auth': settings.PIWIK_ADMIN_TOKEN,
+    }
+    data.update(params)
+    stats['requests'] += 1
+    response = requests.post(settings.PIWIK_HOST, data=data)
+    try:
+        return json.loads(response.content)
+    except ValueError:
+        raise PiwikException('Invalid response to {}'.format(method))
+
 
+def _bulk_request(calls):
+    """ Makes API `calls`, dicts of parameters including ``method``, with as
+    few ``API.getBulkRequest`` requests as ``PIWIK_BULK_SIZE`` allows.
 
-def _users_with_view_access(node):
-    """ Given a node, calls Piwik and returns the set of users with view access.
-    Filters out "anonymous".
+    :return list: The result of each call, in order
     """
-    response = requests.post(
-        url=settings.PIWIK_HOST,
-        data={
-            'module': 'API',
-            'method': 'UsersManager.getUsersWithSiteAccess',
-            'format': 'json',
-            'token_auth': settings.PIWIK_ADMIN_TOKEN,
-            'idSite': node.piwik_site_id,
-            'access': 'view',
+    results = []
+    for start in range(0, len(calls), settings.PIWIK_BULK_SIZE):
+        chunk = calls[start:start + settings.PIWIK_BULK_SIZE]
+        # Piwik takes the calls as query strings in PHP-style list params
+        params = {
+            'urls[{}]'.format(idx): urlencode(call)
+            for idx, call in enumerate(chunk)
         }
-    )
-
-    try:
-        # Could also raise ValueError
-        ret = json.loads(response.content)
-        return set((x.get('login') for x in ret if x.get('login') != 'anonymous'))
-    except (ValueError, AttributeError):
-        raise PiwikException('Failed to retrieve users for {}'.format(node._id))
-
+        stats['calls'] += len(chunk)
+        chunk_results = _api_request('API.getBulkRequest', **params)
+        if not isinstance(chunk_results, list) or len(chunk_results) != len(chunk):
+            raise PiwikException('Invalid response to API.getBulkRequest')
+        results.extend(chunk_results)
+    return results
+
+
+def _succeeded(result):
+    return isinstance(result, dict) and result.get('result') == 'success'
+
+
+def _add_site_call(node):
+    return {
+        'method': 'SitesManager.addSite',
+        'siteName': 'Node: ' + node._id,
+        'urls[0]': settings.CANONICAL_DOMAIN + node.url,
+        'urls[1]': settings.SHORT_DOMAIN + node.url,
+    }
+
+
+def _access_call(login, node, access):
+    return {
+        'method': 'UsersManager.setUserAccess',
+        'userLogin': login,
+        'access': access,
+        'idSites': node.piwik_site_id,
+    }
+
+
+def _wanted_users(node):
+    # contributors lists might contain `None` due to bug
+    users = set('osf.' + user._id for user in node.contributors if user)
+    if node.is_public:
+        users.add('anonymous')
+    return users
+
+
+def _provision_sites(nodes, failed):
+    results = _bulk_request([_add_site_call(node) for node in nodes])
+    provisioned = []
+    for node, result in zip(nodes, results):
+        try:
+            node.piwik_site_id = str(result['value'])
+        except (KeyError, TypeError):
+            logger.error('Piwik site creation failed for {}: {}'.format(node._id, result))
+            failed.add(node._id)
+            continue
+        node.save(update_piwik=False)
+        provisioned.append(node)
+    return provisioned
 
-def _change_view_access(users, node, access):
-    """ Grants view access for a Piwik site to a Piwik user
 
-    :param users:   Iterable of (string) user IDs
-    :param node:
+def _load_access(nodes, new_nodes, failed):
+    """ Returns the logins with view access to the sites of `nodes`, by site
+    ID, from the local mirror, and the IDs of the sites that aren't mirrored
+    yet; those are read from Piwik, in one bulk request.
     """
-    response = requests.post(
-        url=settings.PIWIK_HOST,
-        data=dict(
-            module='API',
-            method='API.getBulkRequest',
-            format='json',
-            token_auth=settings.PIWIK_ADMIN_TOKEN,
-            # The next line unpacks a dictionary, thereby adding the elements
-            #   as key/value pairs to the dict being built. They can't just be
-            #   passed as a list because Piwik uses PHP-style URL params.
-            **{  # OMG... WTF?
-                'urls[{}]'.format(idx): url  # PHP-style params :(
-                for idx, url in enumerate(
-                    (   # Innermost comprehension (generator) - iterates once
-                        #   for each user passed in, returns a URL query string.
-                        urlencode({
-                            'method': 'UsersManager.setUserAccess',
-                            'userLogin': u,
-                            'access': access,
-                            'idSites': node.piwik_site_id
-                        }) for u in users
-                    )
-                )
-            }
+    access = dict(
+        (record['_id'], set(record['users']))
+        for record in database[ACCESS_COLLECTION].find(
+            {'_id': {'$in': [node.piwik_site_id for node in nodes]}}
         )
     )
-
-    try:
-        # Could also raise ValueError
-        rv = json.loads(response.content)
-        for x in rv:
-            if x.get("result" != "success"):
-                raise ValueError()
-    except ValueError:
-        raise PiwikException(
-            'Failed to update Piwik user permissions for {}'.format(node._id)
+    # New sites start without access
+    for node in new_nodes:
+        access[node.piwik_site_id] = set()
+    unmirrored = [node for node in nodes if node.piwik_site_id not in access]
+    if unmirrored:
+        results = _bulk_request([
+            {
+                'method': 'UsersManager.getUsersWithSiteAccess',
+                'idSite': node.piwik_site_id,
+                'access': 'view',
+            }
+            for node in unmirrored
+        ])
+        for node, result in zip(unmirrored, results):
+            if not isinstance(result, list):
+                logger.error('Failed to retrieve users for {}: {}'.format(node._id, result))
+                failed.add(node._id)
+                continue
+            users = set(x.get('login') for x in result if x.get('login'))
+            # Piwik may not list anonymous access, so set it explicitly
+            users.discard('anonymous')
+            if not node.is_public:
+                users.add('anonymous')
+            access[node.piwik_site_id] = users
+    return access, set(node.piwik_site_id for node in unmirrored)
+
+
+def sync_nodes(nodes):
+    """ Provisions Piwik sites for `nodes` that don't have one, and grants view
+    access to their contributors, and to anonymous users if they are public.
+    Access is diffed against a local mirror of the access granted by the
+    OSF, so that the changes can be computed without reading from Piwik, and
+    the changes for all `nodes` are made in bulk requests.
+
+    :return set: IDs of the nodes that couldn't be fully synced
+    """
+    failed = set()
+    new_nodes = [node for node in nodes if not node.piwik_site_id]
+    if new_nodes:
+        new_nodes = _provision_sites(new_nodes, failed)
+    nodes = [node for node in nodes if node.piwik_site_id]
+    access, unmirrored = _load_access(nodes, new_nodes, failed)
+    nodes = [node for node in nodes if node._id not in failed]
+
+    calls, changes = [], []
+    for node in nodes:
+        current, wanted = access[node.piwik_site_id], _wanted_users(node)
+        for login in wanted - current:
+            calls.append(_access_call(login, node, 'view'))
+            changes.append((node, login, True))
+        for login in current - wanted:
+            calls.append(_access_call(login, node, 'noaccess'))
+            changes.append((node, login, False))
+    results = _bulk_request(calls) if calls else []
+
+    changed = unmirrored | set(node.piwik_site_id for node in new_nodes)
+    for (node, login, granted), result in zip(changes, results):
+        if not _succeeded(result):
+            logger.error('Failed to update Piwik access of {} for {}: {}'.format(login, node._id, result))
+            failed.add(node._id)
+            continue
+        if granted:
+            access[node.piwik_site_id].add(login)
+        else:
+            access[node.piwik_site_id].discard(login)
+        changed.add(node.piwik_site_id)
+
+    for site_id in changed & set(access):
+        database[ACCESS_COLLECTION].update(
+            {'_id': site_id},
+            {'$set': {'users': sorted(access[site_id])}},
+            upsert=True,
         )
 
+    stats['synced'] += len([node for node in nodes if node._id not in failed])
+    return failed
 
-def _provision_node(node):
-    response = requests.post(
-        settings.PIWIK_HOST,
-        data={
-            'module': 'API',
-            'token_auth': settings.PIWIK_ADMIN_TOKEN,
-            'format': 'json',
-            'method': 'SitesManager.addSite',
-            'siteName': 'Node: ' + node._id,
-            'urls': [
-                settings.CANONICAL_DOMAIN + node.url,
-                settings.SHORT_DOMAIN + node.url,
-            ],
-        }
+
+def queue_node(node_id):
+    """ Queues a sync of `node_id`. Saves made before the queued sync runs are
+    coalesced into it.
+    """
+    result = database[QUEUE_COLLECTION].update(
+        {'_id': node_id},
+        {'$setOnInsert': {'date_queued': datetime.datetime.utcnow()}},
+        upsert=True,
     )
+    if result and result.get('updatedExisting'):
+        stats['coalesced'] += 1
+    else:
+        stats['queued'] += 1
 
-    try:
-        node.piwik_site_id = json.loads(response.content)['value']
-        node.save(update_piwik=False)
-    except ValueError:
-        raise PiwikException('Piwik site creation failed for ' + node._id)
-
-    # contributors lists might be empty, due to a bug.
-    if node.contributors:
-        users = ['osf.' + user._id for user in node.contributors if user]
-        if node.is_public:
-            users.append('anonymous')
-        _change_view_access(
-            # contibutors lists might contain `None` due to bug
-            users,
-            node,
-            'view'
+
+def process_queue(window=None, limit=None):
+    """ Syncs the nodes that have been queued for at least `window`, by
+    default ``PIWIK_SYNC_WINDOW``, so that bursts of saves are synced once.
+    Nodes that fail to sync are queued again.
+
+    :return int: Number of nodes synced
+    """
+    # Avoid circular imports
+    from website.models import Node
+
+    window = settings.PIWIK_SYNC_WINDOW if window is None else window
+    queue = database[QUEUE_COLLECTION]
+    cutoff = datetime.datetime.utcnow() - window
+    node_ids = [
+        record['_id'] for record in
+        queue.find({'date_queued': {'$lte': cutoff}}, {'_id': True}).limit(
+            limit or settings.PIWIK_SYNC_BATCH_SIZE
         )
+    ]
+    if not node_ids:
+        return 0
+    # Dequeue before loading the nodes, so that later saves queue another sync
+    queue.remove({'_id': {'$in': node_ids}})
+    nodes = list(Node.find(Q('_id', 'in', node_ids)))
+    try:
+        failed = sync_nodes(nodes)
+    except (PiwikException, requests.exceptions.RequestException):
+        for node_id in node_ids:
+            queue_node(node_id)
+        raise
+    stats['failed'] += len(failed)
+    for node_id in failed:
+        queue_node(node_id)
+    return len(nodes) - len(failed)
+
+
+def get_metrics():
+    """ Returns the counters of this process and the number of queued nodes.
+    """
+    metrics = dict(stats)
+    metrics['queued_nodes'] = database[QUEUE_COLLECTION].count()
+    return metrics
 
 
 class PiwikClient(object):
@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import logging
+import datetime
+
 from framework.tasks import app
-from framework.tasks.handlers import queued_task
+from framework.tasks.handlers import enqueue_task, queued_task
 from framework.transactions.context import transaction
 
+from website import settings
+
 from . import piwik
 
+logger = logging.getLogger(__name__)
+
 
 @queued_task
 @app.task(bind=True, max_retries=5, default_retry_delay=60)
@@ -19,14 +26,19 @@ def update_user(self, user_id):
         raise self.retry(exc=error)
 
 
-@queued_task
-@app.task(bind=True, max_retries=5, default_retry_delay=60)
+def update_node(node_id):
+    """Queue a Piwik sync of `node_id`. Queued nodes are synced in batches by
+    `sync_queued_nodes`, which runs periodically, or at the end of the
+    request if Celery is disabled.
+    """
+    piwik.queue_node(node_id)
+    if not settings.USE_CELERY:
+        enqueue_task(sync_queued_nodes.si(immediate=True))
+
+
+@app.task(name='piwik.sync_queued_nodes')
 @transaction()
-def update_node(self, node_id, updated_fields=None):
-    # Avoid circular imports
-    from website import models
-    node = models.Node.load(node_id)
-    try:
-        piwik._update_node_object(node, updated_fields)
-    except Exception as error:
-        raise self.retry(exc=error)
+def sync_queued_nodes(immediate=False):
+    window = datetime.timedelta(0) if immediate else None
+    synced = piwik.process_queue(window=window)
+    logger.info('Synced {0} node(s) with Piwik; metrics: {1}'.format(synced, piwik.get_metrics()))
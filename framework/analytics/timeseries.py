@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Bucketed daily time series for the analytics collections.
+
+Each series (a page key, a user, or a user/action pair) is stored as one
+document per calendar month. A bucket holds fixed-size arrays of daily counts,
+so incrementing a day touches a single preallocated slot instead of growing
+the document with a new nested date key::
+
+    {
+        '_id': 'node:abc12:2015/10',
+        'series': 'node:abc12',
+        'month': '2015/10',
+        'total': [0, 3, 1, ...],   # 31 slots, one per day of the month
+        'unique': [0, 2, 1, ...],
+    }
+
+Buckets are addressed by ``_id``, so reading a date range is a single ``$in``
+query over the months it spans.
+"""
+
+import datetime
+
+from pymongo.errors import DuplicateKeyError
+
+
+MONTH_FORMAT = '%Y/%m'
+DAYS_PER_BUCKET = 31
+BUCKET_FIELDS = ('total', 'unique')
+
+
+def month_key(date):
+    return date.strftime(MONTH_FORMAT)
+
+
+def bucket_id(series, month):
+    """Build the ``_id`` of the bucket holding `series` for `month`.
+
+    :param str series: Series key (e.g. `'node:abc12'`)
+    :param str month: Month key as returned by `month_key`
+    """
+    return '{0}:{1}'.format(series, month)
+
+
+def empty_bucket(series, month):
+    bucket = {
+        '_id': bucket_id(series, month),
+        'series': series,
+        'month': month,
+    }
+    for field in BUCKET_FIELDS:
+        bucket[field] = [0] * DAYS_PER_BUCKET
+    return bucket
+
+
+def increment(collection, series, date, counts):
+    """Increment the daily counts of `series` on `date`.
+
+    The bucket is preallocated on first use so that `$inc` always targets an
+    existing array slot; concurrent preallocations are resolved by the unique
+    ``_id``.
+
+    :param collection: Bucket collection
+    :param str series: Series key
+    :param date: `date` or `datetime` of the event
+    :param dict counts: Mapping of bucket field (see `BUCKET_FIELDS`) to amount
+    """
+    if not counts:
+        return
+    month = month_key(date)
+    _id = bucket_id(series, month)
+    update = {
+        '$inc': {
+            '{0}.{1}'.format(field, date.day - 1): amount
+            for field, amount in counts.items()
+        }
+    }
+    result = collection.update({'_id': _id}, update, upsert=False, manipulate=False)
+    if result and result.get('updatedExisting'):
+        return
+    try:
+        collection.insert(empty_bucket(series, month), manipulate=False)
+    except DuplicateKeyError:
+        pass
+    collection.update({'_id': _id}, update, upsert=False, manipulate=False)
+
+
+def iter_months(start, end):
+    """Yield the first day of every month between `start` and `end`, inclusive.
+    """
+    current = datetime.date(start.year, start.month, 1)
+    while current <= end:
+        yield current
+        if current.month == 12:
+            current = datetime.date(current.year + 1, 1, 1)
+        else:
+            current = datetime.date(current.year, current.month + 1, 1)
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def get_range(collection, series, start, end):
+    """Return the daily counts of `series` between `start` and `end`,
+    inclusive, as a list of `(date, unique, total)` tuples. Days without any
+    recorded activity are reported as zeros.
+
+    :param collection: Bucket collection
+    :param str series: Series key
+    :param start: First `date` of the range
+    :param end: Last `date` of the range
+    """
+    start, end = _as_date(start), _as_date(end)
+    if start > end:
+        return []
+    months = list(iter_months(start, end))
+    ids = [bucket_id(series, month_key(month)) for month in months]
+    buckets = {
+        bucket['month']: bucket
+        for bucket in collection.find({'_id': {'$in': ids}})
+    }
+    ret = []
+    day = start
+    one_day = datetime.timedelta(days=1)
+    while day <= end:
+        bucket = buckets.get(month_key(day))
+        if bucket:
+            ret.append((day, bucket['unique'][day.day - 1], bucket['total'][day.day - 1]))
+        else:
+            ret.append((day, 0, 0))
+        day += one_day
+    return ret
@@ -311,6 +311,9 @@ class User(GuidStoredObject, AddonModelMixin):
     date_registered = fields.DateTimeField(auto_now_add=dt.datetime.utcnow,
                                            index=True)
 
+    # ID of the user's dashboard folder, set when it is created
+    dashboard_id = fields.StringField()
+
     # watched nodes are stored via a list of WatchConfigs
     watched = fields.ForeignField("WatchConfig", list=True, backref="watched")
 
@@ -1079,6 +1082,7 @@ class User(GuidStoredObject, AddonModelMixin):
         if watch_config.node in watched_nodes:
             raise ValueError('Node is already being watched.')
         watch_config.save()
+        watch_config.node.increment_counters(watched_count=1)
         self.watched.append(watch_config)
         return None
 
@@ -1093,6 +1097,7 @@ class User(GuidStoredObject, AddonModelMixin):
         for each in self.watched:
             if watch_config.node._id == each.node._id:
                 each.__class__.remove_one(each)
+                watch_config.node.increment_counters(watched_count=-1)
                 return None
         raise ValueError('Node not being watched.')
 
@@ -1,12 +1,102 @@
+import socket
 import smtplib
 import logging
+import threading
 from email.mime.text import MIMEText
 
+from celery.signals import worker_process_shutdown
+
 from framework.tasks import app
 from website import settings
 
 logger = logging.getLogger(__name__)
 
+#: Errors after which a pooled session is dropped and the send retried once
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, socket.error)
+
+
+class SMTPConnectionPool(object):
+    """Keep authenticated SMTP sessions open between messages, so that EHLO,
+    STARTTLS and LOGIN happen once per session rather than once per message.
+
+    Sessions are keyed by server and credentials and are local to the current
+    thread; under the prefork Celery pool each worker process therefore keeps
+    its own sessions. A session that the server has closed is reopened
+    transparently on the next send.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def connections(self):
+        if not hasattr(self._local, 'connections'):
+            self._local.connections = {}
+        return self._local.connections
+
+    def connect(self, mail_server, ttls, login, username, password):
+        connection = smtplib.SMTP(mail_server)
+        connection.ehlo()
+        if ttls:
+            connection.starttls()
+            connection.ehlo()
+        if login:
+            connection.login(username, password)
+        return connection
+
+    def get(self, mail_server, ttls, login, username, password):
+        key = (mail_server, ttls, login, username)
+        connection = self.connections.get(key)
+        if connection is None:
+            connection = self.connections[key] = self.connect(mail_server, ttls, login, username, password)
+        return connection
+
+    def discard(self, mail_server, ttls, login, username):
+        connection = self.connections.pop((mail_server, ttls, login, username), None)
+        if connection is not None:
+            try:
+                connection.quit()
+            except CONNECTION_ERRORS + (smtplib.SMTPException, ):
+                connection.close()
+
+    def sendmail(self, from_addr, to_addr, msg, mail_server, ttls, login, username, password):
+        """Send a prepared message, reconnecting once if the pooled session
+        turns out to be dead.
+        """
+        for attempt in range(2):
+            connection = self.get(mail_server, ttls, login, username, password)
+            try:
+                return connection.sendmail(
+                    from_addr=from_addr,
+                    to_addrs=[to_addr],
+                    msg=msg
+                )
+            except CONNECTION_ERRORS:
+                self.discard(mail_server, ttls, login, username)
+                if attempt:
+                    raise
+                logger.info('SMTP session to {0} lost; reconnecting'.format(mail_server))
+
+    def close(self):
+        for mail_server, ttls, login, username in list(self.connections):
+            self.discard(mail_server, ttls, login, username)
+
+
+pool = SMTPConnectionPool()
+
+
+@worker_process_shutdown.connect
+def close_connections(**kwargs):
+    pool.close()
+
+
+def build_message(from_addr, to_addr, subject, message, mimetype='html'):
+    msg = MIMEText(message, mimetype, _charset='utf-8')
+    msg['Subject'] = subject
+    msg['From'] = from_addr
+    msg['To'] = to_addr
+    return msg.as_string()
+
 
 @app.task
 def send_email(from_addr, to_addr, subject, message, mimetype='html', ttls=True, login=True,
@@ -32,22 +122,44 @@ def send_email(from_addr, to_addr, subject, message, mimetype='html', ttls=True,
         logger.error('Mail username and password not set; skipping send.')
         return
 
-    msg = MIMEText(message, mimetype, _charset='utf-8')
-    msg['Subject'] = subject
-    msg['From'] = from_addr
-    msg['To'] = to_addr
-
-    s = smtplib.SMTP(mail_server)
-    s.ehlo()
-    if ttls:
-        s.starttls()
-        s.ehlo()
-    if login:
-        s.login(username, password)
-    s.sendmail(
-        from_addr=from_addr,
-        to_addrs=[to_addr],
-        msg=msg.as_string()
+    pool.sendmail(
+        from_addr,
+        to_addr,
+        build_message(from_addr, to_addr, subject, message, mimetype),
+        mail_server, ttls, login, username, password,
     )
-    s.quit()
     return True
+
+
+@app.task
+def send_emails(messages, ttls=True, login=True, username=None, password=None, mail_server=None):
+    """Send many emails over a single SMTP session.
+
+    :param list messages: Dicts with the `from_addr`, `to_addr`, `subject`,
+        `message` and optional `mimetype` arguments of `send_email`
+    :return: Number of messages sent
+    """
+    username = username or settings.MAIL_USERNAME
+    password = password or settings.MAIL_PASSWORD
+    mail_server = mail_server or settings.MAIL_SERVER
+
+    if not settings.USE_EMAIL:
+        return
+    if login and (username is None or password is None):
+        logger.error('Mail username and password not set; skipping send.')
+        return
+
+    sent = 0
+    for each in messages:
+        try:
+            pool.sendmail(
+                each['from_addr'],
+                each['to_addr'],
+                build_message(**each),
+                mail_server, ttls, login, username, password,
+            )
+        except smtplib.SMTPRecipientsRefused:
+            logger.error('Recipient {0} refused; skipping'.format(each['to_addr']))
+            continue
+        sent += 1
+    return sent
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""A simple Bloom filter, used to check GUIDs against the blacklist without
+a database round-trip.
+"""
+import math
+import hashlib
+
+
+class BloomFilter(object):
+    """Set membership test with no false negatives and a false positive rate
+    of about `error_rate` once `capacity` items have been added.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.num_bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(int(round(self.num_bits / float(capacity) * math.log(2))), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: derive all positions from two 64-bit hashes
+        digest = hashlib.md5(item.encode('utf-8')).hexdigest()
+        first, second = int(digest[:16], 16), int(digest[16:], 16)
+        return [
+            (first + index * second) % self.num_bits
+            for index in range(self.num_hashes)
+        ]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position // 8] |= 1 << (position % 8)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position // 8] & (1 << (position % 8))
+            for position in self._positions(item)
+        )
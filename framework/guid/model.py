@@ -1,15 +1,13 @@
 # -*- coding: utf-8 -*-
-import random
-
 import pymongo
 from modularodm import fields
 
 from framework.mongo import StoredObject
+from framework.guid import pool
+from framework.guid.pool import ALPHABET  # noqa
 
 from modularodm.storage.base import KeyExistsException
 
-ALPHABET = '23456789abcdefghjkmnpqrstuvwxyz'
-
 
 class BlacklistGuid(StoredObject):
 
@@ -27,24 +25,14 @@ class Guid(StoredObject):
     referent = fields.AbstractForeignField()
 
     @classmethod
-    def generate(self, referent=None):
+    def generate(cls, referent=None):
         while True:
-            # Create GUID
-            guid_id = ''.join(random.sample(ALPHABET, 5))
-
-            # Check GUID against blacklist
-            blacklist_guid = BlacklistGuid.load(guid_id)
-            if not blacklist_guid:
-                try:
-                    guid = Guid(_id=guid_id)
-                    guid.save()
-                    break
-                except KeyExistsException:
-                    pass
-        if referent:
-            guid.referent = referent
-            guid.save()
-        return guid
+            guid = cls(_id=pool.claim(), referent=referent)
+            try:
+                guid.save()
+                return guid
+            except KeyExistsException:
+                pool.record_collision()
 
     def __repr__(self):
         return '<id:{0}, referent:({1}, {2})>'.format(self._id, self.referent._primary_key, self.referent._name)
@@ -81,13 +69,15 @@ class GuidStoredObject(StoredObject):
             )
             guid.save()
 
-        # Else create GUID optimistically
+        # Else claim a GUID key and create GUID optimistically
         else:
-            guid = Guid.generate()
-            guid.referent = (guid._primary_key, self._name)
-            guid.save()
-            # Set primary key to GUID key
-            self._primary_key = guid._primary_key
+            while True:
+                self._primary_key = pool.claim()
+                try:
+                    Guid(_id=self._primary_key, referent=self).save()
+                    break
+                except KeyExistsException:
+                    pool.record_collision()
 
     def save(self, *args, **kwargs):
         """Ensure GUID on save."""
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Pool of pre-validated, unused GUIDs.
+
+Generating a GUID at random means checking it against the blacklist and then
+retrying the insert on collisions, which grow more frequent as the keyspace
+fills. Instead, `refill` periodically tops up a collection of random IDs
+that are neither blacklisted nor taken, and `claim` pops one of them with a
+single atomic ``findAndModify``. If the pool is empty, or disabled, `claim`
+falls back to generating an ID on the spot.
+
+Blacklist checks go through an in-memory Bloom filter, so that only the
+rare possible matches need a database round-trip.
+
+An ID can still be taken between refilling and claiming, e.g. by a record
+created with an explicit primary key, so callers must handle
+`KeyExistsException` and report it with `record_collision`.
+"""
+import random
+import logging
+import datetime
+
+import pymongo
+
+from framework.mongo import database
+from framework.guid.bloom import BloomFilter
+
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = '23456789abcdefghjkmnpqrstuvwxyz'
+
+POOL_COLLECTION = 'guidpool'
+BLACKLIST_COLLECTION = 'blacklistguid'
+GUID_COLLECTION = 'guid'
+
+# Give up refilling after this many consecutive batches without an unused ID
+MAX_EMPTY_BATCHES = 10
+
+#: Counters for this process, see `get_metrics`
+stats = {
+    'claimed': 0,  # IDs taken from the pool
+    'empty': 0,  # Claims that found the pool empty
+    'collisions': 0,  # Claimed IDs that turned out to be taken
+    'candidates': 0,  # IDs generated by `refill`
+    'rejected': 0,  # Candidates that were blacklisted or taken
+}
+
+_blacklist_filter = None
+_blacklist_loaded = None
+
+
+def random_guid_id():
+    return ''.join(random.sample(ALPHABET, 5))
+
+
+def get_blacklist_filter():
+    """Return a Bloom filter of blacklisted GUIDs, reloading it once it is
+    older than `GUID_BLACKLIST_FILTER_TTL`.
+    """
+    global _blacklist_filter, _blacklist_loaded
+    now = datetime.datetime.utcnow()
+    if _blacklist_filter is None or now - _blacklist_loaded > settings.GUID_BLACKLIST_FILTER_TTL:
+        collection = database[BLACKLIST_COLLECTION]
+        bloom = BloomFilter(collection.count())
+        for record in collection.find({}, {'_id': True}):
+            bloom.add(record['_id'])
+        _blacklist_filter, _blacklist_loaded = bloom, now
+    return _blacklist_filter
+
+
+def reset_blacklist_filter():
+    global _blacklist_filter
+    _blacklist_filter = None
+
+
+def is_blacklisted(guid_id):
+    if guid_id not in get_blacklist_filter():
+        return False
+    return database[BLACKLIST_COLLECTION].find_one({'_id': guid_id}, {'_id': True}) is not None
+
+
+def claim():
+    """Return an unused GUID, from the pool if possible."""
+    if settings.GUID_POOL_ENABLED:
+        record = database[POOL_COLLECTION].find_and_modify(query={}, remove=True)
+        if record is not None:
+            stats['claimed'] += 1
+            return record['_id']
+        stats['empty'] += 1
+    while True:
+        guid_id = random_guid_id()
+        if not is_blacklisted(guid_id):
+            return guid_id
+
+
+def record_collision():
+    stats['collisions'] += 1
+
+
+def refill(size=None):
+    """Top up the pool to `size` IDs, by default `GUID_POOL_SIZE`. Random
+    candidates are checked against the blacklist, then in batches against
+    existing GUIDs and the pool itself.
+
+    :return int: Number of IDs added
+    """
+    size = size or settings.GUID_POOL_SIZE
+    pool = database[POOL_COLLECTION]
+    needed = size - pool.count()
+    added = empty_batches = 0
+    while needed > 0:
+        candidates = set()
+        while len(candidates) < needed:
+            guid_id = random_guid_id()
+            stats['candidates'] += 1
+            if is_blacklisted(guid_id):
+                stats['rejected'] += 1
+            else:
+                candidates.add(guid_id)
+        query = {'_id': {'$in': list(candidates)}}
+        taken = set(
+            record['_id']
+            for collection in (database[GUID_COLLECTION], pool)
+            for record in collection.find(query, {'_id': True})
+        )
+        stats['rejected'] += len(taken)
+        fresh = candidates - taken
+        if not fresh:
+            empty_batches += 1
+            if empty_batches >= MAX_EMPTY_BATCHES:
+                # The keyspace is close to exhausted; don't spin
+                logger.error('Could not find unused GUIDs to refill pool')
+                break
+            continue
+        empty_batches = 0
+        try:
+            pool.insert([{'_id': guid_id} for guid_id in fresh], continue_on_error=True)
+        except pymongo.errors.DuplicateKeyError:
+            # Another worker added some of the same IDs
+            pass
+        added += len(fresh)
+        needed -= len(fresh)
+    return added
+
+
+def get_metrics():
+    """Return the depth of the pool and the counters of this process,
+    including the share of generated candidates that were already taken or
+    blacklisted.
+    """
+    metrics = dict(stats)
+    metrics['depth'] = database[POOL_COLLECTION].count()
+    metrics['collision_rate'] = (
+        float(stats['rejected']) / stats['candidates']
+        if stats['candidates'] else 0.0
+    )
+    return metrics
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from framework.tasks import app
+
+from framework.guid import pool
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(name='guid.refill_pool')
+def refill_pool():
+    added = pool.refill()
+    logger.info('Added {0} GUID(s) to pool; metrics: {1}'.format(added, pool.get_metrics()))
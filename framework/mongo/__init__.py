@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from flask import request
+from modularodm.query.query import QueryGroup, RawQuery
 from modularodm.storedobject import StoredObject as GenericStoredObject
 from modularodm.ext.concurrency import with_proxies, proxied_members
 
@@ -31,9 +32,37 @@ def get_cache_key():
             return dummy_request
 
 
+def normalize_query(query, normalized_fields):
+    """Rewrite ``iexact`` conditions on fields listed in `normalized_fields`
+    in place as equality conditions on their lower-cased counterparts, which
+    unlike case-insensitive regular expressions can use an index.
+
+    :param dict normalized_fields: Names of lower-cased fields keyed by the
+        names of the fields they normalize
+    """
+    if isinstance(query, RawQuery):
+        if query.operator == 'iexact' and query.attribute in normalized_fields:
+            query.attribute = normalized_fields[query.attribute]
+            query.operator = 'eq'
+            query.argument = query.argument.lower()
+    elif isinstance(query, QueryGroup):
+        for node in query.nodes:
+            normalize_query(node, normalized_fields)
+
+
 @with_proxies(proxied_members, get_cache_key)
 class StoredObject(GenericStoredObject):
-    pass
+
+    #: Lower-cased fields keyed by the field they normalize; ``iexact``
+    #: queries on the latter are run against the former. Models are
+    #: responsible for keeping these fields up to date.
+    __normalized_fields__ = {}
+
+    @classmethod
+    def _process_query(cls, query):
+        if cls.__normalized_fields__:
+            normalize_query(query, cls.__normalized_fields__)
+        super(StoredObject, cls)._process_query(query)
 
 
 __all__ = [
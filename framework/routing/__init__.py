@@ -1,17 +1,20 @@
 # -*- coding: utf-8 -*-
 import os
+import re
+import time
 import logging
 import copy
 import json
 import functools
 import httplib as http
+from multiprocessing.pool import ThreadPool
 
 import lxml.html
 import werkzeug.wrappers
 from werkzeug.exceptions import NotFound
 from mako.template import Template
 from mako.lookup import TemplateLookup
-from flask import request, make_response
+from flask import request, make_response, g, copy_current_request_context
 
 from framework import sentry
 from framework.flask import app, redirect
@@ -24,12 +27,82 @@ logger = logging.getLogger(__name__)
 
 TEMPLATE_DIR = settings.TEMPLATES_PATH
 
+# Markers placed around `mod-meta` embeds when templates are compiled; see
+# `compile_mod_meta`
+MOD_META_START = '<!--mod-meta-->'
+MOD_META_END = '<!--/mod-meta-->'
+MOD_META_EMBED = re.compile(
+    '{0}(.*?){1}'.format(re.escape(MOD_META_START), re.escape(MOD_META_END)),
+    re.DOTALL,
+)
+MOD_META_TAG = re.compile(r"<(\w+)\b[^<>]*?\smod-meta='")
+MOD_META_TAG_END = re.compile(r'[^<>]*>\s*</(\w+)>')
+
+
+def _find_attribute_end(source, position):
+    """Return the index of the quote closing a single-quoted attribute value
+    that starts at `position`, skipping over Mako `${...}` expressions, which
+    may themselves contain quotes. Return -1 if the value is not closed.
+    """
+    depth = 0
+    while position < len(source):
+        if source.startswith('${', position):
+            depth += 1
+            position += 2
+            continue
+        char = source[position]
+        if depth:
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+        elif char == "'":
+            return position
+        position += 1
+    return -1
+
+
+def compile_mod_meta(source):
+    """Mako preprocessor that wraps each `mod-meta` embed in the template
+    source in `MOD_META_START` / `MOD_META_END` markers. The rendered page can
+    then be composed by splitting on the markers, instead of parsing the whole
+    output and searching it once per embed. Embeds that cannot be compiled
+    (e.g. elements with content) are left as-is and handled at render time.
+    """
+    parts = []
+    position = 0
+    while True:
+        match = MOD_META_TAG.search(source, position)
+        if match is None:
+            break
+        line_start = source.rfind('\n', 0, match.start()) + 1
+        value_end = _find_attribute_end(source, match.end())
+        if value_end == -1:
+            break
+        tag_end = MOD_META_TAG_END.match(source, value_end + 1)
+        if (source[line_start:match.start()].strip().startswith('##') or
+                tag_end is None or tag_end.group(1) != match.group(1)):
+            parts.append(source[position:value_end + 1])
+            position = value_end + 1
+            continue
+        parts.extend([
+            source[position:match.start()],
+            MOD_META_START,
+            source[match.start():tag_end.end()],
+            MOD_META_END,
+        ])
+        position = tag_end.end()
+    parts.append(source[position:])
+    return ''.join(parts)
+
+
 _TPL_LOOKUP = TemplateLookup(
     directories=[
         TEMPLATE_DIR,
         os.path.join(settings.BASE_PATH, 'addons/'),
     ],
-    module_directory='/tmp/mako_modules'
+    module_directory='/tmp/mako_modules',
+    preprocessor=compile_mod_meta,
 )
 
 _TPL_LOOKUP_SAFE = TemplateLookup(
@@ -44,6 +117,7 @@ _TPL_LOOKUP_SAFE = TemplateLookup(
         os.path.join(settings.BASE_PATH, 'addons/'),
     ],
     module_directory='/tmp/mako_modules',
+    preprocessor=compile_mod_meta,
 )
 
 REDIRECT_CODES = [
@@ -228,6 +302,7 @@ def render_mako_string(tpldir, tplname, data, trust=True):
             lookup=lookup_obj,
             input_encoding='utf-8',
             output_encoding='utf-8',
+            preprocessor=compile_mod_meta,
             default_filters=lookup_obj.template_args['default_filters'],
             imports=lookup_obj.template_args['imports']  # FIXME: Temporary workaround for data stored in wrong format in DB. Unescape it before it gets re-escaped by Markupsafe.
         )
@@ -297,6 +372,39 @@ def call_url(url, view_kwargs=None):
 
     return rv
 
+def embed_replacement(original, template_rendered, is_replace):
+    """Build the markup that replaces a `mod-meta` embed.
+
+    :param original: Serialized embed element
+    :param template_rendered: Rendered embedded template
+    :param is_replace: Replace the element rather than fill it
+    """
+    if is_replace:
+        return template_rendered
+    return original.replace('><', '>' + template_rendered + '<')
+
+
+def record_embed_timing(element, elapsed):
+    """Log the time taken to render a `mod-meta` embed and keep it on
+    `flask.g.mod_meta_timings` for the current request.
+    """
+    try:
+        meta = json.loads(element.get('mod-meta'))
+    except ValueError:
+        meta = {}
+    timing = {
+        'tpl': meta.get('tpl'),
+        'uri': meta.get('uri'),
+        'elapsed': elapsed,
+    }
+    logger.debug('Rendered embed {tpl} ({uri}) in {elapsed:.4f}s'.format(**timing))
+    try:
+        if not hasattr(g, 'mod_meta_timings'):
+            g.mod_meta_timings = []
+        g.mod_meta_timings.append(timing)
+    except RuntimeError:  # Not in an application context
+        pass
+
 ### Renderers ###
 
 class Renderer(object):
@@ -522,6 +630,91 @@ class WebRenderer(Renderer):
 
         return template_rendered, is_replace
 
+    def _render_elements(self, elements, data):
+        """Render embedded templates, concurrently if
+        `settings.MOD_META_EMBED_WORKERS` allows it. Each embed is timed; see
+        `record_embed_timing`.
+
+        :param elements: List of template embeds (HtmlElement)
+        :param data: Dictionary to be passed to the templates as context
+        :return: List of 2-tuples: (<result>, <flag: replace div>)
+        """
+        def timed(element):
+            start = time.time()
+            result = self.render_element(element, data)
+            return result, time.time() - start
+
+        def bind(element):
+            return lambda: timed(element)
+
+        workers = min(settings.MOD_META_EMBED_WORKERS, len(elements))
+        if workers > 1:
+            # Each call gets its own copy of the request context
+            calls = [
+                copy_current_request_context(bind(element))
+                for element in elements
+            ]
+            pool = ThreadPool(workers)
+            try:
+                results = pool.map(lambda call: call(), calls)
+            finally:
+                pool.close()
+        else:
+            results = [timed(element) for element in elements]
+
+        for element, (_, elapsed) in zip(elements, results):
+            record_embed_timing(element, elapsed)
+        return [result for result, _ in results]
+
+    def _compose_parsed(self, rendered, data):
+        """Replace `mod-meta` embeds that were not compiled into placeholders
+        by parsing the markup and searching for each embed.
+        """
+        html = lxml.html.fragment_fromstring(rendered, create_parent='remove')
+        elements = html.findall('.//*[@mod-meta]')
+
+        for element, (template_rendered, is_replace) in zip(elements, self._render_elements(elements, data)):
+            original = lxml.html.tostring(element)
+            rendered = rendered.replace(original, embed_replacement(original, template_rendered, is_replace))
+
+        return rendered
+
+    def compose(self, rendered, data):
+        """Render the `mod-meta` embeds in rendered output and splice them in.
+
+        Embeds wrapped in placeholders by `compile_mod_meta` are spliced in a
+        single pass over the output; only the embed elements themselves are
+        parsed. Output between placeholders that still contains `mod-meta`
+        (e.g. from templates compiled before the pre-pass) falls back to
+        `_compose_parsed`.
+
+        :param rendered: Rendered HTML
+        :param data: Dictionary to be passed to embedded templates as context
+        :return: Rendered HTML with embeds replaced
+        """
+        if 'mod-meta' not in rendered:
+            return rendered
+
+        parts = MOD_META_EMBED.split(rendered)
+        embeds = []
+        for index in range(1, len(parts), 2):
+            try:
+                embeds.append((index, lxml.html.fragment_fromstring(parts[index])))
+            except lxml.etree.ParserError:
+                continue
+
+        results = self._render_elements([element for _, element in embeds], data)
+        for (index, element), (template_rendered, is_replace) in zip(embeds, results):
+            original = lxml.html.tostring(element)
+            parts[index] = embed_replacement(original, template_rendered, is_replace)
+
+        replaced = {index for index, _ in embeds}
+        for index, part in enumerate(parts):
+            if index not in replaced and 'mod-meta' in part:
+                parts[index] = self._compose_parsed(part, data)
+
+        return ''.join(parts)
+
     def _render(self, data, template_name=None):
         """Render output of view function to HTML.
 
@@ -549,21 +742,7 @@ class WebRenderer(Renderer):
         except IOError:
             return '<div>Template {} not found.</div>'.format(template_name)
 
-        html = lxml.html.fragment_fromstring(rendered, create_parent='remove')
-
-        for element in html.findall('.//*[@mod-meta]'):
-
-            # Render nested template
-            template_rendered, is_replace = self.render_element(element, data)
-
-            original = lxml.html.tostring(element)
-            if is_replace:
-                replacement = template_rendered
-            else:
-                replacement = original
-                replacement = replacement.replace('><', '>' + template_rendered + '<')
-
-            rendered = rendered.replace(original, replacement)
+        rendered = self.compose(rendered, data)
 
         ## Parse HTML using html5lib; lxml is too strict and e.g. throws
         ## errors if missing parent container; htmlparser mangles whitespace
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 import re
+import itertools
 
 from werkzeug.utils import secure_filename as werkzeug_secure_filename
 
@@ -28,3 +29,18 @@ def secure_filename(filename):
         pass
 
     return secure
+
+
+def iter_chunks(iterable, size):
+    """Yield successive lists of at most `size` items from `iterable` without
+    materializing it.
+
+    :param iterable: Any iterable, e.g. a database cursor
+    :param int size: Maximum number of items per chunk
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,56 @@
+"""
+Measure GUID allocation throughput with and without the GUID pool. Creates
+and then removes `count` GUIDs per run.
+
+Examples:
+    python -m scripts.benchmark_guid_allocation
+    python -m scripts.benchmark_guid_allocation 5000
+"""
+import sys
+import time
+import logging
+
+from framework.mongo import database
+from framework.guid import pool
+from framework.guid.model import Guid
+from website import settings
+from website.app import init_app
+
+logger = logging.getLogger(__name__)
+
+
+def allocate(count):
+    """Generate `count` GUIDs and return their IDs and the elapsed time."""
+    start = time.time()
+    guid_ids = [Guid.generate()._id for _ in range(count)]
+    return guid_ids, time.time() - start
+
+
+def run(count, use_pool):
+    enabled = settings.GUID_POOL_ENABLED
+    settings.GUID_POOL_ENABLED = use_pool
+    try:
+        if use_pool:
+            pool.refill(size=count)
+        guid_ids, elapsed = allocate(count)
+    finally:
+        settings.GUID_POOL_ENABLED = enabled
+    database[Guid._name].remove({'_id': {'$in': guid_ids}})
+    Guid._clear_caches()
+    return elapsed
+
+
+def main(count=1000):
+    for use_pool in (False, True):
+        elapsed = run(count, use_pool)
+        logger.info('{0}: {1} GUIDs in {2:.2f}s ({3:.0f}/s)'.format(
+            'Pool' if use_pool else 'No pool',
+            count, elapsed, count / elapsed,
+        ))
+    logger.info('Pool metrics: {0}'.format(pool.get_metrics()))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    init_app(routes=False)
+    main(*[int(arg) for arg in sys.argv[1:2]])
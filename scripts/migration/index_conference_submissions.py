@@ -0,0 +1,36 @@
+"""
+Populate the `ConferenceSubmission` listings served by the meetings pages
+from the public nodes tagged with each conference's endpoint. New
+submissions are listed as nodes are tagged, made public or get files.
+
+Examples:
+    Dry run:
+        python -m scripts.migration.index_conference_submissions dry
+    Real:
+        python -m scripts.migration.index_conference_submissions
+"""
+import sys
+import logging
+
+from website.app import init_app
+from website.models import Conference, ConferenceSubmission
+
+logger = logging.getLogger(__name__)
+
+
+def main(dry_run=True):
+    count = 0
+    for conference in Conference.find():
+        indexed = ConferenceSubmission.index_conference(conference, save=not dry_run)
+        logger.info('Listed {0} submission(s) to {1}'.format(indexed, conference.endpoint))
+        count += indexed
+    logger.info('Listed {0} conference submission(s)'.format(count))
+    return count
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if dry_run:
+        logger.warn('Dry_run mode')
+    init_app(routes=False)
+    main(dry_run=dry_run)
@@ -0,0 +1,136 @@
+"""
+Move the per-date counts embedded in `pagecounters` and `useractivitycounters`
+(the ever-growing `date.YYYY/MM/DD` keys) into the monthly bucket collections
+read by `framework.analytics.get_counters_by_date` and
+`framework.analytics.get_user_activity_by_date`. Lifetime totals stay on the
+original documents; the embedded date keys are removed once migrated.
+
+Examples:
+    Dry run:
+        python -m scripts.migration.migrate_counters_to_buckets dry
+    Real:
+        python -m scripts.migration.migrate_counters_to_buckets
+"""
+import sys
+import logging
+import datetime
+import collections
+
+from pymongo.errors import DuplicateKeyError
+
+from framework import analytics
+from framework.analytics import timeseries
+from framework.mongo import database
+from website.app import init_app
+
+logger = logging.getLogger(__name__)
+
+# Bucket field listing the counters whose dates have been merged into the
+# bucket, so that running the migration again doesn't count them twice
+MIGRATED_FIELD = 'migrated_from'
+
+
+def parse_date(key):
+    return datetime.datetime.strptime(key, '%Y/%m/%d').date()
+
+
+def flatten_dates(dates):
+    """Flatten a nested `{YYYY: {MM: {DD: counts}}}` mapping, as produced by
+    dotted `$inc` keys, into `{date: counts}`.
+    """
+    flat = {}
+    for year, months in dates.items():
+        for month, days in months.items():
+            for day, counts in days.items():
+                flat[parse_date('/'.join([year, month, day]))] = counts
+    return flat
+
+
+def build_buckets(series, dates):
+    """Group daily counts of `series` into preallocated monthly buckets.
+    """
+    buckets = collections.OrderedDict()
+    for date, counts in sorted(flatten_dates(dates).items()):
+        month = timeseries.month_key(date)
+        bucket = buckets.get(month)
+        if bucket is None:
+            bucket = buckets[month] = timeseries.empty_bucket(series, month)
+        for field in timeseries.BUCKET_FIELDS:
+            if isinstance(counts, dict):
+                bucket[field][date.day - 1] += counts.get(field, 0)
+            elif field == 'total':
+                bucket[field][date.day - 1] += counts
+    return buckets.values()
+
+
+def save_buckets(collection, buckets, counter_id):
+    """Merge the counts migrated from the counter `counter_id` into any
+    buckets already written since the new layout was deployed. Each bucket
+    is marked with `counter_id` in the same update that adds the counts, and
+    skipped if already marked, so that an interrupted migration can be run
+    again.
+    """
+    for bucket in buckets:
+        update = {'$inc': {}, '$addToSet': {MIGRATED_FIELD: counter_id}}
+        for field in timeseries.BUCKET_FIELDS:
+            for index, count in enumerate(bucket[field]):
+                if count:
+                    update['$inc']['{0}.{1}'.format(field, index)] = count
+        if not update['$inc']:
+            continue
+        if not collection.find_one({'_id': bucket['_id']}, {'_id': 1}):
+            try:
+                collection.insert(timeseries.empty_bucket(bucket['series'], bucket['month']))
+            except DuplicateKeyError:
+                # Preallocated meanwhile by `timeseries.increment`
+                pass
+        collection.update({'_id': bucket['_id'], MIGRATED_FIELD: {'$ne': counter_id}}, update)
+
+
+def migrate_page_counters(db, dry_run=True):
+    source = db['pagecounters']
+    target = db[analytics.PAGE_BUCKETS]
+    count = 0
+    for counter in source.find({'date': {'$exists': True}}):
+        buckets = build_buckets(counter['_id'], counter['date'])
+        logger.info('Migrating {0} month(s) of page counters for {1}'.format(len(buckets), counter['_id']))
+        if not dry_run:
+            save_buckets(target, buckets, counter['_id'])
+            source.update({'_id': counter['_id']}, {'$unset': {'date': True}})
+        count += 1
+    return count
+
+
+def migrate_user_activity_counters(db, dry_run=True):
+    source = db['useractivitycounters']
+    target = db[analytics.USER_ACTIVITY_BUCKETS]
+    count = 0
+    for counter in source.find({'date': {'$exists': True}}):
+        user_id = counter['_id']
+        buckets = build_buckets(analytics.user_activity_series(user_id), counter['date'])
+        unset = {'date': True}
+        for action, data in counter.get('action', {}).items():
+            if 'date' not in data:
+                continue
+            buckets.extend(build_buckets(analytics.user_activity_series(user_id, action), data['date']))
+            unset['action.{0}.date'.format(action)] = True
+        logger.info('Migrating {0} bucket(s) of activity counters for {1}'.format(len(buckets), user_id))
+        if not dry_run:
+            save_buckets(target, buckets, user_id)
+            source.update({'_id': user_id}, {'$unset': unset})
+        count += 1
+    return count
+
+
+def main(dry_run=True):
+    pages = migrate_page_counters(database, dry_run=dry_run)
+    users = migrate_user_activity_counters(database, dry_run=dry_run)
+    logger.info('Migrated {0} page counter(s) and {1} user activity counter(s)'.format(pages, users))
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if dry_run:
+        logger.warn('Dry_run mode')
+    init_app(routes=False)
+    main(dry_run=dry_run)
@@ -0,0 +1,73 @@
+"""
+Store the ID of each user's dashboard on the user, and the IDs of the nodes
+pointed to by each node's pointers on the node, so that project pages can
+check whether a node is on the user's dashboard without querying for the
+dashboard and loading its pointers.
+
+Examples:
+    Dry run:
+        python -m scripts.migration.migrate_dashboard_ids dry
+    Real:
+        python -m scripts.migration.migrate_dashboard_ids
+"""
+import sys
+import logging
+
+from framework.mongo import database
+from website.app import init_app
+from website.models import Node, Pointer, User
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_dashboard_ids(dry_run=True):
+    count = 0
+    for record in database[Node._name].find({'is_dashboard': True}, {'creator': True}):
+        logger.info('Setting dashboard of user {0} to {1}'.format(record['creator'], record['_id']))
+        if not dry_run:
+            database[User._name].update(
+                {'_id': record['creator']},
+                {'$set': {'dashboard_id': record['_id']}},
+            )
+        count += 1
+    return count
+
+
+def migrate_pointer_node_ids(dry_run=True):
+    count = 0
+    for record in database[Node._name].find({'nodes.0': {'$exists': True}}, {'nodes': True}):
+        pointer_ids = [key for key, name in record['nodes'] if name == Pointer._name]
+        if not pointer_ids:
+            continue
+        pointed = {
+            pointer['_id']: pointer['node']
+            for pointer in database[Pointer._name].find(
+                {'_id': {'$in': pointer_ids}}, {'node': True}
+            )
+        }
+        pointer_node_ids = [pointed[key] for key in pointer_ids if pointed.get(key)]
+        logger.info('Setting pointed nodes of node {0} to {1}'.format(record['_id'], pointer_node_ids))
+        if not dry_run:
+            database[Node._name].update(
+                {'_id': record['_id']},
+                {'$set': {'pointer_node_ids': pointer_node_ids}},
+            )
+        count += 1
+    return count
+
+
+def main(dry_run=True):
+    users = migrate_dashboard_ids(dry_run=dry_run)
+    nodes = migrate_pointer_node_ids(dry_run=dry_run)
+    User._clear_caches()
+    Node._clear_caches()
+    logger.info('Migrated {0} user(s) and {1} node(s)'.format(users, nodes))
+    return users, nodes
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if dry_run:
+        logger.warn('Dry_run mode')
+    init_app(routes=False)
+    main(dry_run=dry_run)
@@ -0,0 +1,53 @@
+"""
+Populate `Node.ancestors`, the root-first list of ancestor IDs, for existing
+nodes. New nodes get their ancestors when they are created, forked or
+registered.
+
+Examples:
+    Dry run:
+        python -m scripts.migration.migrate_node_ancestors dry
+    Real:
+        python -m scripts.migration.migrate_node_ancestors
+"""
+import sys
+import logging
+
+from framework.mongo import database
+from website.app import init_app
+from website.models import Node
+
+logger = logging.getLogger(__name__)
+
+
+def get_ancestors(node, memo):
+    """Compute the ancestor IDs of `node` by walking up parent back-references,
+    reusing the results for nodes already seen.
+    """
+    if node._id not in memo:
+        parent = node.node__parent[0] if node.node__parent else None
+        memo[node._id] = get_ancestors(parent, memo) + [parent._id] if parent else []
+    return memo[node._id]
+
+
+def main(dry_run=True):
+    memo = {}
+    count = 0
+    for node in Node.find():
+        ancestors = get_ancestors(node, memo)
+        if list(node.ancestors) == ancestors:
+            continue
+        logger.info('Setting ancestors of node {0} to {1}'.format(node._id, ancestors))
+        if not dry_run:
+            database['node'].update({'_id': node._id}, {'$set': {'ancestors': ancestors}})
+        count += 1
+    Node._clear_caches()
+    logger.info('Updated {0} node(s)'.format(count))
+    return count
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if dry_run:
+        logger.warn('Dry_run mode')
+    init_app(routes=False)
+    main(dry_run=dry_run)
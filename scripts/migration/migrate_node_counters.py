@@ -0,0 +1,51 @@
+"""
+Recompute the fork, registration, template, watch and pointer counters shown
+in project page headers. Run once to populate the counters of existing nodes,
+and again to repair any that have drifted.
+
+Examples:
+    Dry run:
+        python -m scripts.migration.migrate_node_counters dry
+    Real:
+        python -m scripts.migration.migrate_node_counters
+"""
+import sys
+import logging
+
+from website.app import init_app
+from website.models import Node
+
+logger = logging.getLogger(__name__)
+
+
+def count_related(node):
+    return {
+        'fork_count': len(node.forks),
+        'registration_count': len(node.node__registrations),
+        'templated_count': len(node.templated_list),
+        'watched_count': len(node.watchconfig__watched),
+        'pointed_count': len(node.get_points(deleted=False, folders=False)),
+    }
+
+
+def main(dry_run=True):
+    count = 0
+    for node in Node.find():
+        counters = count_related(node)
+        if all(getattr(node, field) == value for field, value in counters.items()):
+            continue
+        logger.info('Updating counters of node {0}: {1}'.format(node._id, counters))
+        if not dry_run:
+            Node._storage[0].store.update({'_id': node._id}, {'$set': counters})
+        count += 1
+    Node._clear_caches()
+    logger.info('Updated counters of {0} node(s)'.format(count))
+    return count
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if dry_run:
+        logger.warn('Dry_run mode')
+    init_app(routes=False)
+    main(dry_run=dry_run)
@@ -0,0 +1,63 @@
+"""
+Populate the lower-cased lookup fields used for case-insensitive matching of
+tags and conference endpoints: `Tag.key`, `Node.tag_keys` and
+`Conference.endpoint_key`. Until this has run, ``iexact`` queries on tags and
+endpoints match nothing for existing records.
+
+Examples:
+    Dry run:
+        python -m scripts.migration.migrate_normalized_tags dry
+    Real:
+        python -m scripts.migration.migrate_normalized_tags
+"""
+import sys
+import logging
+
+from framework.mongo import database
+from website.app import init_app
+from website.models import Conference, Node, Tag
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(collection, field, normalized_field, dry_run=True):
+    """Set `normalized_field` to the lower-cased value of `field` on every
+    document of `collection` where it differs.
+    """
+    count = 0
+    cursor = database[collection].find({}, {field: True, normalized_field: True})
+    for document in cursor:
+        value = document.get(field) or []
+        if isinstance(value, list):
+            normalized = [each.lower() for each in value]
+        else:
+            normalized = value.lower()
+        if document.get(normalized_field) == normalized:
+            continue
+        if not dry_run:
+            database[collection].update(
+                {'_id': document['_id']},
+                {'$set': {normalized_field: normalized}},
+            )
+        count += 1
+    logger.info('Updated {0} of {1} {2}(s)'.format(count, normalized_field, collection))
+    return count
+
+
+def main(dry_run=True):
+    count = (
+        normalize('tag', '_id', 'key', dry_run=dry_run) +
+        normalize('node', 'tags', 'tag_keys', dry_run=dry_run) +
+        normalize('conference', 'endpoint', 'endpoint_key', dry_run=dry_run)
+    )
+    for model in (Tag, Node, Conference):
+        model._clear_caches()
+    return count
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if dry_run:
+        logger.warn('Dry_run mode')
+    init_app(routes=False)
+    main(dry_run=dry_run)
@@ -0,0 +1,60 @@
+"""
+Store past wiki page versions as reverse deltas against their successors,
+keeping full content only for current versions and every
+`VERSION_SNAPSHOT_INTERVAL`-th version. See `website.addons.wiki.versions`.
+
+Examples:
+    Dry run:
+        python -m scripts.migration.migrate_wiki_versions_to_deltas dry
+    Real:
+        python -m scripts.migration.migrate_wiki_versions_to_deltas
+"""
+import sys
+import logging
+
+from modularodm import Q
+
+from website.app import init_app
+from website.models import Node
+from website.addons.wiki import versions as wiki_versions
+from website.addons.wiki.model import NodeWikiPage
+
+logger = logging.getLogger(__name__)
+
+
+def compress_versions(node, page_ids, dry_run=True):
+    """Compress the versions of a single page of `node`, newest first, so that
+    each delta is computed against a successor that is already in its final
+    form. Versions inherited from the original of a fork or registration are
+    left to be compressed with the original.
+    """
+    pages = [NodeWikiPage.load(page_id) for page_id in page_ids]
+    count = 0
+    for page, successor in reversed(zip(pages[:-1], pages[1:])):
+        if page is None or successor is None:
+            continue
+        if any(each.node is None or each.node._id != node._id for each in (page, successor)):
+            continue
+        if wiki_versions.compress(page, successor, save=not dry_run):
+            count += 1
+    return count
+
+
+def main(dry_run=True):
+    count = 0
+    for node in Node.find(Q('wiki_pages_versions', 'ne', {})):
+        for key, page_ids in node.wiki_pages_versions.items():
+            compressed = compress_versions(node, page_ids, dry_run=dry_run)
+            if compressed:
+                logger.info('Compressed {0} version(s) of page {1} on node {2}'.format(compressed, key, node._id))
+            count += compressed
+    logger.info('Compressed {0} wiki page version(s)'.format(count))
+    return count
+
+
+if __name__ == '__main__':
+    dry_run = 'dry' in sys.argv
+    if dry_run:
+        logger.warn('Dry_run mode')
+    init_app(routes=False)
+    main(dry_run=dry_run)
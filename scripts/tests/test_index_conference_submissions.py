@@ -0,0 +1,33 @@
+from nose.tools import *  # noqa
+
+from framework.auth import Auth
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+from tests.test_conferences import ConferenceFactory
+
+from website.models import ConferenceSubmission
+
+from scripts.migration.index_conference_submissions import main
+
+
+class TestIndexConferenceSubmissions(OsfTestCase):
+
+    def setUp(self):
+        super(TestIndexConferenceSubmissions, self).setUp()
+        self.conference = ConferenceFactory()
+        self.node = ProjectFactory(is_public=True)
+        self.node.add_tag(self.conference.endpoint.upper(), Auth(self.node.creator))
+        ProjectFactory(is_public=True)
+        # Simulate submissions made before listings were stored
+        self.db['conferencesubmission'].remove()
+
+    def test_dry_run(self):
+        assert_equal(main(dry_run=True), 1)
+        assert_equal(ConferenceSubmission.find_page()[0], 0)
+
+    def test_index(self):
+        assert_equal(main(dry_run=False), 1)
+        total, records = ConferenceSubmission.find_page()
+        assert_equal(total, 1)
+        assert_equal(records[0]['node'], self.node._id)
+        assert_equal(records[0]['conference'], self.conference.endpoint)
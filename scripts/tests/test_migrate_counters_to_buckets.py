@@ -0,0 +1,94 @@
+import datetime
+
+from nose.tools import *  # noqa
+
+from framework import analytics
+from tests.base import OsfTestCase
+
+from scripts.migration.migrate_counters_to_buckets import (
+    migrate_page_counters,
+    migrate_user_activity_counters,
+)
+
+
+class TestMigrateCountersToBuckets(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateCountersToBuckets, self).setUp()
+        for collection in ('pagecounters', 'useractivitycounters',
+                           analytics.PAGE_BUCKETS, analytics.USER_ACTIVITY_BUCKETS):
+            self.db[collection].remove()
+        self.db['pagecounters'].insert({
+            '_id': 'node:abc12',
+            'total': 4,
+            'unique': 2,
+            'date': {
+                '2015': {
+                    '09': {'30': {'total': 1, 'unique': 1}},
+                    '10': {'01': {'total': 3, 'unique': 1}},
+                },
+            },
+        })
+        self.db['useractivitycounters'].insert({
+            '_id': 'usr12',
+            'total': 2,
+            'date': {'2015': {'10': {'01': {'total': 2}}}},
+            'action': {
+                'project_created': {
+                    'total': 2,
+                    'date': {'2015': {'10': {'01': 2}}},
+                },
+            },
+        })
+
+    def test_dry_run(self):
+        migrate_page_counters(self.db, dry_run=True)
+        assert_in('date', self.db['pagecounters'].find_one({'_id': 'node:abc12'}))
+        assert_equal(self.db[analytics.PAGE_BUCKETS].count(), 0)
+
+    def test_migrate_page_counters(self):
+        assert_equal(migrate_page_counters(self.db, dry_run=False), 1)
+        counter = self.db['pagecounters'].find_one({'_id': 'node:abc12'})
+        assert_not_in('date', counter)
+        assert_equal(counter['total'], 4)
+        assert_equal(
+            analytics.get_counters_by_date(
+                'node:abc12', datetime.date(2015, 9, 30), datetime.date(2015, 10, 1), db=self.db
+            ),
+            [
+                (datetime.date(2015, 9, 30), 1, 1),
+                (datetime.date(2015, 10, 1), 1, 3),
+            ]
+        )
+
+    def test_migrate_merges_existing_buckets(self):
+        analytics.increment_user_activity_counters(
+            'usr12', 'project_created', datetime.datetime(2015, 10, 1), db=self.db
+        )
+        migrate_user_activity_counters(self.db, dry_run=False)
+        day = datetime.date(2015, 10, 1)
+        assert_equal(analytics.get_user_activity_by_date('usr12', day, day, db=self.db), [(day, 3)])
+        assert_equal(
+            analytics.get_user_activity_by_date('usr12', day, day, action='project_created', db=self.db),
+            [(day, 3)],
+        )
+        counter = self.db['useractivitycounters'].find_one({'_id': 'usr12'})
+        assert_not_in('date', counter)
+        assert_not_in('date', counter['action']['project_created'])
+
+    def test_migrate_again_after_interruption(self):
+        counter = self.db['pagecounters'].find_one({'_id': 'node:abc12'})
+        migrate_page_counters(self.db, dry_run=False)
+        # Interrupted before the dates were removed from the counter
+        self.db['pagecounters'].update({'_id': 'node:abc12'}, {'$set': {'date': counter['date']}})
+        migrate_page_counters(self.db, dry_run=False)
+        assert_not_in('date', self.db['pagecounters'].find_one({'_id': 'node:abc12'}))
+        assert_equal(
+            analytics.get_counters_by_date(
+                'node:abc12', datetime.date(2015, 9, 30), datetime.date(2015, 10, 1), db=self.db
+            ),
+            [
+                (datetime.date(2015, 9, 30), 1, 1),
+                (datetime.date(2015, 10, 1), 1, 3),
+            ]
+        )
@@ -0,0 +1,38 @@
+from nose.tools import *  # noqa
+
+from framework.auth import Auth
+from tests.base import OsfTestCase
+from tests.factories import DashboardFactory, FolderFactory, ProjectFactory, UserFactory
+
+from website.models import Node, User
+
+from scripts.migration.migrate_dashboard_ids import main
+
+
+class TestMigrateDashboardIds(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateDashboardIds, self).setUp()
+        self.user = UserFactory()
+        self.dashboard = DashboardFactory(creator=self.user)
+        self.folder = FolderFactory(creator=self.user)
+        self.project = ProjectFactory(creator=self.user)
+        self.dashboard.add_pointer(self.folder, Auth(self.user))
+        self.dashboard.add_pointer(self.project, Auth(self.user))
+        # Simulate records saved before the fields were added
+        self.db['user'].update({}, {'$unset': {'dashboard_id': ''}}, multi=True)
+        self.db['node'].update({}, {'$unset': {'pointer_node_ids': ''}}, multi=True)
+        User._clear_caches()
+        Node._clear_caches()
+
+    def test_dry_run(self):
+        assert_equal(main(dry_run=True), (1, 1))
+        assert_is_none(User.load(self.user._id).dashboard_id)
+
+    def test_migrate(self):
+        assert_equal(main(dry_run=False), (1, 1))
+        assert_equal(User.load(self.user._id).dashboard_id, self.dashboard._id)
+        assert_equal(
+            Node.load(self.dashboard._id).pointer_node_ids,
+            [self.folder._id, self.project._id],
+        )
@@ -0,0 +1,33 @@
+from nose.tools import *  # noqa
+
+from tests.base import OsfTestCase
+from tests.factories import NodeFactory, ProjectFactory
+
+from website.models import Node
+
+from scripts.migration.migrate_node_ancestors import main
+
+
+class TestMigrateNodeAncestors(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateNodeAncestors, self).setUp()
+        self.project = ProjectFactory()
+        self.component = NodeFactory(parent=self.project)
+        self.subcomponent = NodeFactory(parent=self.component)
+        # Simulate nodes created before ancestors were tracked
+        self.db['node'].update({}, {'$unset': {'ancestors': True}}, multi=True)
+        Node._clear_caches()
+
+    def test_dry_run(self):
+        assert_equal(main(dry_run=True), 2)
+        assert_equal(Node.load(self.subcomponent._id).ancestors, [])
+
+    def test_migrate(self):
+        assert_equal(main(dry_run=False), 2)
+        assert_equal(Node.load(self.component._id).ancestors, [self.project._id])
+        assert_equal(
+            Node.load(self.subcomponent._id).ancestors,
+            [self.project._id, self.component._id],
+        )
+        assert_equal(main(dry_run=False), 0)
@@ -0,0 +1,33 @@
+from nose.tools import *  # noqa
+
+from framework.auth import Auth
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+
+from website.models import Node
+
+from scripts.migration.migrate_node_counters import main
+
+
+class TestMigrateNodeCounters(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateNodeCounters, self).setUp()
+        self.project = ProjectFactory()
+        self.auth = Auth(self.project.creator)
+        self.project.fork_node(self.auth)
+        ProjectFactory().add_pointer(self.project, self.auth)
+        # Simulate nodes created before counters were stored
+        self.db['node'].update({}, {'$unset': {'fork_count': '', 'pointed_count': ''}}, multi=True)
+        Node._clear_caches()
+
+    def test_dry_run(self):
+        assert_equal(main(dry_run=True), 1)
+        assert_equal(Node.load(self.project._id).fork_count, 0)
+
+    def test_migrate(self):
+        assert_equal(main(dry_run=False), 1)
+        project = Node.load(self.project._id)
+        assert_equal(project.fork_count, 1)
+        assert_equal(project.pointed_count, 1)
+        assert_equal(main(dry_run=False), 0)
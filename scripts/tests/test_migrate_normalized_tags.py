@@ -0,0 +1,38 @@
+from modularodm import Q
+from nose.tools import *  # noqa
+
+from framework.auth import Auth
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+from tests.test_conferences import ConferenceFactory
+
+from website.models import Conference, Node, Tag
+
+from scripts.migration.migrate_normalized_tags import main
+
+
+class TestMigrateNormalizedTags(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateNormalizedTags, self).setUp()
+        self.conference = ConferenceFactory(endpoint='SPSP2015')
+        self.node = ProjectFactory()
+        self.node.add_tag('SpSp2015', Auth(self.node.creator))
+        # Simulate records created before tags were normalized
+        self.db['tag'].update({}, {'$unset': {'key': True}}, multi=True)
+        self.db['node'].update({}, {'$unset': {'tag_keys': True}}, multi=True)
+        self.db['conference'].update({}, {'$unset': {'endpoint_key': True}}, multi=True)
+        for model in (Tag, Node, Conference):
+            model._clear_caches()
+
+    def test_dry_run(self):
+        assert_equal(main(dry_run=True), 2 + Node.find().count())
+        assert_equal(Tag.find(Q('_id', 'iexact', 'spsp2015')).count(), 0)
+
+    def test_migrate(self):
+        # Nodes without tags get an empty list of keys
+        assert_equal(main(dry_run=False), 2 + Node.find().count())
+        assert_equal(Tag.find_one(Q('_id', 'iexact', 'spsp2015'))._id, 'SpSp2015')
+        assert_equal(Node.find_one(Q('tags', 'iexact', 'SPSP2015'))._id, self.node._id)
+        assert_equal(Conference.find_one(Q('endpoint', 'iexact', 'spsp2015'))._id, 'SPSP2015')
+        assert_equal(main(dry_run=False), 0)
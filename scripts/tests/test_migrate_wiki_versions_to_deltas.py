@@ -0,0 +1,57 @@
+import mock
+from nose.tools import *  # noqa
+
+from framework.auth import Auth
+from tests.base import OsfTestCase
+from tests.factories import ProjectFactory
+
+from website.addons.wiki import settings as wiki_settings
+from website.addons.wiki.model import NodeWikiPage
+
+from scripts.migration.migrate_wiki_versions_to_deltas import main
+
+
+class TestMigrateWikiVersionsToDeltas(OsfTestCase):
+
+    def setUp(self):
+        super(TestMigrateWikiVersionsToDeltas, self).setUp()
+        self.project = ProjectFactory()
+        auth = Auth(self.project.creator)
+        lines = ['Line {0} of a long wiki page\n'.format(i) for i in range(20)]
+        self.texts = []
+        # Store every version in full, as before deltas were introduced
+        with mock.patch.object(wiki_settings, 'VERSION_SNAPSHOT_INTERVAL', 1):
+            for i in range(5):
+                lines[i] = 'Edit {0}\n'.format(i)
+                self.texts.append(''.join(lines))
+                self.project.update_node_wiki('home', self.texts[-1], auth)
+        self.page_ids = self.project.wiki_pages_versions['home']
+
+    def stored_content(self):
+        return [
+            self.db['nodewikipage'].find_one({'_id': page_id})['content']
+            for page_id in self.page_ids
+        ]
+
+    def test_dry_run(self):
+        main(dry_run=True)
+        assert_equal(self.stored_content(), self.texts)
+
+    def test_migrate(self):
+        assert_equal(main(dry_run=False), 4)
+        assert_equal(self.stored_content(), [None] * 4 + [self.texts[-1]])
+        NodeWikiPage._clear_caches()
+        for version, text in enumerate(self.texts, 1):
+            assert_equal(self.project.get_wiki_page('home', version).content, text)
+        # Running again is a no-op
+        assert_equal(main(dry_run=False), 0)
+
+    def test_fork_does_not_compress_original(self):
+        auth = Auth(self.project.creator)
+        fork = self.project.fork_node(auth)
+        fork.update_node_wiki('home', 'Forked', auth)
+        assert_equal(main(dry_run=False), 4)
+        assert_equal(self.stored_content(), [None] * 4 + [self.texts[-1]])
+        NodeWikiPage._clear_caches()
+        assert_equal(self.project.get_wiki_page('home').content, self.texts[-1])
+        assert_equal(fork.get_wiki_page('home').content, 'Forked')
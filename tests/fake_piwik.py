@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""In-memory stand-in for the Piwik API, served with httpretty."""
+import re
+import json
+import urlparse
+import collections
+
+import httpretty
+
+BULK_PARAM_RE = re.compile(r'^urls\[(\d+)\]$')
+
+
+def _single_values(params):
+    return dict((key, values[0]) for key, values in params.items())
+
+
+class FakePiwik(object):
+    """Answers the Piwik API calls made by `framework.analytics.piwik` at
+    `url`. Users must exist (see `add_user`) before they are given access,
+    as in Piwik.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.users = set()
+        self.sites = {}
+        # {<site id>: {<login>: <access>}}
+        self.access = collections.defaultdict(dict)
+        # API method of each HTTP request received
+        self.requests = []
+
+    def register(self):
+        httpretty.register_uri(httpretty.POST, self.url, body=self.handle)
+
+    def add_user(self, login):
+        self.users.add(login)
+
+    def handle(self, request, uri, headers):
+        params = _single_values(urlparse.parse_qs(request.body))
+        self.requests.append(params['method'])
+        return 200, headers, json.dumps(self.call(params))
+
+    def call(self, params):
+        method = params['method']
+        if method == 'API.getBulkRequest':
+            calls = sorted(
+                (int(BULK_PARAM_RE.match(key).group(1)), value)
+                for key, value in params.items() if BULK_PARAM_RE.match(key)
+            )
+            return [self.call(_single_values(urlparse.parse_qs(query))) for _, query in calls]
+        if method == 'UsersManager.addUser':
+            self.add_user(params['userLogin'])
+            return {'result': 'success', 'message': 'ok'}
+        if method == 'SitesManager.addSite':
+            site_id = str(len(self.sites) + 1)
+            self.sites[site_id] = params['siteName']
+            return {'value': site_id}
+        if method == 'UsersManager.getUsersWithSiteAccess':
+            return [
+                {'login': login}
+                for login, access in self.access[params['idSite']].items()
+                if access == params['access']
+            ]
+        if method == 'UsersManager.setUserAccess':
+            login = params['userLogin']
+            if login != 'anonymous' and login not in self.users:
+                return {'result': 'error', 'message': 'User {0} does not exist'.format(login)}
+            site_access = self.access[params['idSites']]
+            if params['access'] == 'noaccess':
+                site_access.pop(login, None)
+            else:
+                site_access[login] = params['access']
+            return {'result': 'success', 'message': 'ok'}
+        return {'result': 'error', 'message': 'Unknown method {0}'.format(method)}
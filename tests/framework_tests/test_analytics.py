@@ -8,9 +8,10 @@ import unittest
 from nose.tools import *  # flake8: noqa  (PEP8 asserts)
 from flask import Flask
 
-from datetime import datetime
+from datetime import datetime, date, timedelta
 
 from framework import analytics, sessions
+from framework.analytics import timeseries
 from framework.sessions import session
 
 from tests.base import OsfTestCase
@@ -39,6 +40,68 @@ class TestAnalytics(OsfTestCase):
         analytics.increment_user_activity_counters(user._id, 'project_created', date, db=self.db)
         assert_equal(user.get_activity_points(db=self.db), 1)
 
+    def test_get_user_activity_by_date(self):
+        user = UserFactory()
+        now = datetime.utcnow()
+        analytics.increment_user_activity_counters(user._id, 'project_created', now, db=self.db)
+        analytics.increment_user_activity_counters(user._id, 'comment_added', now, db=self.db)
+
+        today = now.date()
+        yesterday = today - timedelta(days=1)
+        assert_equal(
+            analytics.get_user_activity_by_date(user._id, yesterday, today, db=self.db),
+            [(yesterday, 0), (today, 2)],
+        )
+        assert_equal(
+            analytics.get_user_activity_by_date(user._id, today, today, action='comment_added', db=self.db),
+            [(today, 1)],
+        )
+
+    def test_activity_counter_stores_no_date_keys(self):
+        user = UserFactory()
+        analytics.increment_user_activity_counters(user._id, 'project_created', datetime.utcnow(), db=self.db)
+        counter = self.db['useractivitycounters'].find_one({'_id': user._id})
+        assert_not_in('date', counter)
+        assert_not_in('date', counter['action']['project_created'])
+
+
+class TestTimeSeries(OsfTestCase):
+
+    def setUp(self):
+        super(TestTimeSeries, self).setUp()
+        self.collection = self.db['testbuckets']
+
+    def test_increment_preallocates_bucket(self):
+        timeseries.increment(self.collection, 'page', date(2015, 10, 3), {'total': 2, 'unique': 1})
+        bucket = self.collection.find_one({'_id': 'page:2015/10'})
+        assert_equal(len(bucket['total']), timeseries.DAYS_PER_BUCKET)
+        assert_equal(bucket['total'][2], 2)
+        assert_equal(bucket['unique'][2], 1)
+        assert_equal(sum(bucket['total']), 2)
+
+    def test_increment_existing_bucket(self):
+        timeseries.increment(self.collection, 'page', date(2015, 10, 3), {'total': 1})
+        timeseries.increment(self.collection, 'page', date(2015, 10, 31), {'total': 1})
+        timeseries.increment(self.collection, 'page', date(2015, 10, 3), {'total': 1})
+        assert_equal(self.collection.count(), 1)
+        bucket = self.collection.find_one({'_id': 'page:2015/10'})
+        assert_equal(bucket['total'][2], 2)
+        assert_equal(bucket['total'][30], 1)
+
+    def test_get_range_spans_months(self):
+        timeseries.increment(self.collection, 'page', date(2015, 12, 31), {'total': 3, 'unique': 1})
+        timeseries.increment(self.collection, 'page', date(2016, 1, 1), {'total': 1})
+        result = timeseries.get_range(self.collection, 'page', date(2015, 12, 30), date(2016, 1, 2))
+        assert_equal(result, [
+            (date(2015, 12, 30), 0, 0),
+            (date(2015, 12, 31), 1, 3),
+            (date(2016, 1, 1), 0, 1),
+            (date(2016, 1, 2), 0, 0),
+        ])
+
+    def test_get_range_empty(self):
+        assert_equal(timeseries.get_range(self.collection, 'page', date(2015, 1, 2), date(2015, 1, 1)), [])
+
 
 class UpdateCountersTestCase(OsfTestCase):
 
@@ -116,6 +179,22 @@ class TestUpdateCounters(UpdateCountersTestCase):
         count = analytics.get_basic_counters(page, db=self.db)
         assert_equal(count, (3, 5))
 
+    def test_get_counters_by_date(self):
+        @analytics.update_counters('node:{target_id}', db=self.db)
+        def view_node_(**kwargs):
+            return kwargs.get('node')
+
+        view_node_(node=self.node)
+        view_node_(node=self.node)
+
+        today = datetime.utcnow().date()
+        page = 'node:{0}'.format(self.node._id)
+        assert_equal(
+            analytics.get_counters_by_date(page, today, today, db=self.db),
+            [(today, 1, 2)],
+        )
+        assert_not_in('date', self.db['pagecounters'].find_one({'_id': page}))
+
     @unittest.skip('Reverted the fix for #2281. Unskip this once we use GUIDs for keys in the download counts collection')
     def test_update_counters_different_files(self):
         # Regression test for https://github.com/CenterForOpenScience/osf.io/issues/2281
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
+import smtpd
+import asyncore
 import unittest
 import smtplib
+import threading
 
+import mock
 from nose.tools import *  # PEP8 asserts
 
-from framework.email.tasks import send_email
+from framework.email import tasks
+from framework.email.tasks import send_email, send_emails
 from website import settings
 
 # Check if local mail server is running
@@ -27,5 +32,80 @@ class TestEmail(unittest.TestCase):
                                  message="<h1>Greetings!</h1>", ttls=False, login=False))
 
 
+class RecordingSMTPServer(smtpd.SMTPServer):
+    """Local stand-in SMTP server that records connections and messages."""
+
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('localhost', 0), None)
+        self.connections = 0
+        self.messages = []
+
+    @property
+    def address(self):
+        return '{0}:{1}'.format(*self.socket.getsockname())
+
+    def handle_accept(self):
+        self.connections += 1
+        smtpd.SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.messages.append((mailfrom, rcpttos, data))
+
+
+class TestPooledEmail(unittest.TestCase):
+
+    def setUp(self):
+        self.server = RecordingSMTPServer()
+        self.thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.1})
+        self.thread.daemon = True
+        self.thread.start()
+        self.pool = tasks.SMTPConnectionPool()
+        self.patcher = mock.patch('framework.email.tasks.pool', self.pool)
+        self.patcher.start()
+        self.use_email = settings.USE_EMAIL
+        settings.USE_EMAIL = True
+
+    def tearDown(self):
+        settings.USE_EMAIL = self.use_email
+        self.pool.close()
+        self.patcher.stop()
+        self.server.close()
+        self.thread.join(1)
+
+    def send(self, to_addr):
+        return send_email('foo@bar.com', to_addr, subject='no subject', message='<h1>Greetings!</h1>',
+                          ttls=False, login=False, mail_server=self.server.address)
+
+    def test_send_email_reuses_connection(self):
+        assert_true(self.send('baz@quux.com'))
+        assert_true(self.send('qux@quux.com'))
+        assert_equal(self.server.connections, 1)
+        assert_equal([rcpttos for _, rcpttos, _ in self.server.messages], [['baz@quux.com'], ['qux@quux.com']])
+
+    def test_send_email_reconnects_after_disconnect(self):
+        self.send('baz@quux.com')
+        connection = self.pool.get(self.server.address, False, False, settings.MAIL_USERNAME, None)
+        connection.close()
+        assert_true(self.send('qux@quux.com'))
+        assert_equal(self.server.connections, 2)
+        assert_equal(len(self.server.messages), 2)
+
+    def test_send_emails_batch(self):
+        messages = [
+            {
+                'from_addr': 'foo@bar.com',
+                'to_addr': 'user{0}@quux.com'.format(i),
+                'subject': 'no subject',
+                'message': 'Greetings!',
+                'mimetype': 'plain',
+            }
+            for i in range(5)
+        ]
+        sent = send_emails(messages, ttls=False, login=False, mail_server=self.server.address)
+        assert_equal(sent, 5)
+        assert_equal(self.server.connections, 1)
+        assert_equal(len(self.server.messages), 5)
+
+
 if __name__ == '__main__':
     unittest.main()
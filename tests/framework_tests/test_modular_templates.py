@@ -14,7 +14,8 @@ import werkzeug.wrappers
 from framework.exceptions import HTTPError, http
 from framework.routing import (
     Renderer, JSONRenderer, WebRenderer,
-    render_mako_string,
+    render_mako_string, compile_mod_meta,
+    MOD_META_START, MOD_META_END,
 )
 
 from tests.base import AppTestCase, OsfTestCase
@@ -318,6 +319,94 @@ class WebRendererTemplateTestCase(OsfTestCase):
             result,
         )
 
+    def test_nested_templates_not_replaced(self):
+        self.app.app.preprocess_request()
+
+        r = WebRenderer(
+            'nested_child.html',
+            render_mako_string,
+            template_dir=TEMPLATES_PATH,
+        )
+        rendered = r.compose(
+            ''.join((
+                '<body>',
+                MOD_META_START,
+                "<div mod-meta='",
+                '{"tpl":"nested_child.html"}',
+                "'></div>",
+                MOD_META_END,
+                '<span>after</span></body>',
+            )),
+            data={},
+        )
+
+        self.assertIn('><p>child template content</p></div><span>after</span>', rendered)
+        self.assertNotIn(MOD_META_START, rendered)
+
+    def test_uncompiled_embeds_fall_back_to_parsing(self):
+        self.app.app.preprocess_request()
+
+        r = WebRenderer(
+            'nested_child.html',
+            render_mako_string,
+            template_dir=TEMPLATES_PATH,
+        )
+        rendered = r.compose(
+            '<body><div mod-meta=\'{"tpl":"nested_child.html","replace": true}\'></div></body>',
+            data={},
+        )
+
+        self.assertEqual('<body><p>child template content</p></body>', rendered)
+
+    def test_embed_timings_recorded(self):
+        self.app.app.preprocess_request()
+
+        r = WebRenderer(
+            'nested_parent.html',
+            render_mako_string,
+            template_dir=TEMPLATES_PATH,
+        )
+        r({})
+
+        timings = flask.g.mod_meta_timings
+        self.assertEqual(1, len(timings))
+        self.assertEqual('nested_child.html', timings[0]['tpl'])
+
+
+class CompileModMetaTestCase(unittest.TestCase):
+
+    def test_wraps_embed(self):
+        source = "<p>\n<div mod-meta='{\"tpl\": \"child.mako\"}'></div>\n</p>"
+        self.assertEqual(
+            compile_mod_meta(source),
+            "<p>\n" + MOD_META_START + "<div mod-meta='{\"tpl\": \"child.mako\"}'></div>" + MOD_META_END + "\n</p>",
+        )
+
+    def test_mako_expression_with_quotes(self):
+        source = (
+            "<div class=\"m-md\" mod-meta='{\n"
+            "    \"uri\": \"${summary['api_url']}contributors/\",\n"
+            "    \"kwargs\": {\"user\": ${ {'a': 1} | n }}\n"
+            "}'>\n</div>"
+        )
+        compiled = compile_mod_meta(source)
+        self.assertTrue(compiled.startswith(MOD_META_START + '<div class'))
+        self.assertTrue(compiled.endswith('</div>' + MOD_META_END))
+
+    def test_commented_embed_ignored(self):
+        source = "##<div mod-meta='{\"tpl\": \"child.mako\"}'></div>\n<p></p>"
+        self.assertEqual(compile_mod_meta(source), source)
+
+    def test_embed_with_content_ignored(self):
+        source = "<div mod-meta='{\"tpl\": \"child.mako\"}'><span></span></div>"
+        self.assertEqual(compile_mod_meta(source), source)
+
+    def test_multiple_embeds(self):
+        embed = "<div mod-meta='{}'></div>"
+        compiled = compile_mod_meta(embed + '<p></p>' + embed)
+        self.assertEqual(compiled.count(MOD_META_START), 2)
+        self.assertEqual(compiled.count(MOD_META_END), 2)
+
 
 class JSONRendererEncoderTestCase(unittest.TestCase):
 
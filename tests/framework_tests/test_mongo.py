@@ -5,9 +5,10 @@ from unittest import TestCase
 
 from nose.tools import *  # flake8: noqa
 
+from modularodm import Q
 from modularodm.exceptions import ValidationError, ValidationValueError
 
-from framework.mongo import validators
+from framework.mongo import validators, normalize_query
 
 class TestValidators(TestCase):
 
@@ -62,3 +63,18 @@ class TestValidators(TestCase):
 
         with assert_raises(ValidationError):
             new_validator({'k': 'v', 'k2': 'v2'})
+
+
+class TestNormalizeQuery(TestCase):
+
+    def test_iexact_on_normalized_field(self):
+        query = Q('tags', 'iexact', 'SPSP') & (Q('title', 'iexact', 'Foo') | Q('tags', 'eq', 'Bar'))
+        normalize_query(query, {'tags': 'tag_keys'})
+        first, group = query.nodes
+        assert_equal(
+            (first.attribute, first.operator, first.argument),
+            ('tag_keys', 'eq', 'spsp'),
+        )
+        title, tags = group.nodes
+        assert_equal((title.attribute, title.operator), ('title', 'iexact'))
+        assert_equal((tags.attribute, tags.operator), ('tags', 'eq'))
@@ -11,6 +11,7 @@ import jwt
 import furl
 import itsdangerous
 from modularodm import storage
+from requests.exceptions import Timeout
 
 from framework.auth import cas
 from framework.auth import signing
@@ -25,7 +26,7 @@ from website.files.models.base import PROVIDER_MAP
 from website.util import api_url_for, rubeus
 from website.project import new_private_link
 from website.project.views.node import _view_project as serialize_node
-from website.addons.base import AddonConfig, AddonNodeSettingsBase, views
+from website.addons.base import AddonConfig, AddonNodeSettingsBase, hooks, views
 from website.addons.github.model import AddonGitHubOauthSettings
 from tests.base import OsfTestCase
 from tests.factories import AuthUserFactory, ProjectFactory
@@ -879,3 +880,99 @@ class TestLegacyViews(OsfTestCase):
             provider='mycooladdon',
         )
         assert_urls_equal(res.location, expected_url)
+
+
+class FakeHookAddon(object):
+
+    def __init__(self, short_name, messages=None, delay=0, error=None):
+        self.config = mock.Mock(short_name=short_name)
+        self.messages = messages
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def before_page_load(self, node, user):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.messages
+
+
+class TestBeforePageLoadHooks(OsfTestCase):
+
+    def setUp(self):
+        super(TestBeforePageLoadHooks, self).setUp()
+        self.project = ProjectFactory()
+        self.user = self.project.creator
+        hooks.clear_cache()
+
+    def tearDown(self):
+        super(TestBeforePageLoadHooks, self).tearDown()
+        hooks.clear_cache()
+
+    def run_hooks(self, addons):
+        with mock.patch.object(self.project, 'get_addons', return_value=addons):
+            return hooks.before_page_load(self.project, self.user)
+
+    def test_messages_in_addon_order(self):
+        addons = [
+            FakeHookAddon('slow', ['slow'], delay=0.1),
+            FakeHookAddon('none', None),
+            FakeHookAddon('fast', ['fast']),
+        ]
+        assert_equal(self.run_hooks(addons), ['slow', 'fast'])
+
+    def test_results_cached(self):
+        addon = FakeHookAddon('github', ['warning'])
+        assert_equal(self.run_hooks([addon]), ['warning'])
+        assert_equal(self.run_hooks([addon]), ['warning'])
+        assert_equal(addon.calls, 1)
+        # Changing the privacy of the node invalidates cached results
+        self.project.is_public = not self.project.is_public
+        self.run_hooks([addon])
+        assert_equal(addon.calls, 2)
+
+    @mock.patch('website.addons.base.hooks.settings.ADDON_HOOK_CACHE_TTL', -1)
+    def test_results_expire(self):
+        addon = FakeHookAddon('github', ['warning'])
+        self.run_hooks([addon])
+        self.run_hooks([addon])
+        assert_equal(addon.calls, 2)
+
+    @mock.patch('website.addons.base.hooks.settings.ADDON_HOOK_WORKERS', 4)
+    @mock.patch('website.addons.base.hooks.settings.ADDON_HOOK_TIMEOUT', 0.1)
+    def test_slow_hook_skipped(self):
+        slow = FakeHookAddon('slow', ['slow'], delay=0.5)
+        fast = FakeHookAddon('fast', ['fast'])
+        start = time.time()
+        assert_equal(self.run_hooks([slow, fast]), ['fast'])
+        assert_less(time.time() - start, 0.4)
+        timings = dict((each['addon'], each) for each in hooks.g.addon_hook_timings)
+        assert_true(timings['slow']['timed_out'])
+        assert_false(timings['fast']['timed_out'])
+        # The late result is cached for the next page load
+        time.sleep(0.5)
+        assert_equal(self.run_hooks([slow, fast]), ['slow', 'fast'])
+
+    def test_slow_hook_times_out_serially(self):
+        assert_equal(settings.ADDON_HOOK_WORKERS, 1)
+        slow = FakeHookAddon('slow', delay=0.1, error=Timeout())
+        fast = FakeHookAddon('fast', ['fast'])
+        assert_equal(self.run_hooks([slow, fast]), ['fast'])
+        timings = dict((each['addon'], each) for each in hooks.g.addon_hook_timings)
+        assert_true(timings['slow']['timed_out'])
+        assert_greater_equal(timings['slow']['elapsed'], 0.1)
+        assert_false(timings['fast']['timed_out'])
+
+    def test_failing_hook_skipped(self):
+        addons = [
+            FakeHookAddon('broken', error=ApiError()),
+            FakeHookAddon('fast', ['fast']),
+        ]
+        assert_equal(self.run_hooks(addons), ['fast'])
+
+    @mock.patch('website.addons.base.hooks.settings.ADDON_HOOK_WORKERS', 4)
+    def test_concurrent(self):
+        addons = [FakeHookAddon('github', ['warning']), FakeHookAddon('fast', ['fast'])]
+        assert_equal(self.run_hooks(addons), ['warning', 'fast'])
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import json
+
+import mock
+import httpretty
+import requests
+from nose.tools import *  # noqa
+
+from tests.base import OsfTestCase
+
+from website.addons.base import http_client
+
+URL = 'https://api.example.com/items'
+
+
+class TestAddonHTTPClient(OsfTestCase):
+
+    def setUp(self):
+        super(TestAddonHTTPClient, self).setUp()
+        http_client.clear_cache()
+        self.session = http_client.get_session('example')
+        sleep_patcher = mock.patch('website.addons.base.http_client.time.sleep')
+        self.mock_sleep = sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+    def register(self, method, *responses):
+        httpretty.register_uri(method, URL, responses=[
+            httpretty.Response(**response) for response in responses
+        ])
+
+    def test_sessions_not_shared(self):
+        session = http_client.get_session('example')
+        assert_is_not(session, self.session)
+        assert_is(session.get_adapter(URL), self.session.get_adapter(URL))
+        assert_is_not(http_client.get_session('other').get_adapter(URL), self.session.get_adapter(URL))
+
+    def test_cookies_not_shared(self):
+        self.register(httpretty.GET, {'body': 'ok', 'status': 200, 'adding_headers': {'Set-Cookie': 'user=1'}})
+        self.session.get(URL)
+        assert_equal(len(http_client.get_session('example').cookies), 0)
+
+    def test_mount_shares_adapter(self):
+        session = http_client.mount(requests.Session(), 'example')
+        assert_is(session.get_adapter(URL), self.session.get_adapter(URL))
+
+    def test_retries_server_errors(self):
+        self.register(httpretty.GET, {'body': '', 'status': 503}, {'body': 'ok', 'status': 200})
+        res = self.session.get(URL)
+        assert_equal(res.status_code, 200)
+        assert_equal(res.content, 'ok')
+        self.mock_sleep.assert_called_once_with(http_client.retry_delay(0))
+
+    def test_gives_up_after_retries(self):
+        self.register(httpretty.GET, {'body': '', 'status': 502})
+        res = self.session.get(URL)
+        assert_equal(res.status_code, 502)
+        assert_equal(self.mock_sleep.call_count, http_client.settings.ADDON_HTTP_RETRIES)
+
+    def test_honors_retry_after(self):
+        self.register(
+            httpretty.GET,
+            {'body': '', 'status': 429, 'adding_headers': {'Retry-After': '3'}},
+            {'body': 'ok', 'status': 200},
+        )
+        assert_equal(self.session.get(URL).status_code, 200)
+        self.mock_sleep.assert_called_once_with(3.0)
+
+    def test_does_not_retry_non_idempotent_server_errors(self):
+        self.register(httpretty.POST, {'body': '', 'status': 500}, {'body': 'ok', 'status': 200})
+        assert_equal(self.session.post(URL).status_code, 500)
+        assert_false(self.mock_sleep.called)
+
+    def test_retries_rate_limited_posts(self):
+        self.register(httpretty.POST, {'body': '', 'status': 429}, {'body': 'ok', 'status': 200})
+        assert_equal(self.session.post(URL).status_code, 200)
+
+    def test_does_not_retry_oauth1_requests(self):
+        self.register(httpretty.GET, {'body': '', 'status': 503}, {'body': 'ok', 'status': 200})
+        headers = {'Authorization': 'OAuth oauth_nonce="123", oauth_token="abc"'}
+        assert_equal(self.session.get(URL, headers=headers).status_code, 503)
+        assert_false(self.mock_sleep.called)
+
+    @mock.patch('requests.adapters.HTTPAdapter.send')
+    def test_session_timeout(self, mock_send):
+        mock_send.side_effect = requests.exceptions.Timeout
+        session = http_client.get_session('example', timeout=2)
+        with assert_raises(requests.exceptions.Timeout):
+            session.get(URL)
+        # Requests sent with a timeout are not retried
+        assert_equal(mock_send.call_count, 1)
+        assert_equal(mock_send.call_args[1]['timeout'], 2)
+        # Unless the call sets its own
+        with assert_raises(requests.exceptions.Timeout):
+            session.get(URL, timeout=5)
+        assert_equal(mock_send.call_args[1]['timeout'], 5)
+
+    def test_revalidates_cached_responses(self):
+        body = json.dumps({'items': [1, 2]})
+        self.register(
+            httpretty.GET,
+            {'body': body, 'status': 200, 'adding_headers': {'ETag': '"v1"'}},
+            {'body': '', 'status': 304},
+        )
+        assert_equal(self.session.get(URL).json(), {'items': [1, 2]})
+        hits = http_client.stats['cache_hits']
+        res = self.session.get(URL)
+        assert_equal(httpretty.last_request().headers['If-None-Match'], '"v1"')
+        assert_equal(res.status_code, 200)
+        assert_equal(res.json(), {'items': [1, 2]})
+        assert_equal(http_client.get_metrics()['cache_hits'], hits + 1)
+
+    def test_cache_is_per_credentials(self):
+        self.register(
+            httpretty.GET,
+            {'body': 'mine', 'status': 200, 'adding_headers': {'ETag': '"v1"'}},
+            {'body': 'theirs', 'status': 200},
+        )
+        self.session.get(URL, headers={'Authorization': 'Bearer mine'})
+        res = self.session.get(URL, headers={'Authorization': 'Bearer theirs'})
+        assert_not_in('If-None-Match', httpretty.last_request().headers)
+        assert_equal(res.content, 'theirs')
+
+    def test_oauth1_cache_key_uses_token(self):
+        signed = 'OAuth oauth_nonce="{0}", oauth_token="token"'
+        first = requests.Request('GET', URL, headers={'Authorization': signed.format(1)}).prepare()
+        second = requests.Request('GET', URL, headers={'Authorization': signed.format(2)}).prepare()
+        assert_equal(http_client.cache_key('example', first), http_client.cache_key('example', second))
+
+
+class TestRateBudget(OsfTestCase):
+
+    @mock.patch('website.addons.base.http_client.time')
+    def test_waits_when_over_budget(self, mock_time):
+        mock_time.time.return_value = 100.0
+        budget = http_client.RateBudget(2)
+        assert_equal(budget.acquire(), 0)
+        assert_equal(budget.acquire(), 0)
+        assert_equal(budget.acquire(), 0.5)
+        mock_time.sleep.assert_called_once_with(0.5)
+        # Tokens refill over time
+        mock_time.time.return_value = 102.0
+        assert_equal(budget.acquire(), 0)
+
+    def test_unlimited_providers(self):
+        with mock.patch.dict(http_client.settings.ADDON_HTTP_RATE_LIMITS, clear=True):
+            assert_is_none(http_client.get_budget('unlimited'))
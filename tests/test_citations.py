@@ -1,12 +1,16 @@
 # -*- coding: utf-8 -*-
 
 import datetime
+import mock
 from nose.tools import *  # noqa
 
 from scripts import parse_citation_styles
 from framework.auth.core import Auth
 from website.util import api_url_for
 from website.citations.utils import datetime_to_csl
+from website import settings
+from website.citations import render
+from website.citations.models import CachedCitation, CitationLibrary, CitationStyle
 from website.models import Node, User
 from flask import redirect
 
@@ -163,3 +167,177 @@ class CitationsViewsTestCase(OsfTestCase):
         response = self.app.get("/api/v1" + "/project/" + node._id + "/citation/", auto_follow=True, auth=user.auth)
         assert_true(response.json)
 
+    def test_list_styles_matches_word_prefixes(self):
+        response = self.app.get(api_url_for('list_citation_styles', q='Americ Medic'))
+        ids = [style['id'] for style in response.json['styles']]
+        assert_in('american-medical-association', ids)
+        assert_not_in('bibtex', ids)
+
+    def test_style_search_keys(self):
+        style = CitationStyle(_id='my-style', title=u'Journal of Tests (Author-Date)')
+        style.save()
+        assert_equal(style.search_keys, ['author', 'date', 'journal', 'my', 'of', 'style', 'tests'])
+
+    def test_node_citation_rendered(self):
+        node = ProjectFactory(title='A Citable Project', is_public=True)
+        response = self.app.get(api_url_for('node_citation_rendered', pid=node._id, style='apa'))
+        assert_equal(response.json['style'], 'apa')
+        assert_in('A Citable Project', response.json['citation'])
+
+    def test_node_citation_rendered_unknown_style(self):
+        node = ProjectFactory(is_public=True)
+        url = api_url_for('node_citation_rendered', pid=node._id, style='not-a-style')
+        response = self.app.get(url, expect_errors=True)
+        assert_equal(response.status_code, 404)
+
+    @mock.patch('website.citations.render.CitationStylesStyle', wraps=render.CitationStylesStyle)
+    def test_styles_are_compiled_once(self, mock_style):
+        render.clear_cache()
+        node = ProjectFactory()
+        render.render_node_citations([node], 'apa')
+        render.render_node_citations([node], 'apa')
+        assert_equal(mock_style.call_count, 1)
+
+    def test_render_citations_batch(self):
+        user = AuthUserFactory()
+        mine = ProjectFactory(creator=user)
+        public = ProjectFactory(is_public=True)
+        private = ProjectFactory()
+        response = self.app.post_json(
+            api_url_for('render_citations', format='text'),
+            {'style': 'apa', 'nodes': [mine._id, public._id, private._id]},
+            auth=user.auth,
+        )
+        citations = response.json['citations']
+        assert_equal(set(citations), {mine._id, public._id})
+        assert_in(public.title, citations[public._id])
+        assert_not_in('<', citations[mine._id])
+
+    def test_render_citations_batch_limit(self):
+        nodes = ['abc12'] * (settings.CITATION_RENDER_MAX_NODES + 1)
+        response = self.app.post_json(
+            api_url_for('render_citations'),
+            {'style': 'apa', 'nodes': nodes},
+            expect_errors=True,
+        )
+        assert_equal(response.status_code, 400)
+
+
+
+class FakeCitationsProvider(object):
+    """Provider whose library is `documents`, at version `version`"""
+
+    def __init__(self):
+        self.account = mock.Mock(_id='account')
+        self.documents = {}
+        self.deleted = []
+        self.version = '1'
+        self.folders = {}
+        self.calls = []
+        # Changes returned per sync, if limited
+        self.limit = None
+
+    def fetch_citation_changes(self, version):
+        self.calls.append(version)
+        changed = sorted(
+            (
+                document for document in self.documents.values()
+                if version is None or document['version'] > version
+            ),
+            key=lambda document: document['version'],
+        )
+        deleted = [] if version is None else list(self.deleted)
+        if self.limit is not None and len(changed) > self.limit:
+            changed = changed[:self.limit]
+            return changed, deleted, changed[-1]['version'], False
+        return changed, deleted, self.version, True
+
+    def fetch_folder_document_ids(self, folder_id):
+        return self.folders[folder_id]
+
+
+class CitationLibraryTestCase(OsfTestCase):
+
+    def setUp(self):
+        super(CitationLibraryTestCase, self).setUp()
+        CitationLibrary.remove()
+        CachedCitation.remove()
+        self.provider = FakeCitationsProvider()
+        for key, title in (('a', 'Beta'), ('b', 'alpha'), ('c', 'Gamma')):
+            self.provider.documents[key] = {'id': key, 'title': title, 'version': '1'}
+
+    def test_full_sync(self):
+        library = CitationLibrary.for_provider(self.provider)
+        assert_equal(library.version, '1')
+        total, citations = library.get_page()
+        assert_equal(total, 3)
+        assert_equal([each['id'] for each in citations], ['b', 'a', 'c'])
+
+    def test_not_synced_while_fresh(self):
+        CitationLibrary.for_provider(self.provider)
+        CitationLibrary.for_provider(self.provider)
+        assert_equal(self.provider.calls, [None])
+
+    def test_incremental_sync(self):
+        CitationLibrary.for_provider(self.provider)
+        self.provider.version = '2'
+        self.provider.documents['a'].update(title='Changed', version='2')
+        self.provider.documents['d'] = {'id': 'd', 'title': 'Delta', 'version': '2'}
+        del self.provider.documents['c']
+        self.provider.deleted = ['c']
+        library = CitationLibrary.for_provider(self.provider, force=True)
+        assert_equal(self.provider.calls, [None, '1'])
+        assert_equal(library.version, '2')
+        total, citations = library.get_page()
+        assert_equal(total, 3)
+        assert_equal([each['title'] for each in citations], ['alpha', 'Changed', 'Delta'])
+
+    def test_incomplete_sync_resumes(self):
+        self.provider.version = '3'
+        self.provider.documents['b']['version'] = '2'
+        self.provider.documents['c']['version'] = '3'
+        self.provider.limit = 2
+        library = CitationLibrary.for_provider(self.provider)
+        assert_equal(library.get_page()[0], 2)
+        assert_equal(library.version, '2')
+        # Not fresh until complete
+        library = CitationLibrary.for_provider(self.provider)
+        assert_equal(self.provider.calls, [None, '2'])
+        assert_equal(library.version, '3')
+        assert_equal(library.get_page()[0], 3)
+        CitationLibrary.for_provider(self.provider)
+        assert_equal(len(self.provider.calls), 2)
+
+    def test_upsert_replaces_citations(self):
+        CachedCitation.upsert('account', [{'id': 'a', 'title': 'Beta'}])
+        CachedCitation.upsert('account', [{'id': 'a', 'title': 'Changed'}, {'id': 'b', 'title': 'alpha'}])
+        total, citations = CachedCitation.find_page('account')
+        assert_equal(total, 2)
+        assert_equal([each['title'] for each in citations], ['alpha', 'Changed'])
+
+    def test_pagination(self):
+        library = CitationLibrary.for_provider(self.provider)
+        total, citations = library.get_page(page=1, size=2)
+        assert_equal(total, 3)
+        assert_equal([each['id'] for each in citations], ['c'])
+
+    def test_folder(self):
+        self.provider.folders['folder'] = ['c', 'a']
+        library = CitationLibrary.for_provider(self.provider)
+        document_ids = library.get_folder_ids(self.provider, 'folder')
+        assert_equal(document_ids, ['c', 'a'])
+        # Served from the library until it changes
+        self.provider.folders['folder'] = ['a']
+        assert_equal(library.get_folder_ids(self.provider, 'folder'), ['c', 'a'])
+        total, citations = library.get_page(document_ids, page=0, size=1)
+        assert_equal(total, 2)
+        assert_equal([each['id'] for each in citations], ['c'])
+
+    def test_folder_with_unsynced_documents_syncs(self):
+        library = CitationLibrary.for_provider(self.provider)
+        self.provider.version = '2'
+        self.provider.documents['d'] = {'id': 'd', 'title': 'Delta', 'version': '2'}
+        self.provider.folders['folder'] = ['d']
+        library.get_folder_ids(self.provider, 'folder')
+        assert_equal(self.provider.calls, [None, '1'])
+        assert_equal(CachedCitation.count('account', ['d']), 1)
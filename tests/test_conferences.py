@@ -16,7 +16,7 @@ from framework.auth.core import Auth
 from website import settings
 from website.models import User, Node
 from website.conferences import views
-from website.conferences.model import Conference
+from website.conferences.model import Conference, ConferenceSubmission
 from website.conferences import utils, message
 from website.util import api_url_for, web_url_for
 
@@ -484,6 +484,82 @@ class TestConferenceEmailViews(OsfTestCase):
         assert_equal(res.status_code, 200)
 
 
+class TestConferenceSubmissions(OsfTestCase):
+
+    def setUp(self):
+        super(TestConferenceSubmissions, self).setUp()
+        self.conference = ConferenceFactory()
+
+    def get_node_ids(self, conference=None):
+        _, records = ConferenceSubmission.find_page(conference=conference)
+        return [record['node'] for record in records]
+
+    def test_tagged_node_listed(self):
+        node = create_fake_conference_nodes(1, self.conference.endpoint.upper())[0]
+        assert_equal(self.get_node_ids(self.conference.endpoint), [node._id])
+
+    def test_private_and_deleted_nodes_unlisted(self):
+        private, deleted = create_fake_conference_nodes(2, self.conference.endpoint)
+        private.set_privacy('private', auth=Auth(private.creator))
+        deleted.is_deleted = True
+        deleted.save()
+        assert_equal(self.get_node_ids(), [])
+
+    def test_untagged_node_unlisted(self):
+        node = create_fake_conference_nodes(1, self.conference.endpoint)[0]
+        node.remove_tag(self.conference.endpoint, Auth(node.creator))
+        assert_equal(self.get_node_ids(), [])
+
+    def test_title_change_updates_listing(self):
+        node = create_fake_conference_nodes(1, self.conference.endpoint)[0]
+        node.set_title('Updated', auth=Auth(node.creator))
+        node.save()
+        _, records = ConferenceSubmission.find_page()
+        assert_equal(records[0]['title'], 'Updated')
+
+    def test_new_conference_indexes_tagged_nodes(self):
+        node = create_fake_conference_nodes(1, 'newmeeting')[0]
+        ConferenceFactory(endpoint='NewMeeting')
+        assert_equal(self.get_node_ids('NewMeeting'), [node._id])
+
+    def test_conference_data_paginated(self):
+        nodes = create_fake_conference_nodes(3, self.conference.endpoint)
+        url = api_url_for('conference_data', meeting=self.conference.endpoint)
+        res = self.app.get(url, {'page': 1, 'size': 2, 'sort': 'dateCreated'})
+        assert_equal(len(res.json), 1)
+        assert_equal(res.json[0]['nodeUrl'], nodes[2].url)
+        assert_equal(res.json[0]['id'], 2)
+
+    def test_conference_data_invalid_page_args(self):
+        url = api_url_for('conference_data', meeting=self.conference.endpoint)
+        for args in ({'page': -1}, {'size': 0}, {'size': settings.CONFERENCE_SUBMISSIONS_PAGE_SIZE + 1}, {'page': 'a'}):
+            res = self.app.get(url, args, expect_errors=True)
+            assert_equal(res.status_code, 400)
+
+    def test_conference_data_invalid_sort(self):
+        url = api_url_for('conference_data', meeting=self.conference.endpoint)
+        res = self.app.get(url, {'sort': 'downloads'}, expect_errors=True)
+        assert_equal(res.status_code, 400)
+
+    def test_conference_view(self):
+        create_fake_conference_nodes(settings.CONFERENCE_MIN_COUNT, self.conference.endpoint)
+        small = ConferenceFactory()
+        create_fake_conference_nodes(1, small.endpoint)
+        res = views.conference_view()
+        assert_equal(
+            [meeting['name'] for meeting in res['meetings']],
+            [self.conference.name],
+        )
+        assert_equal(res['meetings'][0]['count'], settings.CONFERENCE_MIN_COUNT)
+        assert_equal(res['submissions_total'], settings.CONFERENCE_MIN_COUNT + 1)
+        assert_in(small.name, [each['confName'] for each in res['submissions']])
+
+    @mock.patch('website.conferences.views.settings.CONFERENCE_SUBMISSIONS_PAGE_SIZE', 2)
+    def test_conference_view_lists_all_submissions(self):
+        create_fake_conference_nodes(3, self.conference.endpoint)
+        assert_equal(len(views.conference_view()['submissions']), 3)
+
+
 class TestConferenceModel(OsfTestCase):
 
     def test_endpoint_and_name_are_required(self):
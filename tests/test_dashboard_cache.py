@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+import mock
+from nose.tools import *  # noqa
+
+from framework.auth import Auth
+from tests.base import OsfTestCase
+from tests.factories import (
+    AuthUserFactory, DashboardFactory, FolderFactory, ProjectFactory,
+)
+
+from website.dashboard.model import DashboardCacheEntry
+from website.settings import ALL_MY_PROJECTS_ID
+from website.util import api_url_for, rubeus
+
+
+class TestDashboardCacheEntry(OsfTestCase):
+
+    def setUp(self):
+        super(TestDashboardCacheEntry, self).setUp()
+        self.user = AuthUserFactory()
+        self.project = ProjectFactory(creator=self.user)
+        self.items = [{'node_id': self.project._id}]
+
+    def test_set_and_get(self):
+        assert_is_none(DashboardCacheEntry.get_data(self.user, 'root'))
+        DashboardCacheEntry.set_data(self.user, 'root', self.items, [self.project._id])
+        assert_equal(DashboardCacheEntry.get_data(self.user, 'root'), self.items)
+        # Overwriting replaces the entry
+        DashboardCacheEntry.set_data(self.user, 'root', [], [self.project._id])
+        assert_equal(DashboardCacheEntry.get_data(self.user, 'root'), [])
+
+    def test_expired(self):
+        DashboardCacheEntry.set_data(self.user, 'root', self.items, [self.project._id])
+        with mock.patch('website.dashboard.model.settings.DASHBOARD_CACHE_TTL', datetime.timedelta(0)):
+            assert_is_none(DashboardCacheEntry.get_data(self.user, 'root'))
+
+    def test_disabled(self):
+        with mock.patch('website.dashboard.model.settings.DASHBOARD_CACHE_ENABLED', False):
+            DashboardCacheEntry.set_data(self.user, 'root', self.items, [self.project._id])
+        assert_is_none(DashboardCacheEntry.get_data(self.user, 'root'))
+
+    def test_node_save_invalidates(self):
+        other = ProjectFactory(creator=self.user)
+        DashboardCacheEntry.set_data(self.user, 'root', self.items, [self.project._id])
+        DashboardCacheEntry.set_data(self.user, 'other', [], [other._id])
+        self.project.title = 'Changed'
+        self.project.save()
+        assert_is_none(DashboardCacheEntry.get_data(self.user, 'root'))
+        assert_equal(DashboardCacheEntry.get_data(self.user, 'other'), [])
+
+    def test_membership_change_invalidates_smart_folders(self):
+        other = ProjectFactory(creator=self.user)
+        DashboardCacheEntry.set_data(self.user, ALL_MY_PROJECTS_ID, [], [], smart=True)
+        DashboardCacheEntry.set_data(self.user, 'folder', [], [])
+        other.is_deleted = True
+        other.save()
+        assert_is_none(DashboardCacheEntry.get_data(self.user, ALL_MY_PROJECTS_ID))
+        assert_equal(DashboardCacheEntry.get_data(self.user, 'folder'), [])
+
+    def test_contributor_added_invalidates(self):
+        contrib = AuthUserFactory()
+        DashboardCacheEntry.set_data(contrib, ALL_MY_PROJECTS_ID, [], [], smart=True)
+        self.project.add_contributor(contrib, auth=Auth(self.user))
+        self.project.save()
+        assert_is_none(DashboardCacheEntry.get_data(contrib, ALL_MY_PROJECTS_ID))
+
+
+class TestDashboardCacheViews(OsfTestCase):
+
+    def setUp(self):
+        super(TestDashboardCacheViews, self).setUp()
+        self.user = AuthUserFactory()
+        self.dashboard = DashboardFactory(creator=self.user)
+        self.folder = FolderFactory(creator=self.user)
+        self.dashboard.add_pointer(self.folder, auth=Auth(self.user))
+        self.url = api_url_for('get_dashboard', nid=self.dashboard._id)
+
+    def test_served_from_cache(self):
+        with mock.patch('website.views.rubeus.to_project_hgrid', wraps=rubeus.to_project_hgrid) as mock_hgrid:
+            first = self.app.get(self.url, auth=self.user.auth).json['data']
+            second = self.app.get(self.url, auth=self.user.auth).json['data']
+        assert_equal(first, second)
+        assert_equal(mock_hgrid.call_count, 1)
+
+    def test_expand_invalidates(self):
+        self.app.get(self.url, auth=self.user.auth)
+        self.app.post(api_url_for('expand', pid=self.folder._id), auth=self.user.auth)
+        data = self.app.get(self.url, auth=self.user.auth).json['data']
+        item = next(each for each in data if each['node_id'] == self.folder._id)
+        assert_true(item['expand'])
+
+    def test_pointer_added_invalidates(self):
+        self.app.get(self.url, auth=self.user.auth)
+        project = ProjectFactory(creator=self.user)
+        self.folder.add_pointer(project, auth=Auth(self.user))
+        url = api_url_for('get_dashboard', nid=self.folder._id)
+        self.app.get(url, auth=self.user.auth)
+        other = ProjectFactory(creator=self.user)
+        self.folder.add_pointer(other, auth=Auth(self.user))
+        data = self.app.get(url, auth=self.user.auth).json['data']
+        assert_equal(len(data), 2)
@@ -13,6 +13,7 @@ from website import settings
 import website.search.search as search
 from website.search import elastic_search
 from website.search.util import build_query
+from website.search_migration import migrate as search_migration
 from website.search_migration.migrate import migrate
 from website.models import Retraction, NodeLicense, Tag
 
@@ -613,6 +614,49 @@ class TestAddContributor(SearchTestCase):
         contribs = search.search_contributor(self.name4.split(' ')[0][:-1])
         assert_equal(len(contribs['users']), 0)
 
+    def test_search_prefixes_of_each_name(self):
+        contribs = search.search_contributor('tay rog')
+        assert_equal([user['id'] for user in contribs['users']], [self.user._id])
+        assert_equal(contribs['total'], 1)
+
+    def test_search_sends_one_request(self):
+        with mock.patch.object(elastic_search.es, 'search', wraps=elastic_search.es.search) as mock_search:
+            search.search_contributor(self.name1)
+        assert_equal(mock_search.call_count, 1)
+
+    def test_search_excludes_users(self):
+        contribs = search.search_contributor(self.name1, exclude=[self.user])
+        assert_equal(contribs['users'], [])
+
+    def test_search_index_without_autocomplete_field(self):
+        with mock.patch.object(elastic_search, 'has_autocomplete_field', return_value=False):
+            contribs = search.search_contributor(self.name1.split(' ')[0][:-1])
+        assert_equal([user['id'] for user in contribs['users']], [self.user._id])
+
+    def test_autocomplete_field_detected(self):
+        elastic_search._autocomplete_indices.clear()
+        assert_true(elastic_search.has_autocomplete_field(elastic_search.INDEX))
+
+    def test_projects_in_common(self):
+        elastic_search._contributed_cache.clear()
+        current_user = UserFactory()
+        project = ProjectFactory(creator=current_user)
+        project.add_contributor(self.user, auth=Auth(current_user), save=True)
+        contribs = search.search_contributor(self.name1, current_user=current_user)
+        assert_equal(contribs['users'][0]['n_projects_in_common'], 1)
+        contribs = search.search_contributor(current_user.fullname, current_user=current_user)
+        found = [user for user in contribs['users'] if user['id'] == current_user._id]
+        assert_equal(found[0]['n_projects_in_common'], -1)
+
+    def test_contributed_node_ids_are_cached(self):
+        elastic_search._contributed_cache.clear()
+        project = ProjectFactory(creator=self.user)
+        assert_in(project._id, elastic_search.get_contributed_node_ids(self.user))
+        other = ProjectFactory(creator=self.user)
+        assert_not_in(other._id, elastic_search.get_contributed_node_ids(self.user))
+        with mock.patch.object(settings, 'CONTRIBUTOR_SEARCH_CACHE_TTL', -1):
+            assert_in(other._id, elastic_search.get_contributed_node_ids(self.user))
+
 @requires_search
 class TestProjectSearchResults(SearchTestCase):
     def setUp(self):
@@ -820,6 +864,47 @@ class TestSearchMigration(SearchTestCase):
             assert_equal(var[settings.ELASTIC_INDEX + '_v{}'.format(n + 1)]['aliases'].keys()[0], settings.ELASTIC_INDEX)
             assert not var.get(settings.ELASTIC_INDEX + '_v{}'.format(n))
 
+    def test_migration_indexes_documents(self):
+        stats = migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app, processes=0)
+        new_index = settings.ELASTIC_INDEX + '_v1'
+        assert_equal(self.es.count(index=new_index, doc_type='project')['count'], 1)
+        assert_equal(self.es.count(index=new_index, doc_type='user')['count'], 1)
+        assert_equal(stats['nodes']['records'], 1)
+        assert_equal(stats['users']['documents'], 1)
+
+    def test_migration_sends_each_stage_with_one_bulk_call(self):
+        ProjectFactory(creator=self.user, is_public=True)
+        ProjectFactory(creator=self.user, is_public=True)
+        with mock.patch.object(search_migration.helpers, 'parallel_bulk',
+                               wraps=search_migration.helpers.parallel_bulk) as mock_bulk:
+            stats = migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app, processes=0, batch_size=1)
+        # One call for nodes and one for users
+        assert_equal(mock_bulk.call_count, 2)
+        public = search_migration.Node.find(Q('is_public', 'eq', True) & Q('is_deleted', 'eq', False)).count()
+        assert_equal(stats['nodes']['records'], public)
+        assert_equal(stats['nodes']['documents'], public)
+
+    def test_migration_restores_index_settings(self):
+        migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app, processes=0)
+        new_index = settings.ELASTIC_INDEX + '_v1'
+        index_settings = self.es.indices.get_settings(index=new_index)[new_index]['settings']['index']
+        assert_not_equal(index_settings.get('refresh_interval'), '-1')
+
+    def test_resume_interrupted_migration(self):
+        with mock.patch('website.search_migration.migrate.migrate_users', side_effect=KeyboardInterrupt):
+            with assert_raises(KeyboardInterrupt):
+                migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app, processes=0)
+        progress = search_migration.get_progress(settings.ELASTIC_INDEX)
+        assert_equal(progress['nodes'], self.project._id)
+
+        with mock.patch('website.search_migration.migrate.serialize_nodes') as mock_serialize:
+            migrate(delete=False, index=settings.ELASTIC_INDEX, app=self.app.app, processes=0, resume=True)
+        # Nodes indexed before the interruption aren't indexed again
+        assert_false(mock_serialize.called)
+        var = self.es.indices.get_aliases()
+        assert_equal(var[settings.ELASTIC_INDEX + '_v1']['aliases'].keys()[0], settings.ELASTIC_INDEX)
+        assert_is_none(search_migration.get_progress(settings.ELASTIC_INDEX))
+
 class TestSearchFiles(SearchTestCase):
 
     def setUp(self):
@@ -1,17 +1,21 @@
 # -*- coding: utf-8 -*-
 
+import unittest
+
 import mock
 from nose.tools import *  # noqa
 
 from tests.base import OsfTestCase
-from tests.factories import NodeFactory
+from tests.factories import NodeFactory, ProjectFactory, UserFactory
 
 from modularodm import Q
 from modularodm import fields
 from modularodm.storage.mongostorage import MongoStorage
 
 from framework.mongo import database
-from framework.guid.model import GuidStoredObject
+from framework.guid import pool
+from framework.guid.bloom import BloomFilter
+from framework.guid.model import Guid, GuidStoredObject
 
 from website import models
 
@@ -33,6 +37,80 @@ class TestGuidStoredObject(OsfTestCase):
         assert_equal(guids[0]._id, fake_guid._id)
 
 
+class TestBloomFilter(unittest.TestCase):
+
+    def test_membership(self):
+        bloom = BloomFilter(100)
+        items = ['guid{0}'.format(index) for index in range(100)]
+        for item in items:
+            bloom.add(item)
+        assert_true(all(item in bloom for item in items))
+        false_positives = sum(
+            'other{0}'.format(index) in bloom
+            for index in range(1000)
+        )
+        assert_less(false_positives, 50)
+
+
+class TestGuidPool(OsfTestCase):
+
+    def setUp(self):
+        super(TestGuidPool, self).setUp()
+        pool.reset_blacklist_filter()
+
+    def tearDown(self):
+        super(TestGuidPool, self).tearDown()
+        pool.reset_blacklist_filter()
+
+    def test_refill_and_claim(self):
+        assert_equal(pool.refill(size=20), 20)
+        assert_equal(pool.get_metrics()['depth'], 20)
+        guid = Guid.generate()
+        assert_equal(pool.get_metrics()['depth'], 19)
+        assert_is_none(database[pool.POOL_COLLECTION].find_one({'_id': guid._id}))
+        # Refilling tops up to the target size only
+        assert_equal(pool.refill(size=20), 1)
+
+    def test_claim_from_empty_pool(self):
+        empty = pool.stats['empty']
+        guid = Guid.generate()
+        assert_true(guid._id)
+        assert_equal(pool.stats['empty'], empty + 1)
+
+    @mock.patch('framework.guid.pool.random_guid_id')
+    def test_blacklisted_skipped(self, mock_random):
+        models.BlacklistGuid(_id='abcde').save()
+        mock_random.side_effect = ['abcde', 'fghjk']
+        assert_equal(pool.claim(), 'fghjk')
+
+    @mock.patch('framework.guid.pool.random_guid_id')
+    def test_refill_skips_taken_and_blacklisted(self, mock_random):
+        models.BlacklistGuid(_id='abcde').save()
+        Guid(_id='fghjk').save()
+        mock_random.side_effect = ['abcde', 'fghjk', 'mnpqr', 'stuvw']
+        assert_equal(pool.refill(size=1), 1)
+        assert_equal(
+            [record['_id'] for record in database[pool.POOL_COLLECTION].find()],
+            ['stuvw'],
+        )
+
+    def test_collision_retried(self):
+        node = NodeFactory()
+        database[pool.POOL_COLLECTION].insert([{'_id': node._id}])
+        collisions = pool.stats['collisions']
+        guid = Guid.generate(referent=node)
+        assert_not_equal(guid._id, node._id)
+        assert_equal(pool.stats['collisions'], collisions + 1)
+
+    def test_guid_stored_object_claims_from_pool(self):
+        user = UserFactory()
+        pool.refill(size=1)
+        guid_id = database[pool.POOL_COLLECTION].find_one()['_id']
+        node = ProjectFactory(creator=user)
+        assert_equal(node._id, guid_id)
+        assert_equal(Guid.load(guid_id).referent, node)
+
+
 class TestResolveGuid(OsfTestCase):
 
     def setUp(self):
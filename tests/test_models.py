@@ -34,7 +34,7 @@ from website.profile.utils import serialize_user
 from website.project.signals import contributor_added
 from website.project.model import (
     Comment, Node, NodeLog, Pointer, ensure_schemas, has_anonymous_link,
-    get_pointer_parent, Embargo,
+    get_pointer_parent, Embargo, NodeSubtree, Tag,
 )
 from website.util.permissions import CREATOR_PERMISSIONS, ADMIN, READ, WRITE, DEFAULT_CONTRIBUTOR_PERMISSIONS
 from website.util import web_url_for, api_url_for
@@ -2071,6 +2071,121 @@ class TestNodeTraversals(OsfTestCase):
         descendants = list(point1.get_descendants_recursive())
         assert_equal(len(descendants), 1)
 
+    def test_subtree_walk_without_queries(self):
+        comp1 = NodeFactory(creator=self.user, parent=self.root)
+        comp1a = NodeFactory(creator=self.user, parent=comp1)
+        pointer = comp1.add_pointer(ProjectFactory(), auth=self.auth)
+        comp2 = NodeFactory(creator=self.user, parent=self.root)
+        subtree = NodeSubtree(self.root)
+        with mock.patch.object(Node, 'load') as mock_load:
+            descendants = list(subtree.iter_descendants())
+        assert_false(mock_load.called)
+        assert_equal(
+            [each._id for each in descendants],
+            [comp1._id, comp1a._id, pointer._id, comp2._id],
+        )
+
+    def test_has_permission_on_children(self):
+        comp = NodeFactory(creator=self.user, parent=self.root)
+        subcomp = NodeFactory(creator=self.user, parent=comp)
+        subcomp.add_contributor(self.viewer, auth=self.auth, permissions=['read', 'write'], save=True)
+        assert_true(self.root.has_permission_on_children(self.viewer, 'write'))
+        assert_false(self.root.has_permission_on_children(self.viewer, 'admin'))
+        comp.is_deleted = True
+        comp.save()
+        assert_false(self.root.has_permission_on_children(self.viewer, 'write'))
+
+    def test_has_permission_on_self_skips_subtree(self):
+        NodeFactory(creator=self.user, parent=self.root)
+        with mock.patch('website.project.model.NodeSubtree') as mock_subtree:
+            assert_true(self.root.has_permission_on_children(self.user, 'admin'))
+        assert_false(mock_subtree.called)
+
+    def test_subtree_keeps_unsaved_changes(self):
+        comp = NodeFactory(creator=self.user, parent=self.root)
+        comp.title = 'Unsaved'
+        subtree = NodeSubtree(self.root)
+        assert_is(subtree.nodes[comp._id], comp)
+        assert_equal(comp.title, 'Unsaved')
+
+    def test_ancestors(self):
+        comp = NodeFactory(creator=self.user, parent=self.root)
+        subcomp = NodeFactory(creator=self.user, parent=comp)
+        assert_equal(self.root.ancestors, [])
+        assert_equal(comp.ancestors, [self.root._id])
+        assert_equal(subcomp.ancestors, [self.root._id, comp._id])
+        assert_equal(subcomp.parents, [comp, self.root])
+        assert_equal(subcomp.root, self.root)
+        assert_equal(subcomp.depth, 2)
+        assert_equal(
+            {node._id for node in Node.find(Q('ancestors', 'eq', self.root._id))},
+            {comp._id, subcomp._id},
+        )
+
+    def test_parents_stop_at_deleted_ancestor(self):
+        comp = NodeFactory(creator=self.user, parent=self.root)
+        subcomp = NodeFactory(creator=self.user, parent=comp)
+        comp.is_deleted = True
+        comp.save()
+        assert_equal(subcomp.parents, [])
+        assert_equal(subcomp.root, subcomp)
+        assert_equal(subcomp.ancestor_nodes, [self.root, comp])
+
+    def test_new_child_of_unmigrated_parent_gets_full_lineage(self):
+        comp = NodeFactory(creator=self.user, parent=self.root)
+        comp.ancestors = []
+        comp.save()
+        subcomp = NodeFactory(creator=self.user, parent=comp)
+        assert_equal(subcomp.ancestors, [self.root._id, comp._id])
+
+    def test_missing_ancestor_skipped(self):
+        comp = NodeFactory(creator=self.user, parent=self.root)
+        comp.ancestors = ['missing', self.root._id]
+        assert_equal(comp.ancestor_nodes, [self.root])
+
+    def test_update_child_ancestors(self):
+        fresh = NodeFactory(creator=self.user, parent=self.root)
+        stale = NodeFactory(creator=self.user, parent=self.root)
+        self.root.add_pointer(ProjectFactory(), self.auth)
+        stale.ancestors = []
+        stale.save()
+        with mock.patch.object(Pointer, 'load') as mock_pointer_load:
+            with mock.patch.object(Node, 'save', autospec=True, side_effect=Node.save) as mock_save:
+                self.root.update_child_ancestors()
+        # Pointers and children that are up to date aren't loaded or saved
+        assert_false(mock_pointer_load.called)
+        saved = [call[0][0]._id for call in mock_save.call_args_list]
+        assert_in(stale._id, saved)
+        assert_not_in(fresh._id, saved)
+        assert_equal(stale.ancestors, [self.root._id])
+        assert_equal(fresh.ancestors, [self.root._id])
+
+    def test_fork_ancestors(self):
+        comp = NodeFactory(creator=self.user, parent=self.root)
+        subcomp = NodeFactory(creator=self.user, parent=comp)
+        fork = self.root.fork_node(self.auth)
+        fork_comp = fork.nodes[0]
+        fork_subcomp = fork_comp.nodes[0]
+        assert_equal(fork.ancestors, [])
+        assert_equal(fork_comp.ancestors, [fork._id])
+        assert_equal(fork_subcomp.ancestors, [fork._id, fork_comp._id])
+        # Forking a component yields a top-level node
+        assert_equal(subcomp.fork_node(self.auth).ancestors, [])
+
+    def test_registration_ancestors(self):
+        comp = NodeFactory(creator=self.user, parent=self.root)
+        NodeFactory(creator=self.user, parent=comp)
+        reg = RegistrationFactory(project=self.root)
+        reg_comp = reg.nodes[0]
+        assert_equal(reg_comp.ancestors, [reg._id])
+        assert_equal(reg_comp.nodes[0].ancestors, [reg._id, reg_comp._id])
+
+    def test_template_ancestors(self):
+        NodeFactory(creator=self.user, parent=self.root)
+        new = self.root.use_as_template(self.auth)
+        assert_equal(new.ancestors, [])
+        assert_equal(new.nodes[0].ancestors, [new._id])
+
 class TestRemoveNode(OsfTestCase):
 
     def setUp(self):
@@ -2149,6 +2264,20 @@ class TestDashboard(OsfTestCase):
         with assert_raises(NodeStateError):
             DashboardFactory(creator=self.user)
 
+    def test_dashboard_id_stored_on_user(self):
+        self.user.reload()
+        assert_equal(self.user.dashboard_id, self.project._id)
+
+    def test_has_pointer_to(self):
+        folder = FolderFactory(creator=self.user)
+        assert_false(self.project.has_pointer_to(folder._id))
+        pointer = self.project.add_pointer(folder, self.auth)
+        assert_true(self.project.has_pointer_to(folder._id))
+        self.project.rm_pointer(pointer, self.auth)
+        self.project.save()
+        self.project.reload()
+        assert_false(self.project.has_pointer_to(folder._id))
+
     def test_cannot_link_to_dashboard(self):
         new_node = ProjectFactory(creator=self.user)
         with assert_raises(ValueError):
@@ -3840,6 +3969,87 @@ class TestWatchConfig(OsfTestCase):
         assert_true(config.node._id)
 
 
+class TestNodeCounters(OsfTestCase):
+
+    def setUp(self):
+        super(TestNodeCounters, self).setUp()
+        self.user = UserFactory()
+        self.auth = Auth(self.user)
+        self.project = ProjectFactory(creator=self.user)
+
+    def assert_counters_persisted(self):
+        stored = self.db['node'].find_one({'_id': self.project._id})
+        for field in Node.COUNTER_FIELDS:
+            assert_equal(stored.get(field, 0), getattr(self.project, field))
+
+    def test_defaults(self):
+        for field in Node.COUNTER_FIELDS:
+            assert_equal(getattr(self.project, field), 0)
+
+    def test_fork(self):
+        fork = self.project.fork_node(self.auth)
+        assert_equal(self.project.fork_count, 1)
+        assert_equal(fork.fork_count, 0)
+        self.assert_counters_persisted()
+        fork.remove_node(self.auth)
+        assert_equal(self.project.fork_count, 0)
+        self.assert_counters_persisted()
+
+    def test_register(self):
+        registration = RegistrationFactory(project=self.project)
+        assert_equal(self.project.registration_count, 1)
+        assert_equal(self.project.fork_count, 0)
+        assert_equal(registration.registration_count, 0)
+        self.assert_counters_persisted()
+
+    def test_template(self):
+        new = self.project.use_as_template(self.auth)
+        assert_equal(self.project.templated_count, 1)
+        self.assert_counters_persisted()
+        new.remove_node(self.auth)
+        assert_equal(self.project.templated_count, 0)
+        self.assert_counters_persisted()
+
+    def test_watch(self):
+        config = WatchConfigFactory(node=self.project)
+        self.user.watch(config)
+        self.user.save()
+        assert_equal(self.project.watched_count, 1)
+        self.assert_counters_persisted()
+        self.user.unwatch(config)
+        assert_equal(self.project.watched_count, 0)
+        self.assert_counters_persisted()
+
+    def test_pointers(self):
+        parent = ProjectFactory(creator=self.user)
+        pointer = parent.add_pointer(self.project, self.auth)
+        assert_equal(self.project.pointed_count, 1)
+        parent.fork_node(self.auth)
+        assert_equal(self.project.pointed_count, 2)
+        parent.rm_pointer(pointer, self.auth)
+        assert_equal(self.project.pointed_count, 1)
+        self.assert_counters_persisted()
+
+    def test_pointers_from_folders_not_counted(self):
+        folder = FolderFactory(creator=self.user)
+        folder.add_pointer(self.project, self.auth)
+        assert_equal(self.project.pointed_count, 0)
+
+    def test_pointers_from_deleted_nodes_not_counted(self):
+        parent = ProjectFactory(creator=self.user)
+        parent.add_pointer(self.project, self.auth)
+        parent.remove_node(self.auth)
+        assert_equal(self.project.pointed_count, 0)
+        self.assert_counters_persisted()
+
+    def test_save_keeps_counters(self):
+        stale = self.project
+        ProjectFactory(creator=self.user).add_pointer(Node.load(self.project._id), self.auth)
+        stale.title = 'Changed'
+        stale.save()
+        assert_equal(self.db['node'].find_one({'_id': self.project._id})['pointed_count'], 1)
+
+
 class TestUnregisteredUser(OsfTestCase):
 
     def setUp(self):
@@ -3963,6 +4173,22 @@ class TestTags(OsfTestCase):
             NodeLog.PROJECT_CREATED
         )
 
+    def test_tag_keys(self):
+        self.project.add_tag('Scientific', auth=self.auth)
+        assert_equal(Tag.load('Scientific').key, 'scientific')
+        assert_equal(self.project.tag_keys, ['scientific'])
+        self.project.remove_tag('Scientific', auth=self.auth)
+        assert_equal(self.project.tag_keys, [])
+
+    def test_iexact_uses_tag_keys(self):
+        self.project.add_tag('Scientific', auth=self.auth)
+        ProjectFactory().add_tag('scientific-ish', auth=self.auth)
+        assert_equal(
+            [node._id for node in Node.find(Q('tags', 'iexact', 'SCIENTIFIC'))],
+            [self.project._id],
+        )
+        assert_equal(Tag.find_one(Q('_id', 'iexact', 'scientific'))._id, 'Scientific')
+
 
 class TestContributorVisibility(OsfTestCase):
 
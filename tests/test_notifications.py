@@ -849,6 +849,37 @@ class TestCompileSubscriptions(OsfTestCase):
         subs = emails.compile_subscriptions(node5, 'file_updated')
         assert_equal(subs, {'email_transactional': [], 'email_digest': [self.user_1._id], 'none': []})
 
+    def test_event_subscription_overrides_node_subscription(self):
+        self.base_sub.email_transactional.append(self.user_1)
+        self.base_sub.save()
+        file_sub = factories.NotificationSubscriptionFactory(
+            _id=self.shared_node._id + '_xyz42_file_updated',
+            owner=self.shared_node,
+            event_name='xyz42_file_updated'
+        )
+        file_sub.save()
+        file_sub.none.append(self.user_1)
+        file_sub.save()
+        subs = emails.compile_subscriptions(self.shared_node, 'file_updated', 'xyz42_file_updated')
+        assert_equal(subs, {'email_transactional': [], 'email_digest': [], 'none': [self.user_1._id]})
+
+    def test_parent_admin_subbed_on_child_without_contributorship(self):
+        user = factories.UserFactory()
+        self.base_project.add_contributor(user, permissions=['read', 'write', 'admin'])
+        self.base_project.save()
+        self.private_sub.email_digest.append(user)
+        self.private_sub.save()
+        subs = emails.compile_subscriptions(self.private_node, 'file_updated')
+        assert_equal(subs, {'email_transactional': [], 'email_digest': [user._id], 'none': []})
+
+    def test_resolver_permissions_match_has_permission(self):
+        resolver = emails.SubscriptionResolver(self.private_node)
+        for user in [self.user_1, self.user_2, self.user_3, self.user_4]:
+            assert_equal(
+                user._id in resolver._readers[self.private_node._id],
+                self.private_node.has_permission(user, 'read'),
+            )
+
 
 class TestMoveSubscription(OsfTestCase):
     def setUp(self):
@@ -1168,6 +1199,33 @@ class TestSendEmails(OsfTestCase):
         formatted_datetime = u'{time} on {date}'.format(time=formatted_time, date=formatted_date)
         assert_equal(emails.localize_timestamp(timestamp, self.user), formatted_datetime)
 
+    @mock.patch('website.mails.render_message')
+    def test_store_emails_renders_once_per_timezone_and_locale(self, mock_render):
+        mock_render.side_effect = lambda tpl, **context: context['localized_timestamp']
+        recipients = [factories.UserFactory(timezone='Etc/UTC', locale='en_US') for _ in range(3)]
+        other = factories.UserFactory(timezone='Europe/Moscow', locale='ru_RU')
+        timestamp = datetime.datetime.utcnow().replace(tzinfo=pytz.utc)
+        recipient_ids = [each._id for each in recipients + [other]]
+        emails.store_emails(recipient_ids, 'email_digest', 'comments', self.user, self.node, timestamp)
+
+        assert_equal(mock_render.call_count, 2)
+        digests = list(NotificationDigest.find(Q('event', 'eq', 'comments')))
+        assert_equal(len(digests), 4)
+        assert_equal(
+            {digest.user_id: digest.message for digest in digests}[other._id],
+            emails.localize_timestamp(timestamp, other),
+        )
+        for digest in digests:
+            assert_equal(digest.node_lineage, [self.project._id, self.node._id])
+            assert_equal(digest.send_type, 'email_digest')
+
+    @mock.patch('website.mails.render_message')
+    def test_store_emails_skips_acting_user(self, mock_render):
+        emails.store_emails([self.user._id], 'email_transactional', 'comments', self.user, self.node,
+                            datetime.datetime.utcnow())
+        assert_false(mock_render.called)
+        assert_equal(NotificationDigest.find().count(), 0)
+
 
 class TestSendDigest(OsfTestCase):
     def setUp(self):
@@ -1223,6 +1281,8 @@ class TestSendDigest(OsfTestCase):
             }
         ]
 
+        expected.sort(key=lambda group: group['user_id'])
+
         assert_equal(len(user_groups), 2)
         assert_equal(user_groups, expected)
         digest_ids = [d._id, d2._id, d3._id]
@@ -1274,6 +1334,8 @@ class TestSendDigest(OsfTestCase):
             }
         ]
 
+        expected.sort(key=lambda group: group['user_id'])
+
         assert_equal(len(user_groups), 2)
         assert_equal(user_groups, expected)
         digest_ids = [d._id, d2._id, d3._id]
@@ -1307,7 +1369,61 @@ class TestSendDigest(OsfTestCase):
         assert_equal(kwargs['name'], user.fullname)
         message = group_by_node(user_groups[last_user_index]['info'])
         assert_equal(kwargs['message'], message)
-        assert_equal(kwargs['callback'], remove_notifications(email_notification_ids=email_notification_ids))
+        assert_equal(NotificationDigest.find(Q('_id', 'in', email_notification_ids)).count(), 0)
+
+    @mock.patch('website.settings.NOTIFICATION_DIGEST_CHUNK_SIZE', 2)
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_in_chunks(self, mock_send_mail):
+        send_type = 'email_transactional'
+        users = [factories.UserFactory() for _ in range(3)]
+        for user in users:
+            for _ in range(2):
+                factories.NotificationDigestFactory(
+                    user_id=user._id,
+                    send_type=send_type,
+                    timestamp=datetime.datetime.utcnow(),
+                    message='Hello',
+                    node_lineage=[self.project._id]
+                ).save()
+        with mock.patch('website.notifications.tasks.remove_notifications',
+                        wraps=remove_notifications) as mock_remove:
+            send_users_email(send_type)
+        assert_equal(mock_send_mail.call_count, 3)
+        assert_equal(mock_remove.call_count, 2)
+        assert_equal(NotificationDigest.find().count(), 0)
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_removes_sent_notifications_on_failure(self, mock_send_mail):
+        send_type = 'email_transactional'
+        for _ in range(2):
+            factories.NotificationDigestFactory(
+                user_id=factories.UserFactory()._id,
+                send_type=send_type,
+                timestamp=datetime.datetime.utcnow(),
+                message='Hello',
+                node_lineage=[self.project._id]
+            ).save()
+        mock_send_mail.side_effect = [None, Exception('mail server down')]
+        with assert_raises(Exception):
+            send_users_email(send_type)
+        sent_to = mock_send_mail.call_args_list[0][1]['to_addr']
+        remaining = [digest.user_id for digest in NotificationDigest.find()]
+        assert_equal(len(remaining), 1)
+        assert_not_equal(User.load(remaining[0]).username, sent_to)
+
+    @mock.patch('website.mails.send_mail')
+    def test_send_users_email_keeps_notifications_of_missing_users(self, mock_send_mail):
+        d = factories.NotificationDigestFactory(
+            user_id='nouser',
+            send_type='email_transactional',
+            timestamp=datetime.datetime.utcnow(),
+            message='Hello',
+            node_lineage=[self.project._id]
+        )
+        d.save()
+        send_users_email('email_transactional')
+        assert_false(mock_send_mail.called)
+        assert_equal(NotificationDigest.find(Q('_id', 'eq', d._id)).count(), 1)
 
     def test_remove_sent_digest_notifications(self):
         d = factories.NotificationDigestFactory(
@@ -1,9 +1,20 @@
+import datetime
+
+import mock
 from nose.tools import *
 
+from framework.analytics import piwik
+from framework.mongo import database
+from website import settings
+from website.models import Node
+
 from tests.base import OsfTestCase
+from tests.fake_piwik import FakePiwik
 from tests.factories import ProjectFactory, UserFactory
 from tests.test_features import requires_piwik
 
+PIWIK_URL = 'http://piwik.test/'
+
 
 @requires_piwik
 class TestCreateUser(OsfTestCase):
@@ -22,3 +33,117 @@ class TestCreateProject(OsfTestCase):
 
     def test_has_piwik_site_id(self):
         assert_true(self.project.piwik_site_id)
+
+
+class TestPiwikSync(OsfTestCase):
+
+    def setUp(self):
+        super(TestPiwikSync, self).setUp()
+        for collection in (piwik.QUEUE_COLLECTION, piwik.ACCESS_COLLECTION):
+            database[collection].remove()
+        self.fake = FakePiwik(PIWIK_URL)
+        self.fake.register()
+        self.user = UserFactory()
+        self.fake.add_user('osf.' + self.user._id)
+        self.project = ProjectFactory(creator=self.user, is_public=True)
+
+    def sync(self, *nodes):
+        with mock.patch.object(settings, 'PIWIK_HOST', PIWIK_URL):
+            return piwik.sync_nodes(list(nodes))
+
+    def process_queue(self, **kwargs):
+        with mock.patch.object(settings, 'PIWIK_HOST', PIWIK_URL):
+            return piwik.process_queue(**kwargs)
+
+    def access(self, node):
+        return self.fake.access[node.piwik_site_id]
+
+    def test_provisions_and_grants_access(self):
+        assert_equal(self.sync(self.project), set())
+        assert_true(self.project.piwik_site_id)
+        assert_equal(self.access(self.project), {
+            'osf.' + self.user._id: 'view',
+            'anonymous': 'view',
+        })
+        assert_equal(self.fake.requests, ['API.getBulkRequest', 'API.getBulkRequest'])
+
+    def test_batches_nodes(self):
+        other = ProjectFactory(creator=self.user)
+        self.sync(self.project, other)
+        assert_equal(len(self.fake.requests), 2)
+        assert_equal(self.access(other), {'osf.' + self.user._id: 'view'})
+
+    def test_diffs_against_mirror(self):
+        self.sync(self.project)
+        contributor = UserFactory()
+        self.fake.add_user('osf.' + contributor._id)
+        self.project.add_contributor(contributor)
+        self.project.is_public = False
+        self.project.save()
+        self.fake.requests = []
+        self.sync(self.project)
+        # One bulk request to change access, none to read it
+        assert_equal(self.fake.requests, ['API.getBulkRequest'])
+        assert_equal(self.access(self.project), {
+            'osf.' + self.user._id: 'view',
+            'osf.' + contributor._id: 'view',
+        })
+
+    def test_unchanged_nodes_need_no_requests(self):
+        self.sync(self.project)
+        self.fake.requests = []
+        self.sync(self.project)
+        assert_equal(self.fake.requests, [])
+
+    def test_reads_access_of_unmirrored_sites(self):
+        self.project.piwik_site_id = '42'
+        self.project.save()
+        self.fake.access['42'] = {'osf.removed': 'view', 'osf.' + self.user._id: 'view'}
+        self.sync(self.project)
+        assert_equal(self.access(self.project), {
+            'osf.' + self.user._id: 'view',
+            'anonymous': 'view',
+        })
+        self.fake.requests = []
+        self.sync(self.project)
+        assert_equal(self.fake.requests, [])
+
+    def test_failed_calls_are_retried(self):
+        stranger = UserFactory()
+        self.project.add_contributor(stranger)
+        self.project.save()
+        assert_equal(self.sync(self.project), {self.project._id})
+        # Access that was granted isn't granted again
+        self.fake.add_user('osf.' + stranger._id)
+        self.fake.requests = []
+        assert_equal(self.sync(self.project), set())
+        assert_equal(self.fake.requests, ['API.getBulkRequest'])
+        assert_equal(self.access(self.project)['osf.' + stranger._id], 'view')
+
+    def test_queue_coalesces_saves(self):
+        piwik.queue_node(self.project._id)
+        piwik.queue_node(self.project._id)
+        assert_equal(database[piwik.QUEUE_COLLECTION].count(), 1)
+        # Nodes wait for the window
+        assert_equal(self.process_queue(), 0)
+        assert_equal(self.process_queue(window=datetime.timedelta(0)), 1)
+        assert_equal(database[piwik.QUEUE_COLLECTION].count(), 0)
+        assert_true(Node.load(self.project._id).piwik_site_id)
+
+    def test_queue_keeps_failed_nodes(self):
+        self.project.add_contributor(UserFactory())
+        self.project.save()
+        piwik.queue_node(self.project._id)
+        assert_equal(self.process_queue(window=datetime.timedelta(0)), 0)
+        assert_equal(database[piwik.QUEUE_COLLECTION].find_one()['_id'], self.project._id)
+
+    @mock.patch('website.project.model.piwik_tasks.update_node')
+    def test_save_queues_access_changes_only(self, mock_update):
+        self.project.piwik_site_id = '42'
+        with mock.patch.object(settings, 'PIWIK_HOST', PIWIK_URL):
+            self.project.title = 'New title'
+            self.project.save()
+            assert_false(mock_update.called)
+            self.project.is_public = False
+            self.project.save()
+        mock_update.assert_called_once_with(self.project._id)
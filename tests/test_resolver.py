@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import mock
+from flask import g
+from nose.tools import *  # noqa
+
+from framework.auth import Auth
+from tests.base import OsfTestCase
+from tests.factories import (
+    AuthUserFactory, NodeFactory, PrivateLinkFactory, ProjectFactory,
+)
+
+from website.project.model import Node
+from website.project.resolver import (
+    PermissionResolver, get_resolver, resolver_before_request,
+    resolver_teardown_request,
+)
+
+
+class TestPermissionResolver(OsfTestCase):
+
+    def setUp(self):
+        super(TestPermissionResolver, self).setUp()
+        self.admin = AuthUserFactory()
+        self.project = ProjectFactory(creator=self.admin)
+        self.component = NodeFactory(parent=self.project, creator=self.admin)
+        self.child = NodeFactory(parent=self.component, creator=self.admin)
+        self.user = AuthUserFactory()
+        self.project.add_contributor(self.user, permissions=['read', 'write', 'admin'], auth=Auth(self.admin))
+        self.project.save()
+        self.resolver = PermissionResolver()
+
+    def test_admin_on_ancestor_can_view(self):
+        assert_true(self.resolver.can_view(self.child, Auth(self.user)))
+        assert_true(self.resolver.has_permission(self.child, self.user, 'read'))
+        assert_false(self.resolver.has_permission(self.child, self.user, 'write'))
+        assert_false(self.resolver.can_view(self.child, Auth(AuthUserFactory())))
+        assert_false(self.resolver.can_view(self.child, None))
+
+    def test_private_link_can_view(self):
+        link = PrivateLinkFactory()
+        link.nodes.append(self.child)
+        link.save()
+        assert_true(self.resolver.can_view(self.child, Auth(private_key=link.key)))
+        assert_false(self.resolver.can_view(self.component, Auth(private_key=link.key)))
+
+    def test_parents_loaded_once(self):
+        with mock.patch.object(Node, 'parent_node', new_callable=mock.PropertyMock) as mock_parent:
+            mock_parent.side_effect = [self.component, self.project, None]
+            for _ in range(3):
+                assert_true(self.resolver.is_admin_parent(self.child, self.user))
+            assert_false(self.resolver.is_admin_parent(self.child, AuthUserFactory()))
+        assert_equal(mock_parent.call_count, 3)
+
+    def test_filter_viewable(self):
+        other = ProjectFactory()
+        nodes = [self.project, self.component, self.child, other]
+        assert_equal(
+            self.resolver.filter_viewable(nodes, Auth(self.user)),
+            [self.project, self.component, self.child],
+        )
+
+    def test_get_permissions(self):
+        permissions = self.resolver.get_permissions([self.project, self.child], self.user)
+        assert_equal(permissions[self.project._id], {'read', 'write', 'admin'})
+        assert_equal(permissions[self.child._id], {'read'})
+
+    def test_checks_counted(self):
+        self.resolver.can_view(self.child, Auth(self.user))
+        self.resolver.filter_viewable([self.project, self.component], Auth(self.user))
+        assert_equal(self.resolver.checks, 3)
+
+    def test_request_scope(self):
+        assert_is_not(get_resolver(), get_resolver())
+        resolver_before_request()
+        resolver = get_resolver()
+        assert_is(get_resolver(), resolver)
+        self.child.can_view(Auth(self.user))
+        assert_in(self.child._id, resolver.parents)
+        # Saving a node invalidates cached ancestry
+        self.project.save()
+        assert_equal(resolver.parents, {})
+        resolver_teardown_request()
+        assert_false(hasattr(g, '_permission_resolver'))
+
+    def test_removed_parent_admin_in_request(self):
+        resolver_before_request()
+        try:
+            assert_true(self.child.can_view(Auth(self.user)))
+            self.project.remove_contributor(self.user, auth=Auth(self.admin))
+            assert_false(self.child.can_view(Auth(self.user)))
+        finally:
+            resolver_teardown_request()
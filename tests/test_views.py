@@ -26,7 +26,7 @@ from framework.auth.exceptions import InvalidTokenError
 from framework.tasks import handlers
 
 from website import mailchimp_utils
-from website.views import _rescale_ratio
+from website.views import _rescale_ratio, find_dashboard
 from website.util import permissions
 from website.models import Node, Pointer, NodeLog
 from website.project.model import ensure_schemas, has_anonymous_link
@@ -326,6 +326,32 @@ class TestProjectViews(OsfTestCase):
         my_user.reload()
         dashboard = my_user.node__contributed.find(Q('is_dashboard', 'eq', True))
         assert_equal(dashboard.count(), 1)
+        assert_equal(my_user.dashboard_id, dashboard[0]._id)
+
+    def test_dashboard_found_for_user_without_dashboard_id(self):
+        my_user = AuthUserFactory()
+        dashboard = DashboardFactory(creator=my_user)
+        my_user.dashboard_id = None
+        my_user.save()
+        assert_equal(find_dashboard(my_user), dashboard)
+        assert_equal(my_user.dashboard_id, dashboard._id)
+
+    def test_dashboard_replaced_for_user_with_stale_dashboard_id(self):
+        my_user = AuthUserFactory()
+        my_user.dashboard_id = 'missing'
+        my_user.save()
+        dashboard = find_dashboard(my_user)
+        assert_true(dashboard.is_dashboard)
+        my_user.reload()
+        assert_equal(my_user.dashboard_id, dashboard._id)
+
+    def test_view_project_in_dashboard(self):
+        dashboard = DashboardFactory(creator=self.user1)
+        project = ProjectFactory(creator=self.user1)
+        auth = Auth(self.user1)
+        assert_false(_view_project(project, auth)['node']['in_dashboard'])
+        dashboard.add_pointer(project, auth)
+        assert_true(_view_project(project, auth)['node']['in_dashboard'])
 
     def test_add_contributor_post(self):
         # Two users are added as a contributor via a POST request
@@ -21,6 +21,7 @@ from tests.factories import (UserFactory, AuthUserFactory, ProjectFactory,
                              PrivateLinkFactory)
 from tests.test_features import requires_piwik
 from website import settings, language
+from website.discovery import snapshot
 from website.security import random_string
 from website.project.metadata.schemas import OSF_META_SCHEMAS
 from website.project.model import ensure_schemas
@@ -906,6 +907,33 @@ class TestExplorePublicActivity(OsfTestCase):
         assert_in(str(self.registration.registered_date.date()), res)
         assert_not_in(str(self.private_project.title), res)
 
+    @mock.patch('website.discovery.snapshot.get_popular_hits')
+    def test_popular_nodes_show_from_snapshot(self, mock_hits):
+        mock_hits.return_value = [
+            {'id': self.private_project._id, 'hits': 9, 'visits': 8},
+            {'id': self.project._id, 'hits': 7, 'visits': 6},
+            {'id': self.registration._id, 'hits': 5, 'visits': 4},
+        ]
+        snapshot.refresh()
+        popular = snapshot.get_snapshot()
+        assert_equal([x['id'] for x in popular['popular_public_projects']], [self.project._id])
+        assert_equal([x['id'] for x in popular['popular_public_registrations']], [self.registration._id])
+        res = self.app.get(self.project.web_url_for('activity'))
+        assert_in('7&nbsp;views', res)
+        assert_in('5&nbsp;views', res)
+        assert_not_in(str(self.private_project.title), res)
+
+    @mock.patch('website.discovery.snapshot.get_popular_hits')
+    def test_snapshot_hides_nodes_made_private(self, mock_hits):
+        mock_hits.return_value = [{'id': self.project._id, 'hits': 7, 'visits': 6}]
+        snapshot.refresh()
+        self.project.set_privacy('private', auth=Auth(self.project.creator), save=True)
+        assert_equal(snapshot.get_snapshot()['popular_public_projects'], [])
+        # Piwik isn't called when the page is rendered
+        mock_hits.reset_mock()
+        self.app.get(self.project.web_url_for('activity'))
+        assert_false(mock_hits.called)
+
 
 class TestForgotAndResetPasswordViews(OsfTestCase):
 
@@ -6,9 +6,7 @@ import mimetypes
 from bson import ObjectId
 from modularodm import fields
 from mako.lookup import TemplateLookup
-from time import sleep
 
-import requests
 from modularodm import Q
 
 from framework.auth.decorators import must_be_logged_in
@@ -21,6 +19,7 @@ from framework.exceptions import (
 
 from website import settings
 from website.addons.base import serializer
+from website.addons.base import http_client
 from website.project.model import Node
 from website.util import waterbutler_url_for
 
@@ -724,13 +723,11 @@ class StorageAddonBase(object):
             'metadata',
             **kwargs
         )
-        res = requests.get(metadata_url)
+        res = http_client.get_session('waterbutler').get(metadata_url)
         if res.status_code != 200:
             raise HTTPError(res.status_code, data={
                 'error': res.json(),
             })
-        # TODO: better throttling?
-        sleep(1.0 / 5.0)
         return res.json().get('data', [])
 
     def _get_file_tree(self, filenode=None, user=None, cookie=None, version=None):
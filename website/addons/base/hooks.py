@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Run the `before_page_load` callbacks of a node's addons.
+
+Some callbacks call remote APIs, e.g. GitHub's checks whether the linked
+repo is public. By default they run serially on the request thread, since
+they also read models, and give up on each remote request after
+`ADDON_HOOK_TIMEOUT` seconds. With `ADDON_HOOK_WORKERS` > 1 they run
+concurrently in a shared thread pool, and the page waits for them at most
+`ADDON_HOOK_TIMEOUT` seconds in total. Callbacks that are still running
+when the deadline passes, that time out or that fail contribute no
+messages. Results
+are cached per node and addon for `ADDON_HOOK_CACHE_TTL` seconds, including
+those of callbacks that finish after their page was served.
+"""
+import time
+import logging
+import functools
+import threading
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+
+from flask import g, copy_current_request_context, has_request_context
+from requests.exceptions import Timeout
+
+from framework.cache import LRUCache
+
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+# Cached messages and the time they were computed, keyed by `cache_key`
+_cache = LRUCache(settings.ADDON_HOOK_CACHE_SIZE)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(settings.ADDON_HOOK_WORKERS)
+        return _pool
+
+
+def cache_key(addon, node, user):
+    # Callbacks only warn contributors, and compare the node's privacy
+    # to that of the remote resource
+    return (
+        node._id,
+        addon.config.short_name,
+        node.is_public,
+        node.is_contributor(user),
+    )
+
+
+def get_cached(key):
+    entry = _cache.get(key)
+    if entry is None or time.time() - entry[0] > settings.ADDON_HOOK_CACHE_TTL:
+        return None
+    return entry[1]
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def run_hook(addon, node, user, key):
+    """Run the callback of `addon` and cache its messages.
+
+    :return: Tuple of (<messages>, <seconds elapsed>)
+    """
+    start = time.time()
+    messages = addon.before_page_load(node, user) or []
+    _cache.set(key, (time.time(), messages))
+    return messages, time.time() - start
+
+
+def record_hook_timing(addon, elapsed, timed_out=False):
+    """Log the time taken by an addon's callback and keep it on
+    `flask.g.addon_hook_timings` for the current request.
+    """
+    timing = {
+        'addon': addon.config.short_name,
+        'elapsed': elapsed,
+        'timed_out': timed_out,
+    }
+    if timed_out:
+        logger.warning('before_page_load of {addon} timed out'.format(**timing))
+    else:
+        logger.debug('Ran before_page_load of {addon} in {elapsed:.4f}s'.format(**timing))
+    try:
+        if not hasattr(g, 'addon_hook_timings'):
+            g.addon_hook_timings = []
+        g.addon_hook_timings.append(timing)
+    except RuntimeError:  # Not in an application context
+        pass
+
+
+def _run_serially(node, user, pending):
+    results = {}
+    for addon, key in pending:
+        start = time.time()
+        try:
+            messages, elapsed = run_hook(addon, node, user, key)
+        except Timeout:
+            record_hook_timing(addon, time.time() - start, timed_out=True)
+            continue
+        except Exception as error:
+            logger.exception(error)
+            continue
+        record_hook_timing(addon, elapsed)
+        results[key] = messages
+    return results
+
+
+def _run_concurrently(node, user, pending):
+    start = time.time()
+    deadline = start + settings.ADDON_HOOK_TIMEOUT
+    pool = get_pool()
+    calls = []
+    for addon, key in pending:
+        call = functools.partial(run_hook, addon, node, user, key)
+        if has_request_context():
+            # Each call gets its own copy of the request context
+            call = copy_current_request_context(call)
+        calls.append((addon, key, pool.apply_async(call)))
+
+    results = {}
+    for addon, key, result in calls:
+        try:
+            messages, elapsed = result.get(timeout=max(deadline - time.time(), 0))
+        except (TimeoutError, Timeout):
+            record_hook_timing(addon, time.time() - start, timed_out=True)
+            continue
+        except Exception as error:
+            logger.exception(error)
+            continue
+        record_hook_timing(addon, elapsed)
+        results[key] = messages
+    return results
+
+
+def before_page_load(node, user):
+    """Run the `before_page_load` callbacks of the addons of `node`.
+
+    :return list: Messages to display, in the order of the addons
+    """
+    keys = []
+    pending = []
+    results = {}
+    for addon in node.get_addons():
+        key = cache_key(addon, node, user)
+        keys.append(key)
+        cached = get_cached(key)
+        if cached is None:
+            pending.append((addon, key))
+        else:
+            results[key] = cached
+
+    if pending:
+        if settings.ADDON_HOOK_WORKERS > 1:
+            results.update(_run_concurrently(node, user, pending))
+        else:
+            results.update(_run_serially(node, user, pending))
+
+    return [
+        message
+        for key in keys
+        for message in results.get(key, [])
+    ]
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""Outbound HTTP for addons.
+
+Requests to a provider's API go through a `requests` transport adapter
+shared by all sessions for that provider, so that connections are pooled per
+host whether the session is anonymous (`get_session`) or belongs to an
+OAuth library (`mount`). Sessions themselves are not shared, since they keep
+the cookies set by responses. The adapter
+
+* waits for the provider's rate budget, `ADDON_HTTP_RATE_LIMITS`, before
+  each request;
+* retries requests that fail with 429, or with a 5xx or a connection error
+  if they are idempotent, backing off exponentially or as the provider asks
+  with ``Retry-After``. OAuth 1 requests are not retried, since the retry
+  would reuse the nonce of the signature. Neither are requests sent with a
+  timeout, so that they fail within it;
+* keeps successful GET responses that carry an ``ETag`` or
+  ``Last-Modified`` header, and revalidates them with a conditional request;
+  a 304 is answered from the cache. Entries are keyed by URL and credentials,
+  so responses are never shared between users.
+"""
+import re
+import copy
+import time
+import hashlib
+import httplib as http
+import logging
+import itertools
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+
+from framework.cache import LRUCache
+
+from website import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# OAuth 1 headers are signed with a nonce and timestamp; only the token
+# identifies the user
+OAUTH1_TOKEN_RE = re.compile(r'oauth_token="([^"]*)"')
+OAUTH1_NONCE = 'oauth_nonce='
+
+#: Counters for this process, see `get_metrics`
+stats = {
+    'requests': 0,  # Requests sent, including retries
+    'retries': 0,
+    'cache_hits': 0,  # Requests answered with 304 from the cache
+    'throttled': 0.0,  # Seconds spent waiting for rate budgets
+}
+
+_cache = LRUCache(settings.ADDON_HTTP_CACHE_SIZE)
+
+_budgets = {}
+_adapters = {}
+_lock = threading.Lock()
+
+
+class RateBudget(object):
+    """Token bucket allowing `rate` requests per second on average, in
+    bursts of up to `rate` requests. Callers over budget reserve their
+    token and sleep until it is due, so that they are served in order.
+    """
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.tokens = self.rate
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available.
+
+        :return float: Seconds waited
+        """
+        with self._lock:
+            now = time.time()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+def get_budget(provider):
+    """Return the rate budget of `provider`, or None if it is unlimited."""
+    rate = settings.ADDON_HTTP_RATE_LIMITS.get(provider)
+    if not rate:
+        return None
+    with _lock:
+        if provider not in _budgets:
+            _budgets[provider] = RateBudget(rate)
+        return _budgets[provider]
+
+
+def wait_for_budget(provider):
+    """Take a token from the rate budget of `provider`; for clients that
+    can't be routed through `mount`.
+    """
+    budget = get_budget(provider)
+    if budget is not None:
+        stats['throttled'] += budget.acquire()
+
+
+def cache_key(provider, request):
+    credentials = request.headers.get('Authorization', '')
+    match = OAUTH1_TOKEN_RE.search(credentials)
+    if match:
+        credentials = match.group(1)
+    credentials += request.headers.get('Cookie', '')
+    return (provider, request.url, hashlib.sha1(credentials.encode('utf-8')).hexdigest())
+
+
+def retry_delay(attempt, response=None):
+    """Seconds to wait before retry number `attempt` (from 0), honoring a
+    ``Retry-After`` header given in seconds.
+    """
+    delay = settings.ADDON_HTTP_BACKOFF * 2 ** attempt
+    if response is not None:
+        try:
+            delay = float(response.headers['Retry-After'])
+        except (KeyError, ValueError):
+            pass
+    return min(delay, settings.ADDON_HTTP_MAX_BACKOFF)
+
+
+class AddonHTTPAdapter(HTTPAdapter):
+    """Transport adapter for the requests to `provider`; see the module
+    docstring. Instances are shared, see `get_adapter`.
+
+    :param str provider: Key of the provider in `ADDON_HTTP_RATE_LIMITS`
+    :param bool cache: Revalidate and reuse GET responses
+    """
+
+    def __init__(self, provider, cache=True, **kwargs):
+        self.provider = provider
+        self.cache = cache
+        kwargs.setdefault('pool_connections', settings.ADDON_HTTP_POOL_CONNECTIONS)
+        kwargs.setdefault('pool_maxsize', settings.ADDON_HTTP_POOL_SIZE)
+        super(AddonHTTPAdapter, self).__init__(**kwargs)
+
+    def close(self):
+        # Other sessions share the pools; don't let one of them close them
+        pass
+
+    def send(self, request, **kwargs):
+        key = cached = None
+        if self.cache and request.method == 'GET' and not kwargs.get('stream'):
+            key = cache_key(self.provider, request)
+            cached = _cache.get(key)
+            if cached is not None:
+                if cached.headers.get('ETag'):
+                    request.headers['If-None-Match'] = cached.headers['ETag']
+                if cached.headers.get('Last-Modified'):
+                    request.headers['If-Modified-Since'] = cached.headers['Last-Modified']
+
+        response = self._send_with_retries(request, **kwargs)
+
+        if cached is not None and response.status_code == http.NOT_MODIFIED:
+            stats['cache_hits'] += 1
+            response.close()
+            response = copy.copy(cached)
+            response.request = request
+            return response
+        if key is not None and response.status_code == http.OK and (
+                response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            # Read the body so that it can be replayed
+            response.content
+            _cache.set(key, copy.copy(response))
+        return response
+
+    def _send_with_retries(self, request, **kwargs):
+        idempotent = request.method in IDEMPOTENT_METHODS
+        retries = settings.ADDON_HTTP_RETRIES
+        if OAUTH1_NONCE in request.headers.get('Authorization', '') or OAUTH1_NONCE in request.url:
+            retries = 0
+        if kwargs.get('timeout') is not None:
+            retries = 0
+        for attempt in itertools.count():
+            wait_for_budget(self.provider)
+            stats['requests'] += 1
+            try:
+                response = super(AddonHTTPAdapter, self).send(request, **kwargs)
+            except (ConnectionError, Timeout) as error:
+                if not idempotent or attempt >= retries:
+                    raise
+                reason, delay = error, retry_delay(attempt)
+            else:
+                status = response.status_code
+                if (status not in RETRY_STATUSES or
+                        (status != 429 and not idempotent) or
+                        attempt >= retries):
+                    return response
+                reason, delay = status, retry_delay(attempt, response)
+                response.close()
+            logger.warning('Retrying {0} {1} in {2}s after {3}'.format(
+                request.method, request.url, delay, reason
+            ))
+            stats['retries'] += 1
+            time.sleep(delay)
+
+
+def get_adapter(provider, cache=True):
+    with _lock:
+        key = (provider, cache)
+        if key not in _adapters:
+            _adapters[key] = AddonHTTPAdapter(provider, cache=cache)
+        return _adapters[key]
+
+
+def set_timeout(session, timeout):
+    """Give up on requests of `session` that don't set their own timeout
+    after `timeout` seconds, for client libraries that don't take one.
+    """
+    request = session.request
+
+    def request_with_timeout(method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = timeout
+        return request(method, url, **kwargs)
+
+    session.request = request_with_timeout
+
+
+def mount(session, provider, cache=True, timeout=None):
+    """Route all requests of `session`, e.g. the session of an OAuth client
+    library, through the shared adapter of `provider`.
+
+    :param float timeout: Optional default timeout of the requests, in seconds
+    :return: `session`
+    """
+    adapter = get_adapter(provider, cache=cache)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if timeout is not None:
+        set_timeout(session, timeout)
+    return session
+
+
+def get_session(provider, timeout=None):
+    """Return a new session for requests to `provider` that don't need
+    session-level state such as OAuth credentials. Sessions are cheap; the
+    connection pools belong to the shared adapter.
+    """
+    return mount(requests.Session(), provider, timeout=timeout)
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def get_metrics():
+    """Return the counters of this process and the number of cached
+    responses.
+    """
+    metrics = dict(stats)
+    metrics['cached'] = len(_cache)
+    return metrics
@@ -89,7 +89,7 @@ class CitationsProvider(object):
 
         return None
 
-    def citation_list(self, node_addon, user, list_id, show='all'):
+    def citation_list(self, node_addon, user, list_id, show='all', page=None, size=None):
 
         attached_list_id = self._folder_id(node_addon)
         account_folders = node_addon.api.citation_lists(self._extract_folder)
@@ -123,6 +123,7 @@ class CitationsProvider(object):
                 ancestor_id = folders[ancestor_id].get('parent_list_id')
 
         contents = []
+        total = None
         if list_id is None:
             contents = [node_addon.root_folder]
         else:
@@ -138,14 +139,21 @@ class CitationsProvider(object):
                 ]
 
             if show in ('all', 'citations'):
+                total, citations = node_addon.api.get_page(list_id, page=page, size=size)
                 contents += [
                     self.serializer(
                         node_settings=node_addon,
                         user_settings=user_settings,
                     ).serialize_citation(each)
-                    for each in node_addon.api.get_list(list_id)
+                    for each in citations
                 ]
 
-        return {
+        ret = {
             'contents': contents
         }
+        if page is not None and total is not None:
+            ret.update({
+                'page': page,
+                'total': total,
+            })
+        return ret
@@ -1,6 +1,32 @@
 # -*- coding: utf-8 -*-
+import httplib as http
+
+from flask import request
+
+from framework.exceptions import HTTPError
+
+from website import settings
 from website.util import api_url_for, web_url_for
 
+
+def get_page_args():
+    """Parse the `page` (from 0) and `size` query parameters of a citation
+    listing. Listings are only paginated if `page` is given.
+
+    :return: Tuple of (<page>, <size>), or (None, None)
+    """
+    if 'page' not in request.args:
+        return None, None
+    try:
+        page = int(request.args['page'])
+        size = int(request.args.get('size', settings.CITATION_PAGE_SIZE))
+    except ValueError:
+        raise HTTPError(http.BAD_REQUEST)
+    if page < 0 or size < 1:
+        raise HTTPError(http.BAD_REQUEST)
+    return page, size
+
+
 def serialize_account(account):
     if account is None:
         return None
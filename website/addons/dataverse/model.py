@@ -1,6 +1,4 @@
 # -*- coding: utf-8 -*-
-from time import sleep
-import requests
 import httplib as http
 
 from modularodm import fields
@@ -12,6 +10,7 @@ from website.addons.base import (
     AddonOAuthNodeSettingsBase, AddonOAuthUserSettingsBase, exceptions,
 )
 from website.addons.base import StorageAddonBase
+from website.addons.base import http_client
 from website.util import waterbutler_url_for
 
 from website.addons.dataverse.client import connect_from_settings_or_401
@@ -87,7 +86,7 @@ class AddonDataverseNodeSettings(StorageAddonBase, AddonOAuthNodeSettingsBase):
             'metadata',
             **kwargs
         )
-        res = requests.get(metadata_url)
+        res = http_client.get_session('waterbutler').get(metadata_url)
         if res.status_code != 200:
             # The Dataverse API returns a 404 if the dataset has no published files
             if res.status_code == http.NOT_FOUND and version == 'latest-published':
@@ -95,8 +94,6 @@ class AddonDataverseNodeSettings(StorageAddonBase, AddonOAuthNodeSettingsBase):
             raise HTTPError(res.status_code, data={
                 'error': res.json(),
             })
-        # TODO: better throttling?
-        sleep(1.0 / 5.0)
         return res.json().get('data', [])
 
     def delete(self, save=True):
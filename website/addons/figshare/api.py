@@ -1,10 +1,10 @@
 import os
 import json
 
-import requests
 from requests_oauthlib import OAuth1Session
 
 from website.util.sanitize import escape_html
+from website.addons.base import http_client
 
 from . import settings as figshare_settings
 
@@ -17,20 +17,20 @@ class Figshare(object):
     def __init__(self, client_token=None, client_secret=None, owner_token=None, owner_secret=None):
         # if no OAuth
         if owner_token is None:
-            self.session = requests
+            self.session = http_client.get_session('figshare')
         else:
             self.client_token = client_token
             self.client_secret = client_secret
             self.owner_token = owner_token
             self.owner_secret = owner_secret
 
-            self.session = OAuth1Session(
+            self.session = http_client.mount(OAuth1Session(
                 client_token,
                 client_secret=client_secret,
                 resource_owner_key=owner_token,
                 resource_owner_secret=owner_secret,
                 signature_type='auth_header'
-            )
+            ), 'figshare')
         self.last_error = None
 
     @classmethod
@@ -130,8 +130,12 @@ class Figshare(object):
         articles = [self.article(node_settings, article['article_id']) for article in articles['items']]
         return articles, 200
 
-    def article_is_public(self, article):
-        res = requests.get(os.path.join(figshare_settings.API_URL, 'articles', str(article)))
+    def article_is_public(self, article, timeout=None):
+        # Anonymous, so that only public articles are found
+        res = http_client.get_session('figshare').get(
+            os.path.join(figshare_settings.API_URL, 'articles', str(article)),
+            timeout=timeout,
+        )
         if res.status_code == 200:
             data = json.loads(res.content)
             if data['count'] == 0:
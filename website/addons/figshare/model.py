@@ -4,6 +4,7 @@ from modularodm import fields
 
 from framework.auth.decorators import Auth
 
+from website import settings
 from website.models import NodeLog
 from website.addons.base import exceptions
 from website.addons.base import AddonNodeSettingsBase, AddonUserSettingsBase
@@ -262,7 +263,8 @@ class AddonFigShareNodeSettings(StorageAddonBase, AddonNodeSettingsBase):
                 message = messages.BEFORE_PAGE_LOAD_PUBLIC_NODE_MIXED_FS.format(category=node.project_or_component, project_id=figshare.figshare_id)
 
         connect = Figshare.from_settings(self.user_settings)
-        article_is_public = connect.article_is_public(self.figshare_id)
+        # Runs while the page waits, see `website.addons.base.hooks`
+        article_is_public = connect.article_is_public(self.figshare_id, timeout=settings.ADDON_HOOK_TIMEOUT)
 
         article_permissions = 'public' if article_is_public else 'private'
 
@@ -2,21 +2,15 @@ import urllib
 import itertools
 
 import github3
-import cachecontrol
-from requests.adapters import HTTPAdapter
 
+from website.addons.base import http_client
 from website.addons.github import settings as github_settings
 from website.addons.github.exceptions import NotFoundError
 
 
-# Initialize caches
-https_cache = cachecontrol.CacheControlAdapter()
-default_adapter = HTTPAdapter()
-
-
 class GitHub(object):
 
-    def __init__(self, access_token=None, token_type=None):
+    def __init__(self, access_token=None, token_type=None, timeout=None):
 
         self.access_token = access_token
         if access_token and token_type:
@@ -27,19 +21,17 @@ class GitHub(object):
         else:
             self.gh3 = github3.GitHub()
 
-        # Caching libary
-        if github_settings.CACHE:
-            self.gh3._session.mount('https://api.github.com/user', default_adapter)
-            self.gh3._session.mount('https://', https_cache)
+        http_client.mount(self.gh3._session, 'github', cache=github_settings.CACHE, timeout=timeout)
 
     @classmethod
-    def from_settings(cls, settings):
+    def from_settings(cls, settings, timeout=None):
         if settings:
             return cls(
                 access_token=settings.oauth_access_token,
                 token_type=settings.oauth_token_type,
+                timeout=timeout,
             )
-        return cls()
+        return cls(timeout=timeout)
 
     def user(self, user=None):
         """Fetch a user or the authenticated user.
@@ -328,7 +328,8 @@ class AddonGitHubNodeSettings(StorageAddonBase, AddonNodeSettingsBase):
         if self.user_settings is None:
             return messages
 
-        connect = GitHub.from_settings(self.user_settings)
+        # Runs while the page waits, see `website.addons.base.hooks`
+        connect = GitHub.from_settings(self.user_settings, timeout=settings.ADDON_HOOK_TIMEOUT)
 
         try:
             repo = connect.repo(self.user, self.repo)
@@ -6,6 +6,7 @@ from oauthlib.oauth2 import InvalidGrantError
 from framework.exceptions import HTTPError
 
 from website.util.client import BaseClient
+from website.addons.base import http_client
 from website.addons.googledrive import settings
 from website.addons.googledrive import exceptions
 
@@ -52,6 +53,10 @@ class GoogleDriveClient(BaseClient):
     def __init__(self, access_token=None):
         self.access_token = access_token
 
+    @property
+    def _session(self):
+        return http_client.get_session('googledrive')
+
     @property
     def _default_headers(self):
         if self.access_token:
@@ -4,5 +4,5 @@ from mendeley.session import MendeleySession
 class APISession(MendeleySession):
 
     def request(self, *args, **kwargs):
-        kwargs['params'] = {'view': 'all', 'limit': '500'}
+        kwargs['params'] = dict(kwargs.get('params') or {}, view='all', limit='500')
         return super(APISession, self).request(*args, **kwargs)
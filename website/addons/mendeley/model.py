@@ -1,16 +1,19 @@
 # -*- coding: utf-8 -*-
 
 import time
+import datetime
 
 import mendeley
 from modularodm import fields
 
 from website.addons.base import AddonOAuthNodeSettingsBase
 from website.addons.base import AddonOAuthUserSettingsBase
+from website.addons.base import http_client
 from website.addons.citations.utils import serialize_folder
 from website.addons.mendeley import serializer
 from website.addons.mendeley import settings
 from website.addons.mendeley.api import APISession
+from website.citations.models import CitationLibrary
 from website.oauth.models import ExternalProvider
 from website.util import web_url_for
 
@@ -49,7 +52,7 @@ class Mendeley(ExternalProvider):
                                          service_name='mendeley',
                                          _absolute=True),
             )
-            self._client = APISession(partial, credentials)
+            self._client = http_client.mount(APISession(partial, credentials), 'mendeley')
 
         return self._client
 
@@ -93,34 +96,50 @@ class Mendeley(ExternalProvider):
         :param str list_id: ID for a Mendeley folder. Optional.
         :return CitationList: CitationList for the folder, or for all documents
         """
-        if list_id == 'ROOT':
-            folder = None
-        else:
-            folder = self.client.folders.get(list_id)
+        return self.get_page(list_id)[1]
+
+    def get_page(self, list_id='ROOT', page=None, size=None):
+        """Get a page of a CitationList from the cached library
 
-        if folder:
-            return self._citations_for_mendeley_folder(folder)
-        return self._citations_for_mendeley_user()
+        :return: Tuple of (<total>, <citations>)
+        """
+        library = CitationLibrary.for_provider(self)
+        document_ids = None
+        if list_id and list_id != 'ROOT':
+            document_ids = library.get_folder_ids(self, list_id)
+        return library.get_page(document_ids, page=page, size=size)
 
     def _folder_metadata(self, folder_id):
         folder = self.client.folders.get(folder_id)
         return folder
 
-    def _citations_for_mendeley_folder(self, folder):
-
-        document_ids = [
+    def fetch_folder_document_ids(self, folder_id):
+        folder = self._folder_metadata(folder_id)
+        return [
             document.id
             for document in folder.documents.iter(page_size=500)
         ]
-        citations = {
-            citation['id']: citation
-            for citation in self._citations_for_mendeley_user()
-        }
-        return map(lambda id: citations[id], document_ids)
 
-    def _citations_for_mendeley_user(self):
+    def fetch_citation_changes(self, version):
+        """Fetch the documents modified and deleted since `version`, the
+        time of the previous sync.
+
+        :return: Tuple of (<citations>, <deleted IDs>, <time of this sync>,
+            True)
+        """
+        synced = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        if version is None:
+            return self._citations_for_mendeley_user(), [], synced, True
+        citations = self._citations_for_mendeley_user(modified_since=version)
+        deleted_ids = [
+            document.id
+            for document in self.client.documents.iter(page_size=500, deleted_since=version)
+        ]
+        return citations, deleted_ids, synced, True
+
+    def _citations_for_mendeley_user(self, **kwargs):
 
-        documents = self.client.documents.iter(page_size=500)
+        documents = self.client.documents.iter(page_size=500, **kwargs)
         return [
             self._citation_for_mendeley_document(document)
             for document in documents
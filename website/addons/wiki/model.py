@@ -3,6 +3,7 @@
 import datetime
 import functools
 import logging
+import weakref
 
 from bleach import linkify
 from bleach.callbacks import nofollow
@@ -18,6 +19,7 @@ from framework.guid.model import GuidStoredObject
 from website import settings
 from website.addons.base import AddonNodeSettingsBase
 from website.addons.wiki import utils as wiki_utils
+from website.addons.wiki import versions as wiki_versions
 from website.addons.wiki.settings import WIKI_CHANGE_DATE
 from website.project.signals import write_permissions_revoked
 
@@ -152,6 +154,31 @@ def render_content(content, node):
     return sanitized_content
 
 
+class VersionContentField(fields.StringField):
+    """Content of a wiki page version. Versions stored as reverse deltas
+    (see `website.addons.wiki.versions`) have no stored content; reading the
+    field rebuilds the text from the delta.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(VersionContentField, self).__init__(*args, **kwargs)
+        self.reconstructed = weakref.WeakKeyDictionary()
+
+    def remember(self, instance, text):
+        self.reconstructed[instance] = text
+
+    def __get__(self, instance, owner, check_dirty=True):
+        if instance is None:
+            return self
+        value = super(VersionContentField, self).__get__(instance, owner, check_dirty)
+        if value is None and instance.delta:
+            try:
+                value = self.reconstructed[instance]
+            except KeyError:
+                value = self.reconstructed[instance] = wiki_versions.reconstruct(instance)
+        return value
+
+
 class NodeWikiPage(GuidStoredObject):
 
     _id = fields.StringField(primary=True)
@@ -160,7 +187,10 @@ class NodeWikiPage(GuidStoredObject):
     version = fields.IntegerField()
     date = fields.DateTimeField(auto_now_add=datetime.datetime.utcnow)
     is_current = fields.BooleanField()
-    content = fields.StringField(default='')
+    content = VersionContentField(default='')
+    # Reverse delta against the next version, set instead of `content` on
+    # versions that are not snapshots
+    delta = fields.DictionaryField()
 
     user = fields.ForeignField('user')
     node = fields.ForeignField('node')
@@ -177,8 +207,7 @@ class NodeWikiPage(GuidStoredObject):
     def rendered_before_update(self):
         return self.date < WIKI_CHANGE_DATE
 
-    def html(self, node):
-        """The cleaned HTML of the page"""
+    def _render(self, node):
         sanitized_content = render_content(self.content, node=node)
         try:
             return linkify(
@@ -189,10 +218,27 @@ class NodeWikiPage(GuidStoredObject):
             logger.warning('Returning unlinkified content.')
             return sanitized_content
 
+    def _rendered(self, node):
+        """Return the render cache entry for this version, rendering the page
+        on a miss.
+        """
+        entry = wiki_utils.render_cache.get(self._id, node._id, self.content)
+        if entry is None:
+            entry = {'html': self._render(node)}
+            wiki_utils.render_cache.set(self._id, node._id, self.content, entry)
+        return entry
+
+    def html(self, node):
+        """The cleaned HTML of the page"""
+        return self._rendered(node)['html']
+
     def raw_text(self, node):
         """ The raw text of the page, suitable for using in a test search"""
-
-        return sanitize(self.html(node), tags=[], strip=True)
+        entry = self._rendered(node)
+        if entry.get('text') is None:
+            entry = dict(entry, text=sanitize(entry['html'], tags=[], strip=True))
+            wiki_utils.render_cache.set(self._id, node._id, self.content, entry)
+        return entry['text']
 
     def get_draft(self, node):
         """
@@ -7,3 +7,13 @@ SHAREJS_URL = '{}:{}'.format(SHAREJS_HOST, SHAREJS_PORT)
 
 # TODO: Change to release date for wiki change
 WIKI_CHANGE_DATE = datetime.datetime.utcfromtimestamp(1423760098)
+
+# Number of rendered page versions kept in memory per process
+RENDER_CACHE_SIZE = 1000
+# Optional collection that persists rendered pages across processes; set to
+# e.g. 'wikirendercache' to enable
+RENDER_CACHE_COLLECTION = None
+
+# Every n-th version of a page keeps its full content; other past versions
+# are stored as deltas against the next version
+VERSION_SNAPSHOT_INTERVAL = 10
@@ -19,6 +19,8 @@ from tests.factories import (
 from website.exceptions import NodeStateError
 from website.addons.wiki import settings
 from website.addons.wiki import views
+from website.addons.wiki import utils as wiki_utils
+from website.addons.wiki import versions as wiki_versions
 from website.addons.wiki.exceptions import InvalidVersionError
 from website.addons.wiki.model import NodeWikiPage, render_content
 from website.addons.wiki.utils import (
@@ -43,6 +45,166 @@ class TestNodeWikiPageModel(OsfTestCase):
             page.save()
 
 
+class TestWikiRenderCache(OsfTestCase):
+
+    def setUp(self):
+        super(TestWikiRenderCache, self).setUp()
+        self.project = ProjectFactory()
+        self.auth = Auth(self.project.creator)
+        self.project.update_node_wiki('home', 'Hello **world**', self.auth)
+        self.page = self.project.get_wiki_page('home')
+        wiki_utils.render_cache.clear()
+
+    @mock.patch('website.addons.wiki.model.render_content')
+    def test_html_is_rendered_once(self, mock_render):
+        mock_render.return_value = '<p>Hello</p>'
+        html = self.page.html(self.project)
+        assert_equal(self.page.html(self.project), html)
+        assert_equal(self.page.raw_text(self.project), 'Hello')
+        assert_equal(mock_render.call_count, 1)
+
+    def test_cached_per_node(self):
+        fork = self.project.fork_node(self.auth)
+        self.page.html(self.project)
+        self.page.html(fork)
+        content = self.page.content
+        assert_is_not_none(wiki_utils.render_cache.get(self.page._id, self.project._id, content))
+        assert_is_not_none(wiki_utils.render_cache.get(self.page._id, fork._id, content))
+
+    def test_whitelist_change_changes_key(self):
+        key = wiki_utils.render_cache.key(self.page._id, self.project._id, self.page.content)
+        whitelist = deepcopy(wiki_utils.settings.WIKI_WHITELIST)
+        whitelist['tags'].append('marquee')
+        with mock.patch.object(wiki_utils.settings, 'WIKI_WHITELIST', whitelist):
+            assert_not_equal(wiki_utils.render_cache.key(self.page._id, self.project._id, self.page.content), key)
+
+    def test_edit_in_place_changes_key(self):
+        assert_in('<strong>world</strong>', self.page.html(self.project))
+        self.page.content = 'Goodbye'
+        self.page.save()
+        assert_not_in('world', self.page.html(self.project))
+
+    def test_edit_in_other_process_not_served_stale(self):
+        assert_in('<strong>world</strong>', self.page.html(self.project))
+        # Another process edits the page; this process's cache isn't told
+        self.db['nodewikipage'].update({'_id': self.page._id}, {'$set': {'content': u'Goodbye \u2603'}})
+        NodeWikiPage._clear_caches()
+        page = NodeWikiPage.load(self.page._id)
+        assert_not_in('world', page.html(self.project))
+
+    def test_least_recently_used_entry_evicted(self):
+        cache = wiki_utils.RenderCache(max_size=2)
+        cache.set('a', 'node', 'a', {'html': 'a'})
+        cache.set('b', 'node', 'b', {'html': 'b'})
+        cache.get('a', 'node', 'a')
+        cache.set('c', 'node', 'c', {'html': 'c'})
+        assert_is_none(cache.get('b', 'node', 'b'))
+        assert_equal(cache.get('a', 'node', 'a'), {'html': 'a'})
+
+    def test_persistent_collection(self):
+        cache = wiki_utils.RenderCache(max_size=2, collection_name='wikirendercache')
+        cache.set('a', 'node', 'old', {'html': 'old'})
+        cache.entries.clear()
+        assert_equal(cache.get('a', 'node', 'old'), {'html': 'old'})
+        # Entries of earlier contents of the page are dropped
+        cache.set('a', 'node', 'new', {'html': 'new'})
+        assert_equal(self.db['wikirendercache'].count(), 1)
+        cache.clear()
+
+
+class TestWikiVersions(OsfTestCase):
+
+    def setUp(self):
+        super(TestWikiVersions, self).setUp()
+        self.project = ProjectFactory()
+        self.auth = Auth(self.project.creator)
+        self.lines = ['Line {0} of a long wiki page\n'.format(i) for i in range(20)]
+
+    def edit(self, count):
+        texts = []
+        for i in range(count):
+            self.lines[i % len(self.lines)] = 'Edit {0}\n'.format(i)
+            texts.append(''.join(self.lines))
+            self.project.update_node_wiki('home', texts[-1], self.auth)
+        return texts
+
+    def stored(self, page_id):
+        return self.db['nodewikipage'].find_one({'_id': page_id})
+
+    def test_diff_and_patch(self):
+        base = 'one\ntwo\nthree\n'
+        text = 'one\n2\nthree\nfour'
+        assert_equal(wiki_versions.patch(base, wiki_versions.diff(base, text)), text)
+
+    @mock.patch.object(settings, 'VERSION_SNAPSHOT_INTERVAL', 4)
+    def test_versions_stored_as_deltas(self):
+        self.edit(9)
+        page_ids = self.project.wiki_pages_versions['home']
+        snapshots = [
+            self.stored(page_id)['version']
+            for page_id in page_ids
+            if self.stored(page_id)['content'] is not None
+        ]
+        assert_equal(snapshots, [4, 8, 9])
+        assert_equal(self.stored(page_ids[0])['delta']['base'], page_ids[1])
+
+    @mock.patch.object(settings, 'VERSION_SNAPSHOT_INTERVAL', 4)
+    def test_versions_reconstructed(self):
+        texts = self.edit(9)
+        NodeWikiPage._clear_caches()
+        for version, text in enumerate(texts, 1):
+            assert_equal(self.project.get_wiki_page('home', version).content, text)
+
+    def test_small_change_not_compressed_when_larger(self):
+        self.project.update_node_wiki('home', 'Hello world', self.auth)
+        self.project.update_node_wiki('home', 'Hola mundo', self.auth)
+        page = self.project.get_wiki_page('home', 1)
+        assert_equal(self.stored(page._id)['content'], 'Hello world')
+        assert_false(page.delta)
+
+    def assert_original_uncompressed(self, texts):
+        NodeWikiPage._clear_caches()
+        page = self.project.get_wiki_page('home')
+        assert_equal(self.stored(page._id)['content'], texts[-1])
+        assert_false(page.delta)
+        for version, text in enumerate(texts, 1):
+            assert_equal(self.project.get_wiki_page('home', version).content, text)
+
+    def test_fork_edit_does_not_compress_original(self):
+        texts = self.edit(2)
+        fork = self.project.fork_node(self.auth)
+        fork.update_node_wiki('home', 'Forked', self.auth)
+        self.assert_original_uncompressed(texts)
+        assert_equal(fork.get_wiki_page('home').content, 'Forked')
+
+    def test_registration_edit_does_not_compress_original(self):
+        texts = self.edit(2)
+        registration = self.project.register_node(None, self.auth, '', None)
+        registration.update_node_wiki('home', 'Registered', self.auth)
+        self.assert_original_uncompressed(texts)
+
+    def test_current_version_not_compressed(self):
+        self.edit(2)
+        page = self.project.get_wiki_page('home')
+        successor = NodeWikiPage(page_name='home', node=self.project, content=page.content + 'More\n')
+        assert_false(wiki_versions.compress(page, successor))
+        assert_false(page.delta)
+
+    def test_version_of_other_node_not_compressed(self):
+        self.edit(2)
+        fork = self.project.fork_node(self.auth)
+        fork.update_node_wiki('home', ''.join(self.lines) + 'Forked\n', self.auth)
+        page = self.project.get_wiki_page('home', 1)
+        assert_false(wiki_versions.compress(page, fork.get_wiki_page('home')))
+        assert_false(page.delta)
+
+    def test_version_listing_from_metadata(self):
+        self.edit(3)
+        versions = views._get_wiki_versions(self.project, 'home')
+        assert_equal([each['version'] for each in versions], [3, 2, 1])
+        assert_equal(versions[0]['user_fullname'], self.project.creator.fullname)
+
+
 class TestWikiViews(OsfTestCase):
 
     def setUp(self):
@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 import os
+import re
+import json
 import urllib
 import uuid
+import hashlib
 
 from pymongo import MongoClient
 import requests
 
+from framework.cache import LRUCache
+from framework.mongo import database
 from framework.mongo.utils import to_mongo_key
 
 from website import settings
@@ -87,6 +92,82 @@ def migrate_uuid(node, wname):
     broadcast_to_sharejs('unlock', old_sharejs_uuid, data=write_contributors)
 
 
+#: Bump when the output of `render_content` changes to invalidate cached pages
+RENDERER_VERSION = 1
+
+
+def renderer_key():
+    """Identify the current renderer configuration. Changing the sanitizer
+    whitelist yields a new key, so pages rendered under the old whitelist are
+    no longer served from the cache.
+    """
+    whitelist = json.dumps(settings.WIKI_WHITELIST, sort_keys=True)
+    return '{0}-{1}'.format(RENDERER_VERSION, hashlib.md5(whitelist).hexdigest()[:8])
+
+
+class RenderCache(object):
+    """Cache of rendered wiki page versions, keyed by page, the node the page
+    is rendered for (wiki links point into that node), a hash of the content
+    and `renderer_key`. Since the key changes with anything the rendering
+    depends on, pages edited in place or re-rendered differently never get a
+    stale entry, in this process or another, and nothing is invalidated.
+
+    Entries are dicts holding the sanitized ``html`` and, once computed, the
+    plain ``text``. They live in a per-process LRU and, if
+    `RENDER_CACHE_COLLECTION` is set, in a collection shared by all processes,
+    where storing an entry drops those of earlier contents of the page.
+    """
+
+    def __init__(self, max_size, collection_name=None):
+        self.entries = LRUCache(max_size)
+        self.collection_name = collection_name
+
+    @property
+    def collection(self):
+        return database[self.collection_name] if self.collection_name else None
+
+    def prefix(self, page_id, node_id):
+        return '{0}:{1}:'.format(page_id, node_id)
+
+    def key(self, page_id, node_id, content):
+        content = content or ''
+        if isinstance(content, unicode):
+            content = content.encode('utf-8')
+        digest = hashlib.md5(content).hexdigest()
+        return '{0}{1}:{2}'.format(self.prefix(page_id, node_id), digest, renderer_key())
+
+    def get(self, page_id, node_id, content):
+        key = self.key(page_id, node_id, content)
+        entry = self.entries.get(key)
+        if entry is None and self.collection is not None:
+            entry = self.collection.find_one({'_id': key}, {'html': True, 'text': True})
+            if entry is not None:
+                entry.pop('_id')
+                self.entries.set(key, entry)
+        return entry
+
+    def set(self, page_id, node_id, content, entry):
+        key = self.key(page_id, node_id, content)
+        self.entries.set(key, entry)
+        if self.collection is not None:
+            self.collection.update({'_id': key}, {'$set': entry}, upsert=True)
+            prefix = self.prefix(page_id, node_id)
+            self.collection.remove({
+                '_id': {'$regex': '^{0}'.format(re.escape(prefix)), '$ne': key},
+            })
+
+    def clear(self):
+        self.entries.clear()
+        if self.collection is not None:
+            self.collection.remove()
+
+
+render_cache = RenderCache(
+    max_size=wiki_settings.RENDER_CACHE_SIZE,
+    collection_name=wiki_settings.RENDER_CACHE_COLLECTION,
+)
+
+
 def share_db():
     """Generate db client for sharejs db"""
     client = MongoClient(settings.DB_HOST, settings.DB_PORT)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Delta storage for wiki page versions.
+
+The current version of a page and every `VERSION_SNAPSHOT_INTERVAL`-th
+version keep their full content. Once a newer version is saved, any other
+version is replaced by a reverse delta against its successor: a list of
+operations that rebuild its text from the successor's lines. Reading an old
+version therefore walks forward to the nearest full copy, touching at most
+`VERSION_SNAPSHOT_INTERVAL - 1` pages.
+
+Operations are either ``[start, stop]``, copying lines ``start:stop`` of the
+base text, or a string of inserted text.
+"""
+
+import difflib
+
+from website.addons.wiki import settings as wiki_settings
+
+#: Page fields returned by `get_metadata`
+METADATA_FIELDS = {'version': True, 'user': True, 'date': True}
+
+# Approximate storage cost of a copy operation, used to decide whether a
+# delta is worth keeping over the full text
+COPY_OP_SIZE = 8
+
+
+def diff(base, text):
+    """Return the operations that rebuild `text` from `base`."""
+    base_lines = base.splitlines(True)
+    text_lines = text.splitlines(True)
+    matcher = difflib.SequenceMatcher(None, base_lines, text_lines, autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(text_lines[j1:j2]))
+    return ops
+
+
+def patch(base, ops):
+    """Apply operations produced by `diff` to `base`."""
+    base_lines = base.splitlines(True)
+    parts = []
+    for op in ops:
+        if isinstance(op, basestring):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0]:op[1]])
+    return ''.join(parts)
+
+
+def delta_size(ops):
+    return sum(
+        len(op) if isinstance(op, basestring) else COPY_OP_SIZE
+        for op in ops
+    )
+
+
+def is_snapshot(page):
+    return not page.version or page.version % wiki_settings.VERSION_SNAPSHOT_INTERVAL == 0
+
+
+def _node_id(page):
+    return page.node._id if page.node else None
+
+
+def compress(page, successor, save=True):
+    """Replace the content of `page` with a reverse delta against
+    `successor`, its next version. Current versions, snapshot versions,
+    versions already stored as deltas and versions for which the delta would
+    not be smaller than the text are left untouched, as are versions whose
+    successor belongs to another node: forks and registrations share page
+    documents with the original, whose history must not depend on theirs.
+
+    :return bool: Whether the page was compressed
+    """
+    if page.delta or page.is_current or is_snapshot(page):
+        return False
+    if _node_id(page) != _node_id(successor):
+        return False
+    text = page.content
+    ops = diff(successor.content, text)
+    if delta_size(ops) >= len(text):
+        return False
+    page.content = None
+    page.delta = {'base': successor._id, 'ops': ops}
+    type(page).content.remember(page, text)
+    if save:
+        page.save()
+    return True
+
+
+def reconstruct(page):
+    """Rebuild the text of a page stored as a delta."""
+    base = type(page).load(page.delta['base'])
+    return patch(base.content, page.delta['ops'])
+
+
+def get_metadata(model, page_ids):
+    """Return the `METADATA_FIELDS` of the given pages, in the order of
+    `page_ids`, without loading page content.
+    """
+    collection = model._storage[0].store
+    records = {
+        record['_id']: record
+        for record in collection.find({'_id': {'$in': list(page_ids)}}, METADATA_FIELDS)
+    }
+    return [records[page_id] for page_id in page_ids if page_id in records]
@@ -5,15 +5,18 @@ import logging
 
 from bs4 import BeautifulSoup
 from flask import request
+from modularodm import Q
 
 from framework.mongo.utils import to_mongo_key
 from framework.exceptions import HTTPError
+from framework.auth.core import User
 from framework.auth.utils import privacy_info_handle
 from framework.auth.decorators import must_be_logged_in
 from framework.flask import redirect
 
 from website.addons.wiki import settings
 from website.addons.wiki import utils as wiki_utils
+from website.addons.wiki import versions as wiki_versions
 from website.profile.utils import get_gravatar
 from website.project.views.node import _view_project
 from website.project.model import has_anonymous_link
@@ -75,16 +78,17 @@ def _get_wiki_versions(node, name, anonymous=False):
     if key not in node.wiki_pages_versions:
         return []
 
-    versions = [
-        NodeWikiPage.load(version_wiki_id)
-        for version_wiki_id in node.wiki_pages_versions[key]
-    ]
+    versions = wiki_versions.get_metadata(NodeWikiPage, node.wiki_pages_versions[key])
+    users = {
+        user._id: user
+        for user in User.find(Q('_id', 'in', list({version['user'] for version in versions})))
+    }
 
     return [
         {
-            'version': version.version,
-            'user_fullname': privacy_info_handle(version.user.fullname, anonymous, name=True),
-            'date': '{} UTC'.format(version.date.replace(microsecond=0).isoformat().replace('T', ' ')),
+            'version': version['version'],
+            'user_fullname': privacy_info_handle(users[version['user']].fullname, anonymous, name=True),
+            'date': '{} UTC'.format(version['date'].replace(microsecond=0).isoformat().replace('T', ' ')),
         }
         for version in reversed(versions)
     ]
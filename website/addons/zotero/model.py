@@ -5,16 +5,22 @@ from pyzotero import zotero
 
 from website.addons.base import AddonOAuthNodeSettingsBase
 from website.addons.base import AddonOAuthUserSettingsBase
+from website.addons.base import http_client
 from website.addons.citations.utils import serialize_folder
 from website.addons.zotero import serializer
 from website.addons.zotero import settings
+from website.citations.models import CachedCitation, CitationLibrary
 from website.oauth.models import ExternalProvider
 
 # TODO: Don't cap at 200 responses. We can only fetch 100 citations at a time. With lots
 # of citations, requesting the citations may take longer than the UWSGI harakiri time.
-# For now, we load 200 citations max and show a message to the user.
+# For now, we load 200 citations max and show a message to the user. Library syncs
+# fetch about 200 changed citations per request and resume on the next one.
 MAX_CITATION_LOAD = 200
 
+# Zotero returns at most 50 items requested by key
+ITEM_KEYS_PER_REQUEST = 50
+
 class Zotero(ExternalProvider):
     name = "Zotero"
     short_name = "zotero"
@@ -42,7 +48,10 @@ class Zotero(ExternalProvider):
 
     @property
     def client(self):
-        """An API session with Zotero"""
+        """An API session with Zotero. Note: pyzotero sends requests through
+        module-level `requests` functions, so calls must take from the rate
+        budget with `http_client.wait_for_budget` themselves.
+        """
         if not self._client:
             self._client = zotero.Zotero(self.account.provider_id, 'user', self.account.oauth_key)
         return self._client
@@ -54,6 +63,7 @@ class Zotero(ExternalProvider):
         # Note: Pagination is the only way to ensure all of the collections
         #       are retrieved. 100 is the limit per request. This applies
         #       to Mendeley too, though that limit is 500.
+        http_client.wait_for_budget('zotero')
         collections = client.collections(limit=100)
 
         all_documents = serialize_folder(
@@ -70,6 +80,7 @@ class Zotero(ExternalProvider):
         return [all_documents] + serialized_folders
 
     def _folder_metadata(self, folder_id):
+        http_client.wait_for_budget('zotero')
         collection = self.client.collection(folder_id)
         return collection
 
@@ -79,45 +90,91 @@ class Zotero(ExternalProvider):
         :param str list_id: ID for a Zotero collection. Optional.
         :return CitationList: CitationList for the collection, or for all documents
         """
-        if list_id == 'ROOT':
-            list_id = None
-
-        if list_id:
-            citations = []
-            more = True
-            offset = 0
-            while more and len(citations) <= MAX_CITATION_LOAD:
-                page = self.client.collection_items(list_id, content='csljson', size=100, start=offset)
-                citations = citations + page
-                if len(page) == 0 or len(page) < 100:
-                    more = False
-                else:
-                    offset = offset + len(page)
-            return self._citations_for_zotero_collection(citations)
-        else:
-            return self._citations_for_zotero_user()
+        return self.get_page(list_id)[1]
 
-    def _citations_for_zotero_collection(self, collection):
-        """Get all the citations in a specified collection
+    def get_page(self, list_id=None, page=None, size=None):
+        """Get a page of a CitationList from the cached library
 
-        :param  csljson collection: list of csljson documents
-        :return list of citation objects representing said dicts of said documents.
+        :return: Tuple of (<total>, <citations>)
         """
-        return collection
+        library = CitationLibrary.for_provider(self)
+        document_ids = None
+        if list_id and list_id != 'ROOT':
+            document_ids = library.get_folder_ids(self, list_id)
+        return library.get_page(document_ids, page=page, size=size)
+
+    def fetch_folder_document_ids(self, folder_id):
+        citations, _ = self._fetch_citations(self.client.collection_items, folder_id)
+        # The listing is current; no need to sync the library for it
+        CachedCitation.upsert(self.account._id, citations)
+        return [citation['id'] for citation in citations]
+
+    def fetch_citation_changes(self, version):
+        """Fetch the items modified and deleted since library version
+        `version`, in the order they were modified, up to about
+        `MAX_CITATION_LOAD` items. When there are more, the returned version
+        is that of the last item fetched, so that the next sync resumes
+        after it.
+
+        :return: Tuple of (<citations>, <deleted IDs>, <library version>,
+            <whether all changes were fetched>)
+        """
+        http_client.wait_for_budget('zotero')
+        versions = self.client.items(since=version or 0, format='versions')
+        # Pyzotero keeps the last response, whose header has the version
+        new_version = self.client.request.headers.get('Last-Modified-Version')
+        keys = sorted(versions, key=versions.get)
+        complete = len(keys) <= MAX_CITATION_LOAD
+        if not complete:
+            # Items saved together share a version; fetch all of the last one
+            last = versions[keys[MAX_CITATION_LOAD - 1]]
+            keys = [key for key in keys if versions[key] <= last]
+            new_version = str(last)
+        citations = []
+        for start in range(0, len(keys), ITEM_KEYS_PER_REQUEST):
+            http_client.wait_for_budget('zotero')
+            citations += self._clean_citations(self.client.items(
+                itemKey=','.join(keys[start:start + ITEM_KEYS_PER_REQUEST]),
+                content='csljson',
+            ))
+        deleted_ids = self._fetch_deleted_ids(version) if version is not None else []
+        return citations, deleted_ids, new_version, complete
+
+    def _fetch_deleted_ids(self, version):
+        """Fetch the keys of the items deleted since library version
+        `version`. Pyzotero 1.1.1 has no call for the ``deleted`` endpoint.
+        """
+        client = self.client
+        url = '{0}/{1}/{2}/deleted'.format(client.endpoint, client.library_type, client.library_id)
+        response = http_client.get_session('zotero').get(
+            url, params={'since': version}, headers=client.default_headers()
+        )
+        response.raise_for_status()
+        return response.json().get('items', [])
+
+    def _clean_citations(self, citations):
+        for citation in citations:
+            # CSL IDs are "<library ID>/<item key>"; deletions list keys
+            citation['id'] = citation['id'].split('/')[-1]
+        return citations
 
-    def _citations_for_zotero_user(self):
-        """Get all the citations from the user """
+    def _fetch_citations(self, method, *args, **kwargs):
+        """Page through the CSL-JSON items returned by `method`, up to
+        `MAX_CITATION_LOAD` items.
+
+        :return: Tuple of (<citations>, <whether all items were fetched>)
+        """
         citations = []
-        more = True
         offset = 0
-        while more and len(citations) <= MAX_CITATION_LOAD:
-            page = self.client.items(content='csljson', limit=100, start=offset)
-            citations = citations + page
-            if len(page) == 0 or len(page) < 100:
-                more = False
-            else:
-                offset = offset + len(page)
-        return citations
+        while True:
+            http_client.wait_for_budget('zotero')
+            page = method(*args, content='csljson', limit=100, start=offset, **kwargs)
+            citations += self._clean_citations(page)
+            if len(page) < 100:
+                return citations, True
+            if len(citations) >= MAX_CITATION_LOAD:
+                return citations, False
+            offset += len(page)
 
 
 class ZoteroUserSettings(AddonOAuthUserSettingsBase):
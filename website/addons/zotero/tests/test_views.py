@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 
 from nose.tools import *  # flake8: noqa
+import json
+import datetime
+
 import httpretty
 import mock
 
@@ -20,7 +23,7 @@ from website.addons.zotero.tests.factories import (
 from website.addons.zotero import views
 from website.addons.zotero.serializer import ZoteroSerializer
 
-from utils import mock_responses
+from utils import mock_responses, items_response
 
 API_URL = 'https://api.zotero.org'
 
@@ -270,7 +273,7 @@ class ZoteroViewsTestCase(OsfTestCase):
                 API_URL,
                 'users/{}/items'.format(self.account.provider_id)
             ),
-            body=mock_responses['documents'],
+            body=items_response,
             content_type='application/json'
         )
 
@@ -285,6 +288,31 @@ class ZoteroViewsTestCase(OsfTestCase):
         assert_equal(children[1]['kind'], 'file')
         assert_true(children[1].get('csl') is not None)
 
+    @httpretty.activate
+    def test_zotero_citation_list_incremental_sync(self):
+        for path, body in (('collections', mock_responses['folders']), ('items', items_response)):
+            httpretty.register_uri(
+                httpretty.GET,
+                urlparse.urljoin(API_URL, 'users/{0}/{1}'.format(self.account.provider_id, path)),
+                body=body,
+                content_type='application/json'
+            )
+        deleted_id = json.loads(mock_responses['documents'])[0]['id']
+        httpretty.register_uri(
+            httpretty.GET,
+            urlparse.urljoin(API_URL, 'users/{}/deleted'.format(self.account.provider_id)),
+            body=json.dumps({'items': [deleted_id]}),
+            content_type='application/json'
+        )
+        url = self.project.api_url_for('zotero_citation_list', zotero_list_id='ROOT')
+        assert_equal(len(self.app.get(url, auth=self.user.auth).json['contents']), 7)
+
+        with mock.patch('website.citations.models.settings.CITATION_CACHE_TTL', datetime.timedelta(seconds=-1)):
+            res = self.app.get(url, auth=self.user.auth)
+        children = res.json['contents']
+        assert_equal(len(children), 6)
+        assert_not_in(deleted_id, [child['csl']['id'] for child in children if child.get('csl')])
+
     @httpretty.activate
     def test_zotero_citation_list_non_linked_or_child_non_authorizer(self):
 
@@ -310,7 +338,7 @@ class ZoteroViewsTestCase(OsfTestCase):
                 API_URL,
                 'users/{}/items'.format(self.account.provider_id)
             ),
-            body=mock_responses['documents'],
+            body=items_response,
             content_type='application/json'
         )
 
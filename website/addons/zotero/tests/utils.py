@@ -223,4 +223,19 @@ mock_responses = {
     ]
 }
 
+# Library versions of the documents, as listed with ``format=versions``
+mock_responses['versions'] = {
+    document['id']: 1 for document in mock_responses['documents']
+}
+
 mock_responses = {k: dumps(v) for k, v in mock_responses.iteritems()}
+
+
+def items_response(request, uri, headers):
+    """Answer requests for the versions of the library's items or for the
+    items themselves.
+    """
+    headers['Last-Modified-Version'] = '1'
+    if 'format=versions' in uri:
+        return 200, headers, mock_responses['versions']
+    return 200, headers, mock_responses['documents']
@@ -4,6 +4,7 @@ from flask import request
 
 from framework.auth.decorators import must_be_logged_in
 
+from website.addons.citations.utils import get_page_args
 from website.project.decorators import (
     must_be_contributor_or_public,
     must_have_permission,
@@ -100,4 +101,5 @@ def zotero_citation_list(auth, node_addon, zotero_list_id=None, **kwargs):
 
     provider = ZoteroCitationsProvider()
     show = request.args.get('view', 'all')
-    return provider.citation_list(node_addon, auth.user, zotero_list_id, show)
+    page, size = get_page_args()
+    return provider.citation_list(node_addon, auth.user, zotero_list_id, show, page=page, size=size)
@@ -22,9 +22,12 @@ from website.routes import make_url_map
 from website.addons.base import init_addon
 from website.project.model import ensure_schemas, Node
 from website.project.licenses import ensure_licenses
+from website.project import resolver as resolver_handlers
 # This import is necessary to set up the archiver signal listeners
 from website.archiver import listeners  # noqa
 from website.mails import listeners  # noqa
+from website.dashboard import listeners  # noqa
+from website.conferences import listeners  # noqa
 
 
 def build_js_config_files(settings):
@@ -55,6 +58,7 @@ def attach_handlers(app, settings):
     add_handlers(app, mongo_handlers.handlers)
     add_handlers(app, task_handlers.handlers)
     add_handlers(app, transaction_handlers.handlers)
+    add_handlers(app, resolver_handlers.handlers)
 
     # Attach handler for checking view-only link keys.
     # NOTE: This must be attached AFTER the TokuMX to avoid calling
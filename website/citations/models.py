@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import re
 import datetime
 
+import pymongo
+from pymongo.errors import DuplicateKeyError
 from modularodm import fields
 
 from framework.mongo import StoredObject
 
+from website import settings
+
 
 class CitationStyle(StoredObject):
     """Persistent representation of a CSL style.
@@ -26,6 +31,18 @@ class CitationStyle(StoredObject):
     short_title = fields.StringField(required=False)
     summary = fields.StringField(required=False)
 
+    #: Lower-cased words of the ID and titles, so that styles can be searched
+    #: by prefix on an index
+    search_keys = fields.StringField(list=True, index=True)
+
+    def save(self, *args, **kwargs):
+        self.search_keys = sorted(set(
+            word
+            for text in (self._id, self.title, self.short_title) if text
+            for word in split_words(text)
+        ))
+        return super(CitationStyle, self).save(*args, **kwargs)
+
     def to_json(self):
         return {
             'id': self._id,
@@ -33,3 +50,188 @@ class CitationStyle(StoredObject):
             'short_title': self.short_title,
             'summary': self.summary,
         }
+
+
+def split_words(text):
+    return [word for word in re.split(r'[\W_]+', text.lower(), flags=re.UNICODE) if word]
+
+
+class CitationLibrary(StoredObject):
+    """Sync state of the citations of an external account (Mendeley or
+    Zotero), which are cached as `CachedCitation` records.
+
+    Libraries are synced incrementally: providers implement
+    ``fetch_citation_changes(version)``, returning the citations changed
+    since the marker `version` of the previous sync, the IDs of those
+    deleted since then, the new marker and whether all changes were
+    fetched; or all citations if `version` is None. They also implement
+    ``fetch_folder_document_ids(folder_id)``, whose results are kept until
+    the library changes or they expire. Syncs are skipped for
+    `CITATION_CACHE_TTL` after the last complete one.
+    """
+
+    _id = fields.StringField(primary=True)  # ExternalAccount ID
+    #: Marker of the last sync, e.g. a Zotero library version
+    version = fields.StringField()
+    date_synced = fields.DateTimeField()
+    #: Document IDs by folder ID:
+    #: {'<folder id>': {'document_ids': [...], 'date_fetched': <datetime>}}
+    folders = fields.DictionaryField()
+
+    @classmethod
+    def for_provider(cls, provider, force=False):
+        """Return the library of `provider.account`, synced if stale."""
+        library = cls.load(provider.account._id)
+        if library is None:
+            library = cls(_id=provider.account._id)
+        if force or library.is_stale(library.date_synced):
+            library.sync(provider)
+        return library
+
+    def is_stale(self, date):
+        return date is None or datetime.datetime.utcnow() - date > settings.CITATION_CACHE_TTL
+
+    def sync(self, provider):
+        citations, deleted_ids, version, complete = provider.fetch_citation_changes(self.version)
+        if self.version is None:
+            # Full sync; drop citations deleted before it
+            CachedCitation.remove_library(self._id)
+        CachedCitation.upsert(self._id, citations)
+        CachedCitation.remove_library(self._id, deleted_ids)
+        if citations or deleted_ids:
+            self.folders = {}
+        self.version = version
+        # Resume incomplete syncs on the next request
+        self.date_synced = datetime.datetime.utcnow() if complete else None
+        self.save()
+
+    def get_folder_ids(self, provider, folder_id):
+        """Return the IDs of the documents in folder `folder_id`, in the
+        provider's order.
+        """
+        folder = self.folders.get(folder_id)
+        if folder is not None and not self.is_stale(folder['date_fetched']):
+            return folder['document_ids']
+        document_ids = provider.fetch_folder_document_ids(folder_id)
+        if CachedCitation.count(self._id, document_ids) < len(document_ids):
+            # Added since the last sync
+            self.sync(provider)
+        self.folders[folder_id] = {
+            'document_ids': document_ids,
+            'date_fetched': datetime.datetime.utcnow(),
+        }
+        self.save()
+        return document_ids
+
+    def get_page(self, document_ids=None, page=None, size=None):
+        """Return the number of cached citations, and those on page `page`
+        (from 0) of `size` citations, or all of them if `page` is None.
+
+        :param list document_ids: IDs of the citations to list, in order;
+            by default, all citations ordered by title
+        :return: Tuple of (<total>, <list of CSL-JSON dicts>)
+        """
+        if document_ids is None:
+            return CachedCitation.find_page(self._id, page, size)
+        total = len(document_ids)
+        if page is not None:
+            document_ids = document_ids[page * size:(page + 1) * size]
+        citations = CachedCitation.get_many(self._id, document_ids)
+        return total, [
+            citations[document_id]
+            for document_id in document_ids
+            if document_id in citations
+        ]
+
+
+class CachedCitation(StoredObject):
+    """CSL-JSON of a document in a `CitationLibrary`.
+
+    Records are read and written through the collection directly, in bulk.
+    """
+
+    __indices__ = [{
+        'unique': False,
+        'key_or_list': [
+            ('library', pymongo.ASCENDING),
+            ('sort_key', pymongo.ASCENDING),
+        ]
+    }]
+
+    _id = fields.StringField(primary=True)  # <library ID>:<document ID>
+    library = fields.StringField()
+    document_id = fields.StringField()
+    #: Lower-cased title
+    sort_key = fields.StringField()
+    csl = fields.DictionaryField()
+    date_modified = fields.DateTimeField()
+
+    @staticmethod
+    def make_id(library_id, document_id):
+        return '{0}:{1}'.format(library_id, document_id)
+
+    @classmethod
+    def upsert(cls, library_id, citations):
+        """Store `citations`, replacing their cached versions, with one
+        remove and one batch insert.
+        """
+        if not citations:
+            return
+        collection = cls._storage[0].store
+        now = datetime.datetime.utcnow()
+        records = dict(
+            (cls.make_id(library_id, citation['id']), {
+                '_id': cls.make_id(library_id, citation['id']),
+                'library': library_id,
+                'document_id': citation['id'],
+                'sort_key': (citation.get('title') or '').lower(),
+                'csl': citation,
+                'date_modified': now,
+            })
+            for citation in citations
+        )
+        collection.remove({'_id': {'$in': records.keys()}})
+        try:
+            collection.insert(records.values(), continue_on_error=True)
+        except DuplicateKeyError:
+            # Inserted meanwhile by a concurrent sync of the library
+            pass
+
+    @classmethod
+    def remove_library(cls, library_id, document_ids=None):
+        """Remove the citations of a library, or only `document_ids`."""
+        query = {'library': library_id}
+        if document_ids is not None:
+            if not document_ids:
+                return
+            query['document_id'] = {'$in': list(document_ids)}
+        cls._storage[0].store.remove(query)
+
+    @classmethod
+    def count(cls, library_id, document_ids):
+        return cls._storage[0].store.find({
+            'library': library_id,
+            'document_id': {'$in': list(document_ids)},
+        }).count()
+
+    @classmethod
+    def get_many(cls, library_id, document_ids):
+        """Return the CSL-JSON of `document_ids` that are cached, by ID."""
+        return {
+            record['document_id']: record['csl']
+            for record in cls._storage[0].store.find(
+                {'library': library_id, 'document_id': {'$in': list(document_ids)}},
+                {'document_id': True, 'csl': True},
+            )
+        }
+
+    @classmethod
+    def find_page(cls, library_id, page=None, size=None):
+        cursor = cls._storage[0].store.find(
+            {'library': library_id},
+            {'csl': True},
+        ).sort('sort_key', pymongo.ASCENDING)
+        total = cursor.count()
+        if page is not None:
+            cursor = cursor.skip(page * size).limit(size)
+        return total, [record['csl'] for record in cursor]
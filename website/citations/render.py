@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Format CSL-JSON citations on the server with citeproc-py.
+
+Parsing a .csl file is much slower than formatting a citation with it, so
+compiled styles are kept in an LRU cache of `CITATION_STYLE_CACHE_SIZE`
+entries per process. citeproc-py keeps rendering state on the style, so each
+style is used by one thread at a time.
+"""
+import os
+import threading
+
+from citeproc import (
+    Citation,
+    CitationItem,
+    CitationStylesBibliography,
+    CitationStylesStyle,
+    formatter,
+)
+from citeproc.source.json import CiteProcJSON
+
+from framework.cache import LRUCache
+
+from website import settings
+from website.citations.models import CitationStyle
+
+FORMATTERS = {
+    'html': formatter.html,
+    'text': formatter.plain,
+}
+
+_styles = LRUCache(settings.CITATION_STYLE_CACHE_SIZE)
+_lock = threading.Lock()
+
+
+def get_style(style_id):
+    """Return the compiled style `style_id` and its lock, parsing the style
+    on first use, or None if there is no such style.
+    """
+    compiled = _styles.get(style_id)
+    if compiled is None:
+        # Only load parsed styles, so that `style_id` can't name another file
+        if CitationStyle.load(style_id) is None:
+            return None
+        path = os.path.join(settings.CITATION_STYLES_PATH, '{0}.csl'.format(style_id))
+        compiled = (CitationStylesStyle(path, validate=False), threading.Lock())
+        with _lock:
+            # Another thread may have compiled it meanwhile
+            if style_id not in _styles:
+                _styles.set(style_id, compiled)
+            compiled = _styles.get(style_id, compiled)
+    return compiled
+
+
+def render_citations(items, style_id, output='html'):
+    """Format each of the CSL-JSON `items` as a bibliography entry.
+
+    :param list items: CSL-JSON items, e.g. `Node.csl`
+    :param str style_id: ID of a `CitationStyle`
+    :param str output: 'html' or 'text'
+    :return dict: Formatted entries by item ID, or None if the style doesn't
+        exist
+    """
+    compiled = get_style(style_id)
+    if compiled is None:
+        return None
+    style, lock = compiled
+    rendered = {}
+    with lock:
+        for item in items:
+            # Render items separately, so that entries don't depend on the
+            # other items in the batch (e.g. "2015a" disambiguation)
+            bibliography = CitationStylesBibliography(
+                style, CiteProcJSON([item]), FORMATTERS[output]
+            )
+            bibliography.register(Citation([CitationItem(item['id'])]))
+            rendered[item['id']] = u''.join(
+                unicode(entry) for entry in bibliography.bibliography()
+            )
+    return rendered
+
+
+def render_node_citations(nodes, style_id, output='html'):
+    """Format the citations of `nodes`, e.g. for exports.
+
+    :return dict: Formatted citations by node ID, or None if the style
+        doesn't exist
+    """
+    return render_citations([node.csl for node in nodes], style_id, output=output)
+
+
+def clear_cache():
+    _styles.clear()
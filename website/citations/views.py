@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
+import httplib as http
 
 from flask import request
 
 from modularodm import Q
-from website.models import CitationStyle
+from framework.auth.decorators import collect_auth
+from framework.exceptions import HTTPError
+from website import settings
+from website.models import CitationStyle, Node
+from website.citations import render
+from website.citations.models import split_words
 from website.project.decorators import must_be_contributor_or_public
 
 
@@ -12,14 +18,13 @@ def list_citation_styles():
 
     term = request.args.get('q')
     if term:
-        query = (
-            Q('_id', 'icontains', term) |
-            Q('title', 'icontains', term) |
-            Q('short_title', 'icontains', term)
-        )
+        # Every word of the term must start a word of the ID or titles
+        for word in split_words(term):
+            word_query = Q('search_keys', 'startswith', word)
+            query = word_query if query is None else query & word_query
 
     return {
-        'styles': [style.to_json() for style in CitationStyle.find(query)],
+        'styles': [style.to_json() for style in CitationStyle.find(query).sort('title')],
     }
 
 
@@ -27,3 +32,47 @@ def list_citation_styles():
 def node_citation(**kwargs):
     node = kwargs['node'] or kwargs['project']
     return {node.csl['id']: node.csl}
+
+
+def get_output_format():
+    output = request.args.get('format', 'html')
+    if output not in render.FORMATTERS:
+        raise HTTPError(http.BAD_REQUEST, data={
+            'message_long': 'Format must be one of: {0}'.format(', '.join(sorted(render.FORMATTERS)))
+        })
+    return output
+
+
+@must_be_contributor_or_public
+def node_citation_rendered(style, **kwargs):
+    """Format the citation of a node in the CSL style `style`."""
+    node = kwargs['node'] or kwargs['project']
+    citations = render.render_node_citations([node], style, output=get_output_format())
+    if citations is None:
+        raise HTTPError(http.NOT_FOUND)
+    return {'style': style, 'citation': citations[node._id]}
+
+
+@collect_auth
+def render_citations(auth, **kwargs):
+    """Format the citations of many nodes in one style. Expects JSON of the
+    form ``{"style": "apa", "nodes": ["abc12", ...]}``; nodes that don't
+    exist or that the user can't view are left out.
+    """
+    data = request.get_json() or {}
+    style = data.get('style')
+    node_ids = data.get('nodes')
+    if not style or not isinstance(node_ids, list):
+        raise HTTPError(http.BAD_REQUEST)
+    if len(node_ids) > settings.CITATION_RENDER_MAX_NODES:
+        raise HTTPError(http.BAD_REQUEST, data={
+            'message_long': 'At most {0} nodes can be cited at once'.format(settings.CITATION_RENDER_MAX_NODES)
+        })
+    nodes = [
+        node for node in Node.find(Q('_id', 'in', node_ids))
+        if not node.is_deleted and node.can_view(auth)
+    ]
+    citations = render.render_node_citations(nodes, style, output=get_output_format())
+    if citations is None:
+        raise HTTPError(http.NOT_FOUND)
+    return {'style': style, 'citations': citations}
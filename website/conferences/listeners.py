@@ -0,0 +1,11 @@
+"""Functions that listen for event signals and keep conference submission
+listings up to date. Node changes are handled in `Node.save`.
+"""
+from website.addons.base.signals import file_updated
+from website.conferences.model import ConferenceSubmission
+
+
+@file_updated.connect
+def refresh_submission_files(self, node=None, **kwargs):
+    if node is not None:
+        ConferenceSubmission.refresh_node(node)
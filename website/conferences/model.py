@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import bson
+import pymongo
 from modularodm import fields, Q
 from modularodm.exceptions import ModularOdmException
 
@@ -10,11 +11,16 @@ from website.conferences.exceptions import ConferenceError
 
 
 class Conference(StoredObject):
+
+    __normalized_fields__ = {'endpoint': 'endpoint_key'}
+
     #: Determines the email address for submission and the OSF url
     # Example: If endpoint is spsp2014, then submission email will be
     # spsp2014-talk@osf.io or spsp2014-poster@osf.io and the OSF url will
     # be osf.io/view/spsp2014
     endpoint = fields.StringField(primary=True, required=True, unique=True)
+    #: Lower-cased endpoint, for case-insensitive lookups
+    endpoint_key = fields.StringField(index=True)
     #: Full name, e.g. "SPSP 2014"
     name = fields.StringField(required=True)
     info_url = fields.StringField(required=False, default=None)
@@ -51,6 +57,161 @@ class Conference(StoredObject):
         except ModularOdmException:
             raise ConferenceError('Endpoint {0} not found'.format(endpoint))
 
+    def save(self, *args, **kwargs):
+        first_save = not self._is_loaded
+        if self.endpoint:
+            self.endpoint_key = self.endpoint.lower()
+        saved_fields = super(Conference, self).save(*args, **kwargs)
+        if first_save:
+            ConferenceSubmission.index_conference(self)
+        return saved_fields
+
+
+class ConferenceSubmission(StoredObject):
+    """Precomputed listing of a public node submitted to a conference, i.e.
+    tagged with its endpoint. Entries are kept up to date by `Node.save` and
+    when files are added to the node, so that the meetings pages don't have
+    to look up each node's tags, contributors and files.
+    """
+
+    __indices__ = [{
+        'unique': False,
+        'key_or_list': [
+            ('conference', pymongo.ASCENDING),
+            ('date_created', pymongo.DESCENDING),
+        ]
+    }, {
+        'unique': False,
+        'key_or_list': [
+            ('node', pymongo.ASCENDING),
+        ]
+    }]
+
+    #: Node fields that affect whether and how a node is listed
+    NODE_FIELDS = {
+        'tags',
+        'system_tags',
+        'is_public',
+        'is_deleted',
+        'title',
+        'contributors',
+        'visible_contributor_ids',
+    }
+
+    _id = fields.StringField(primary=True)  # <endpoint>:<node_id>
+    conference = fields.StringField()  # Conference endpoint
+    node = fields.StringField()
+    title = fields.StringField()
+    node_url = fields.StringField()
+    author = fields.StringField()
+    author_url = fields.StringField()
+    system_tags = fields.StringField(list=True)
+    tags = fields.StringField(list=True)
+    date_created = fields.DateTimeField()
+    download_url = fields.StringField()
+    #: Analytics page key of the first file's download counter
+    download_page = fields.StringField()
+
+    @classmethod
+    def _build(cls, conference, node):
+        from website.files.models import StoredFileNode
+
+        download_url = download_page = None
+        record = StoredFileNode.find(
+            Q('node', 'eq', node) &
+            Q('is_file', 'eq', True)
+        ).limit(1)
+        for each in record:
+            download_url = node.web_url_for(
+                'addon_view_or_download_file',
+                path=each.path.strip('/'),
+                provider='osfstorage',
+                action='download',
+                _absolute=True,
+            )
+            download_page = ':'.join(['download', node._id, each._id])
+        author = node.visible_contributors[0]
+        return cls(
+            _id='{0}:{1}'.format(conference, node._id),
+            conference=conference,
+            node=node._id,
+            title=node.title,
+            node_url=node.url,
+            author=author.family_name or author.fullname,
+            author_url=node.creator.url,
+            system_tags=list(node.system_tags),
+            tags=[tag._id for tag in node.tags],
+            date_created=node.date_created,
+            download_url=download_url,
+            download_page=download_page,
+        )
+
+    @classmethod
+    def update_node(cls, node):
+        """Add, refresh or remove the listings of `node`."""
+        collection = cls._storage[0].store
+        endpoints = []
+        tags = [tag._id for tag in node.tags]
+        if node.is_public and not node.is_deleted and tags:
+            query = Q('endpoint_key', 'in', [tag.lower() for tag in tags])
+            endpoints = [conference.endpoint for conference in Conference.find(query)]
+        collection.remove({'node': node._id, 'conference': {'$nin': endpoints}})
+        for endpoint in endpoints:
+            entry = cls._build(endpoint, node)
+            collection.update({'_id': entry._id}, entry.to_storage(), upsert=True)
+
+    @classmethod
+    def refresh_node(cls, node):
+        """Refresh the listings of `node`, if it has any, e.g. after its
+        files have changed.
+        """
+        if cls._storage[0].store.find_one({'node': node._id}, {'_id': True}):
+            cls.update_node(node)
+
+    @classmethod
+    def index_conference(cls, conference, save=True):
+        """List every public node tagged with the endpoint of `conference`.
+
+        :return int: Number of nodes listed
+        """
+        from website.project.model import Tag
+
+        collection = cls._storage[0].store
+        count = 0
+        for tag in Tag.find(Q('_id', 'iexact', conference.endpoint)):
+            for node in tag.node__tagged:
+                if not node or not node.is_public or node.is_deleted:
+                    continue
+                count += 1
+                if save:
+                    entry = cls._build(conference.endpoint, node)
+                    collection.update({'_id': entry._id}, entry.to_storage(), upsert=True)
+        return count
+
+    @classmethod
+    def count_by_conference(cls):
+        """Return the number of submissions of each conference."""
+        results = cls._storage[0].store.aggregate([
+            {'$group': {'_id': '$conference', 'count': {'$sum': 1}}},
+        ])
+        return dict((each['_id'], each['count']) for each in results['result'])
+
+    @classmethod
+    def find_page(cls, conference=None, sort=None, page=0, size=None):
+        """Return the total number of submissions, optionally of a single
+        conference, and the raw records of one page of them.
+
+        :param list sort: Pairs of (field, direction), as for pymongo
+        :param int size: Page size; if ``None``, all records are returned
+        """
+        query = {} if conference is None else {'conference': conference}
+        cursor = cls._storage[0].store.find(query)
+        total = cursor.count()
+        cursor = cursor.sort(sort or [('date_created', pymongo.DESCENDING)])
+        if size is not None:
+            cursor = cursor.skip(page * size).limit(size)
+        return total, list(cursor)
+
 
 class MailRecord(StoredObject):
     _id = fields.StringField(primary=True, default=lambda: str(bson.ObjectId()))
@@ -5,24 +5,26 @@ import httplib
 import logging
 from datetime import datetime
 
+import pymongo
+from flask import request
 from modularodm import Q
 from modularodm.exceptions import ModularOdmException
 
+from framework.analytics import get_total_counts
+
 from framework.exceptions import HTTPError
 from framework.flask import redirect
 from framework.transactions.context import TokuTransaction
 from framework.transactions.handlers import no_auto_transaction
 
 from website import settings
-from website.models import Node, Tag
 from website.util import web_url_for
 from website.mails import send_mail
-from website.files.models import StoredFileNode
 from website.mails import CONFERENCE_SUBMITTED, CONFERENCE_INACTIVE, CONFERENCE_FAILED
 
 from website.conferences import utils, signals
 from website.conferences.message import ConferenceMessage, ConferenceError
-from website.conferences.model import Conference
+from website.conferences.model import Conference, ConferenceSubmission
 
 
 logger = logging.getLogger(__name__)
@@ -134,64 +136,102 @@ def add_poster_by_email(conference, message):
         signals.osf4m_user_created.send(user, conference=conference, node=node)
 
 
-def _render_conference_node(node, idx, conf):
+#: Sort keys accepted by the submission listings, mapped to index fields
+SUBMISSION_SORT_FIELDS = {
+    'title': 'title',
+    'author': 'author',
+    'dateCreated': 'date_created',
+    'confName': 'conference',
+}
+
+
+def _get_page_args():
+    """Parse the `page` (from 0) and `size` query parameters of a submission
+    listing. Listings are only paginated if either is given, and pages hold
+    at most `CONFERENCE_SUBMISSIONS_PAGE_SIZE` submissions.
+
+    :return: Tuple of (<page>, <size>), or (None, None)
+    """
+    if 'page' not in request.args and 'size' not in request.args:
+        return None, None
     try:
-        record = next(
-            x for x in
-            StoredFileNode.find(
-                Q('node', 'eq', node) &
-                Q('is_file', 'eq', True)
-            ).limit(1)
-        ).wrapped()
-        download_count = record.get_download_count()
-
-        download_url = node.web_url_for(
-            'addon_view_or_download_file',
-            path=record.path.strip('/'),
-            provider='osfstorage',
-            action='download',
-            _absolute=True,
-        )
-    except StopIteration:
-        download_url = ''
-        download_count = 0
+        page = int(request.args.get('page', 0))
+        size = int(request.args.get('size', settings.CONFERENCE_SUBMISSIONS_PAGE_SIZE))
+    except ValueError:
+        raise HTTPError(httplib.BAD_REQUEST)
+    if page < 0 or not 1 <= size <= settings.CONFERENCE_SUBMISSIONS_PAGE_SIZE:
+        raise HTTPError(httplib.BAD_REQUEST)
+    return page, size
+
+
+def _get_submission_sort():
+    """Parse the `sort` query parameter, e.g. ``-dateCreated``, into a
+    pymongo sort specification.
+    """
+    sort = request.args.get('sort', '-dateCreated')
+    direction = pymongo.DESCENDING if sort.startswith('-') else pymongo.ASCENDING
+    try:
+        field = SUBMISSION_SORT_FIELDS[sort.lstrip('-')]
+    except KeyError:
+        raise HTTPError(httplib.BAD_REQUEST, data=dict(
+            message_long='Invalid value for "sort".'
+        ))
+    return [(field, direction), ('_id', pymongo.ASCENDING)]
 
-    author = node.visible_contributors[0]
-    tags = [tag._id for tag in node.tags]
 
-    return {
-        'id': idx,
-        'title': node.title,
-        'nodeUrl': node.url,
-        'author': author.family_name if author.family_name else author.fullname,
-        'authorUrl': node.creator.url,
-        'category': conf.field_names['submission1'] if conf.field_names['submission1'] in node.system_tags else conf.field_names['submission2'],
-        'download': download_count,
-        'downloadUrl': download_url,
-        'dateCreated': str(node.date_created),
-        'confName': conf.name,
-        'confUrl': web_url_for('conference_results', meeting=conf.endpoint),
-        'tags': ' '.join(tags)
-    }
+def _render_submissions(records, conferences, start=0):
+    """Serialize records of `ConferenceSubmission`, looking up the download
+    counts of all of them at once.
+
+    :param dict conferences: Conferences keyed by endpoint
+    """
+    counts = get_total_counts([
+        record['download_page'] for record in records
+        if record.get('download_page')
+    ])
+    ret = []
+    for idx, record in enumerate(records, start):
+        conf = conferences.get(record['conference'])
+        if conf is None:
+            continue
+        if conf.field_names['submission1'] in record['system_tags']:
+            category = conf.field_names['submission1']
+        else:
+            category = conf.field_names['submission2']
+        ret.append({
+            'id': idx,
+            'title': record['title'],
+            'nodeUrl': record['node_url'],
+            'author': record['author'],
+            'authorUrl': record['author_url'],
+            'category': category,
+            'download': counts.get(record.get('download_page'), 0),
+            'downloadUrl': record.get('download_url') or '',
+            'dateCreated': str(record['date_created']),
+            'confName': conf.name,
+            'confUrl': web_url_for('conference_results', meeting=conf.endpoint),
+            'tags': ' '.join(record['tags']),
+        })
+    return ret
 
 
 def conference_data(meeting):
+    """Return the submissions of a conference. If a `page` or `size` query
+    parameter is given, only that page is returned.
+    """
     try:
         conf = Conference.find_one(Q('endpoint', 'iexact', meeting))
     except ModularOdmException:
         raise HTTPError(httplib.NOT_FOUND)
 
-    nodes = Node.find(
-        Q('tags', 'iexact', meeting) &
-        Q('is_public', 'eq', True) &
-        Q('is_deleted', 'eq', False)
+    page, size = _get_page_args()
+    _, records = ConferenceSubmission.find_page(
+        conference=conf.endpoint,
+        sort=_get_submission_sort(),
+        page=page or 0,
+        size=size,
     )
-
-    ret = [
-        _render_conference_node(each, idx, conf)
-        for idx, each in enumerate(nodes)
-    ]
-    return ret
+    return _render_submissions(records, {conf.endpoint: conf}, start=(page or 0) * (size or 0))
 
 
 def redirect_to_meetings(**kwargs):
@@ -220,33 +260,37 @@ def conference_results(meeting):
 
 
 def conference_view(**kwargs):
-    meetings = []
-    submissions = []
-    for conf in Conference.find():
-        # For efficiency, we filter by tag first, then node
-        # instead of doing a single Node query
-        projects = set()
-        for tag in Tag.find(Q('_id', 'iexact', conf.endpoint)):
-            for node in tag.node__tagged:
-                if not node:
-                    continue
-                if not node.is_public or node.is_deleted:
-                    continue
-                projects.add(node)
-
-        for idx, node in enumerate(projects):
-            submissions.append(_render_conference_node(node, idx, conf))
-        num_submissions = len(projects)
-        if num_submissions < settings.CONFERENCE_MIN_COUNT:
-            continue
-        meetings.append({
+    counts = ConferenceSubmission.count_by_conference()
+    conferences = {
+        conf.endpoint: conf
+        for conf in Conference.find(Q('endpoint', 'in', list(counts)))
+    }
+
+    meetings = [
+        {
             'name': conf.name,
             'active': conf.active,
             'url': web_url_for('conference_results', meeting=conf.endpoint),
-            'count': num_submissions,
-        })
-
-    submissions.sort(key=lambda submission: submission['dateCreated'], reverse=True)
+            'count': counts[endpoint],
+        }
+        for endpoint, conf in conferences.iteritems()
+        if counts[endpoint] >= settings.CONFERENCE_MIN_COUNT
+    ]
     meetings.sort(key=lambda meeting: meeting['count'], reverse=True)
 
-    return {'meetings': meetings, 'submissions': submissions}
+    # The meetings page lists all submissions; pages are only served when
+    # requested, until the page has paging controls
+    page, size = _get_page_args()
+    total, records = ConferenceSubmission.find_page(
+        sort=_get_submission_sort(),
+        page=page or 0,
+        size=size,
+    )
+    submissions = _render_submissions(records, conferences, start=(page or 0) * (size or 0))
+
+    return {
+        'meetings': meetings,
+        'submissions': submissions,
+        'submissions_total': total,
+        'page': page,
+    }
@@ -0,0 +1,21 @@
+"""Functions that listen for event signals and invalidate cached dashboard
+data. Node changes are handled in `Node.save`.
+"""
+from website.project import signals as project_signals
+from website.dashboard.model import DashboardCacheEntry
+
+
+@project_signals.contributor_added.connect
+def invalidate_added_contributor(node, contributor, **kwargs):
+    DashboardCacheEntry.invalidate_users([contributor._id])
+
+
+@project_signals.contributor_removed.connect
+def invalidate_removed_contributor(node, user, **kwargs):
+    DashboardCacheEntry.invalidate_users([user._id])
+
+
+@project_signals.pointer_added.connect
+@project_signals.pointer_removed.connect
+def invalidate_pointer_parent(node, **kwargs):
+    DashboardCacheEntry.invalidate_nodes([node._id])
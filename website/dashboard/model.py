@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Cache of serialized project organizer data, one entry per user and folder.
+
+Each entry records the IDs of the nodes its data was built from, so that a
+change to a node only drops the folders that display it. Entries for the
+dashboard and the smart folders also depend on which nodes the user
+contributes to, and are dropped when that may have changed.
+
+Entries are read and written through the collection directly rather than
+loaded as objects, so that removals by query never leave stale objects in
+the object cache.
+"""
+import datetime
+
+import pymongo
+from modularodm import fields
+
+from framework.mongo import StoredObject
+
+from website import settings
+
+# Node fields that can move a node into or out of a user's smart folders
+SMART_FOLDER_FIELDS = {
+    'category',
+    'contributors',
+    'is_deleted',
+    'is_folder',
+    'is_registration',
+    'nodes',
+    'permissions',
+    'retraction',
+    'embargo',
+}
+
+
+class DashboardCacheEntry(StoredObject):
+
+    __indices__ = [{
+        'unique': False,
+        'key_or_list': [
+            ('nodes', pymongo.ASCENDING),
+        ]
+    }, {
+        'unique': False,
+        'key_or_list': [
+            ('user_id', pymongo.ASCENDING),
+            ('smart', pymongo.ASCENDING),
+        ]
+    }]
+
+    _id = fields.StringField(primary=True)  # <user_id>:<folder>
+    user_id = fields.StringField()
+    folder = fields.StringField()
+    #: Whether the data depends on the set of nodes the user contributes to
+    smart = fields.BooleanField(default=False)
+    #: IDs of the nodes the data was built from
+    nodes = fields.StringField(list=True)
+    data = fields.DictionaryField()
+    date_created = fields.DateTimeField(auto_now_add=datetime.datetime.utcnow)
+
+    @staticmethod
+    def make_id(user, folder):
+        return '{0}:{1}'.format(user._id, folder)
+
+    @classmethod
+    def get_data(cls, user, folder):
+        """Return the cached data of `folder` for `user`, or ``None`` if it is
+        not cached or has expired.
+        """
+        if not settings.DASHBOARD_CACHE_ENABLED:
+            return None
+        record = cls._storage[0].store.find_one(
+            {'_id': cls.make_id(user, folder)},
+            {'data': True, 'date_created': True},
+        )
+        if record is None:
+            return None
+        if datetime.datetime.utcnow() - record['date_created'] > settings.DASHBOARD_CACHE_TTL:
+            return None
+        return record['data']['items']
+
+    @classmethod
+    def set_data(cls, user, folder, items, node_ids, smart=False):
+        if not settings.DASHBOARD_CACHE_ENABLED:
+            return
+        entry = cls(
+            _id=cls.make_id(user, folder),
+            user_id=user._id,
+            folder=folder,
+            smart=smart,
+            nodes=list(node_ids),
+            data={'items': items},
+        )
+        cls._storage[0].store.update({'_id': entry._id}, entry.to_storage(), upsert=True)
+
+    @classmethod
+    def invalidate_nodes(cls, node_ids):
+        """Drop every entry built from any of `node_ids`."""
+        if settings.DASHBOARD_CACHE_ENABLED:
+            cls._storage[0].store.remove({'nodes': {'$in': list(node_ids)}})
+
+    @classmethod
+    def invalidate_users(cls, user_ids, smart_only=False):
+        """Drop the entries of the given users; with `smart_only`, only those
+        that depend on the nodes they contribute to.
+        """
+        if not settings.DASHBOARD_CACHE_ENABLED:
+            return
+        query = {'user_id': {'$in': list(user_ids)}}
+        if smart_only:
+            query['smart'] = True
+        cls._storage[0].store.remove(query)
+
+    @classmethod
+    def invalidate_for_node(cls, node, saved_fields):
+        """Drop the entries affected by saving `node`."""
+        if not saved_fields:
+            return
+        cls.invalidate_nodes([node._id])
+        if SMART_FOLDER_FIELDS.intersection(saved_fields):
+            cls.invalidate_users(node.contributors._to_primary_keys(), smart_only=True)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Snapshot of the most viewed public projects and registrations of the last
+week, for the activity page.
+
+Finding them means asking Piwik for the week's views by project and loading
+the projects to drop those that aren't public. `refresh` does that
+periodically, from the ``discovery.refresh_activity_snapshot`` task, and
+stores the summaries of the nodes and their hit counts in a single document,
+so that the page needs one read.
+"""
+import datetime
+
+from modularodm import Q
+
+from framework.mongo import database
+from framework.analytics.piwik import PiwikClient
+
+from website import settings
+from website.project.model import Node
+
+COLLECTION = 'activitysnapshot'
+SNAPSHOT_ID = 'popular'
+
+# Nodes shown in each list
+POPULAR_COUNT = 10
+
+
+def summarize(node):
+    """Return what the activity page shows of `node`."""
+    return {
+        'id': node._id,
+        'title': node.title,
+        'url': node.url,
+        'api_url': node.api_url,
+        'is_registration': node.is_registration,
+        'date_created': node.date_created,
+        'registered_date': node.registered_date,
+    }
+
+
+def get_popular_hits():
+    """Return the views and visits of the most viewed projects of the last
+    week according to Piwik, most viewed first.
+    """
+    # get the date for exactly one week ago
+    target_date = datetime.date.today() - datetime.timedelta(weeks=1)
+    client = PiwikClient(
+        url=settings.PIWIK_HOST,
+        auth_token=settings.PIWIK_ADMIN_TOKEN,
+        site_id=settings.PIWIK_SITE_ID,
+        period='week',
+        date=target_date.strftime('%Y-%m-%d'),
+    )
+    project_ids = [
+        x for x in client.custom_variables if x.label == 'Project ID'
+    ][0].values
+    return [
+        {'id': x.value, 'hits': x.actions, 'visits': x.visits}
+        for x in project_ids
+    ]
+
+
+def compute():
+    """Return a snapshot of the most viewed public projects and
+    registrations, with their hit counts.
+    """
+    hits = get_popular_hits()
+    nodes = dict(
+        (node._id, node)
+        for node in Node.find(Q('_id', 'in', [x['id'] for x in hits]))
+    )
+    projects, registrations = [], []
+    for counts in hits:
+        node = nodes.get(counts['id'])
+        if node is None or not node.is_public or node.is_deleted:
+            continue
+        if node.is_registration:
+            if node.is_retracted:
+                continue
+            popular = registrations
+        else:
+            popular = projects
+        if len(popular) < POPULAR_COUNT:
+            summary = summarize(node)
+            summary.update(hits=counts['hits'], visits=counts['visits'])
+            popular.append(summary)
+        if len(projects) >= POPULAR_COUNT and len(registrations) >= POPULAR_COUNT:
+            break
+    return {
+        'popular_public_projects': projects,
+        'popular_public_registrations': registrations,
+        'date_computed': datetime.datetime.utcnow(),
+    }
+
+
+def refresh():
+    snapshot = compute()
+    database[COLLECTION].update({'_id': SNAPSHOT_ID}, snapshot, upsert=True)
+    return snapshot
+
+
+def get_snapshot():
+    """Return the stored snapshot, less nodes that have been made private or
+    deleted since it was taken, or None if there is none.
+    """
+    snapshot = database[COLLECTION].find_one({'_id': SNAPSHOT_ID})
+    if snapshot is None:
+        return None
+    keys = ('popular_public_projects', 'popular_public_registrations')
+    node_ids = [summary['id'] for key in keys for summary in snapshot[key]]
+    visible = set(
+        record['_id'] for record in Node._storage[0].store.find(
+            {'_id': {'$in': node_ids}, 'is_public': True, 'is_deleted': False},
+            {'_id': True},
+        )
+    )
+    for key in keys:
+        snapshot[key] = [summary for summary in snapshot[key] if summary['id'] in visible]
+    return snapshot
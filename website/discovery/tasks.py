@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from framework.tasks import app
+
+from website import settings
+from website.discovery import snapshot
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(name='discovery.refresh_activity_snapshot')
+def refresh_activity_snapshot():
+    if not settings.PIWIK_HOST:
+        return
+    popular = snapshot.refresh()
+    logger.info('Refreshed activity snapshot with {0} project(s) and {1} registration(s)'.format(
+        len(popular['popular_public_projects']), len(popular['popular_public_registrations'])
+    ))
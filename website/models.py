@@ -15,15 +15,16 @@ from website.project.model import (
 )
 from website.oauth.models import ApiOAuth2Application, ExternalAccount, ApiOAuth2PersonalToken
 from website.identifiers.model import Identifier
-from website.citations.models import CitationStyle
+from website.citations.models import CitationStyle, CitationLibrary, CachedCitation
 
 from website.mails import QueuedMail
 from website.files.models.base import FileVersion
 from website.files.models.base import StoredFileNode
 from website.files.models.base import TrashedFileNode
-from website.conferences.model import Conference, MailRecord
+from website.conferences.model import Conference, ConferenceSubmission, MailRecord
 from website.notifications.model import NotificationDigest
 from website.notifications.model import NotificationSubscription
+from website.dashboard.model import DashboardCacheEntry
 from website.archiver.model import ArchiveJob, ArchiveTarget
 from website.project.licenses import NodeLicense, NodeLicenseRecord
 
@@ -38,7 +39,9 @@ MODELS = (
     Embargo, Retraction, RegistrationApproval,
     ArchiveJob, ArchiveTarget, BlacklistGuid, Sanction,
     QueuedMail,
-    NodeLicense, NodeLicenseRecord
+    NodeLicense, NodeLicenseRecord,
+    DashboardCacheEntry, ConferenceSubmission,
+    CitationLibrary, CachedCitation,
 )
 
 GUID_MODELS = (User, Node, Comment, MetaData)
@@ -1,4 +1,5 @@
 from babel import dates, core, Locale
+from modularodm import Q
 
 from website import mails
 from website import models as website_models
@@ -59,56 +60,123 @@ def store_emails(recipient_ids, notification_type, event, user, node, timestamp,
     if notification_type == 'none':
         return
 
+    recipient_ids = [user_id for user_id in recipient_ids if user_id != user._id]
+    if not recipient_ids:
+        return
+
     template = event + '.html.mako'
     context['user'] = user
     node_lineage_ids = get_node_lineage(node) if node else []
 
-    for user_id in recipient_ids:
-        if user_id == user._id:
-            continue
-        recipient = website_models.User.load(user_id)
-        context['localized_timestamp'] = localize_timestamp(timestamp, recipient)
-        message = mails.render_message(template, **context)
-
-        digest = NotificationDigest(
+    # The message only varies with the recipient's timezone and locale, so
+    # render it once per distinct pair rather than once per recipient
+    messages = {}
+    digests = []
+    for recipient in website_models.User.find(Q('_id', 'in', recipient_ids)):
+        key = (recipient.timezone, recipient.locale)
+        if key not in messages:
+            context['localized_timestamp'] = localize_timestamp(timestamp, recipient)
+            messages[key] = mails.render_message(template, **context)
+        digests.append(dict(
             timestamp=timestamp,
             send_type=notification_type,
             event=event,
-            user_id=user_id,
-            message=message,
+            user_id=recipient._id,
+            message=messages[key],
             node_lineage=node_lineage_ids
-        )
-        digest.save()
+        ))
+
+    NotificationDigest.bulk_create(digests)
 
 
-def compile_subscriptions(node, event_type, event=None, level=0):
-    """Recurse through node and parents for subscriptions.
+def compile_subscriptions(node, event_type, event=None):
+    """Compile the effective subscriptions of a node and its parents.
 
     :param node: current node
     :param event_type: Generally node_subscriptions_available
     :param event: Particular event such a file_updated that has specific file subs
-    :param level: How deep the recursion is
     :return: a dict of notification types with lists of users.
     """
-    subscriptions = check_node(node, event_type)
-    if event:
-        subscriptions = check_node(node, event)  # Gets particular event subscriptions
-        parent_subscriptions = compile_subscriptions(node, event_type, level=level + 1)  # get node and parent subs
-    elif node.parent_id:
-        parent_subscriptions = \
-            compile_subscriptions(website_models.Node.load(node.parent_id), event_type, level=level + 1)
-    else:
-        parent_subscriptions = check_node(None, event_type)
-    for notification_type in parent_subscriptions:
-        p_sub_n = parent_subscriptions[notification_type]
-        p_sub_n.extend(subscriptions[notification_type])
-        for nt in subscriptions:
-            if notification_type != nt:
-                p_sub_n = list(set(p_sub_n).difference(set(subscriptions[nt])))
-        if level == 0:
-            p_sub_n, removed = utils.separate_users(node, p_sub_n)
-        parent_subscriptions[notification_type] = p_sub_n
-    return parent_subscriptions
+    return SubscriptionResolver(node).resolve(event_type, event)
+
+
+class SubscriptionResolver(object):
+    """Resolve notification recipients for a node from the subscriptions on
+    the node and its ancestors.
+
+    The lineage is loaded once and permissions are computed from the lineage's
+    ``permissions`` dicts in memory, so resolving several events for the same
+    node does not reload parents or recurse through ``is_admin_parent``. The
+    more specific subscription wins: a user's setting on a component overrides
+    their setting on the parent project, and a setting for a particular event
+    (e.g. a single file) overrides the node-wide setting.
+
+    :param node: Node the event happened on
+    """
+    def __init__(self, node):
+        self.node = node
+        self.lineage = get_node_lineage_nodes(node)
+        self._readers = self._compute_readers()
+
+    def _compute_readers(self):
+        """Map each node id in the lineage to the set of user ids that can read
+        it, following `Node.has_permission`: explicit read permission, or
+        admin on the node or any non-deleted ancestor.
+        """
+        readers = {}
+        inherited = set()
+        for each in self.lineage:
+            admins = inherited | {
+                user_id for user_id, perms in each.permissions.iteritems()
+                if 'admin' in perms
+            }
+            readers[each._id] = admins | {
+                user_id for user_id, perms in each.permissions.iteritems()
+                if 'read' in perms
+            }
+            # `Node.parent_node` skips deleted parents, so admins of a deleted
+            # node and above it do not gain read access below it
+            inherited = set() if each.is_deleted else admins
+        return readers
+
+    def _levels(self, event_type, event=None):
+        """Return `(node_id, subscription_key)` pairs from least to most
+        specific.
+        """
+        levels = [
+            (each._id, utils.to_subscription_key(each._id, event_type))
+            for each in self.lineage
+        ]
+        if event:
+            levels.append((self.node._id, utils.to_subscription_key(self.node._id, event)))
+        return levels
+
+    def resolve(self, event_type, event=None):
+        """Return a dict of notification types with lists of user ids.
+        """
+        levels = self._levels(event_type, event)
+        subscriptions = {
+            subscription._id: subscription
+            for subscription in NotificationSubscription.find(
+                Q('_id', 'in', list({key for _, key in levels}))
+            )
+        }
+        effective = {}
+        for node_id, key in levels:
+            subscription = subscriptions.get(key)
+            if subscription is None:
+                continue
+            readers = self._readers[node_id]
+            for notification_type in constants.NOTIFICATION_TYPES:
+                user_ids = getattr(subscription, notification_type)._to_primary_keys()
+                for user_id in readers.intersection(user_ids):
+                    effective[user_id] = notification_type
+        readers = self._readers[self.node._id]
+        ret = {key: [] for key in constants.NOTIFICATION_TYPES}
+        for user_id, notification_type in effective.iteritems():
+            if user_id in readers:
+                ret[notification_type].append(user_id)
+        return ret
 
 
 def check_node(node, event):
@@ -124,17 +192,18 @@ def check_node(node, event):
     return node_subscriptions
 
 
+def get_node_lineage_nodes(node):
+    """ Get a list of nodes in order from the top most project to the node
+        e.g. [parent, node]
+    """
+    return node.ancestor_nodes + [node]
+
+
 def get_node_lineage(node):
     """ Get a list of node ids in order from the node to top most project
         e.g. [parent._id, node._id]
     """
-    lineage = [node._id]
-
-    while node.parent_id:
-        node = website_models.Node.load(node.parent_id)
-        lineage = [node._id] + lineage
-
-    return lineage
+    return [each._id for each in get_node_lineage_nodes(node)]
 
 
 def get_settings_url(uid, user):
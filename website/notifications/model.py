@@ -1,3 +1,4 @@
+import pymongo
 from modularodm import fields
 
 from framework.mongo import StoredObject, ObjectId
@@ -60,6 +61,16 @@ class NotificationSubscription(StoredObject):
 
 
 class NotificationDigest(StoredObject):
+
+    __indices__ = [{
+        'unique': False,
+        'key_or_list': [
+            ('send_type', pymongo.ASCENDING),
+            ('user_id', pymongo.ASCENDING),
+            ('_id', pymongo.ASCENDING),
+        ]
+    }]
+
     _id = fields.StringField(primary=True, default=lambda: str(ObjectId()))
     user_id = fields.StringField(index=True)
     timestamp = fields.DateTimeField()
@@ -67,3 +78,21 @@ class NotificationDigest(StoredObject):
     event = fields.StringField()
     message = fields.StringField()
     node_lineage = fields.StringField(list=True)
+
+    @classmethod
+    def bulk_create(cls, digests):
+        """Validate and insert many digests with a single write.
+
+        :param list digests: Dicts of field values, one per digest
+        :return: List of inserted digest ids
+        """
+        if not digests:
+            return []
+        records = []
+        for data in digests:
+            digest = cls(**data)
+            for field_name, field_object in cls._fields.items():
+                field_object.do_validate(getattr(digest, field_name), digest)
+            digest.validate_record()
+            records.append(digest.to_storage())
+        return cls._storage[0].store.insert(records)
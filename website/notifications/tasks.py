@@ -1,19 +1,21 @@
 """
 Tasks for making even transactional emails consolidated.
 """
-from bson.code import Code
+import itertools
+import operator
+
 from modularodm import Q
 
 from framework.tasks import app as celery_app
 from framework.mongo import database as db
 from framework.auth.core import User
 from framework.sentry import log_exception
-
-from framework.transactions.context import TokuTransaction
+from framework.utils import iter_chunks
 
 from website.notifications.utils import NotificationsDict
 from website.notifications.model import NotificationDigest
 from website import mails
+from website import settings
 
 
 @celery_app.task(name='notify.send_users_email', max_retries=0)
@@ -23,26 +25,34 @@ def send_users_email(send_type):
     :param send_type
     :return:
     """
-    grouped_emails = get_users_emails(send_type)
-    if not grouped_emails:
-        return
-    for group in grouped_emails:
-        user = User.load(group['user_id'])
-        if not user:
-            log_exception()
-            continue
-        info = group['info']
-        notification_ids = [message['_id'] for message in info]
-        sorted_messages = group_by_node(info)
-        if sorted_messages:
-            mails.send_mail(
-                to_addr=user.username,
-                mimetype='html',
-                mail=mails.DIGEST,
-                name=user.fullname,
-                message=sorted_messages,
-                callback=remove_notifications(email_notification_ids=notification_ids)
-            )
+    chunks = iter_chunks(iter_users_emails(send_type), settings.NOTIFICATION_DIGEST_CHUNK_SIZE)
+    for chunk in chunks:
+        users = {
+            user._id: user
+            for user in User.find(Q('_id', 'in', [group['user_id'] for group in chunk]))
+        }
+        sent_ids = []
+        try:
+            for group in chunk:
+                user = users.get(group['user_id'])
+                if not user:
+                    log_exception()
+                    continue
+                info = group['info']
+                sorted_messages = group_by_node(info)
+                if sorted_messages:
+                    mails.send_mail(
+                        to_addr=user.username,
+                        mimetype='html',
+                        mail=mails.DIGEST,
+                        name=user.fullname,
+                        message=sorted_messages,
+                    )
+                    sent_ids.extend(message['_id'] for message in info)
+        finally:
+            # Don't send the digests of users already emailed again if sending
+            # fails partway through the chunk
+            remove_notifications(email_notification_ids=sent_ids)
 
 
 def get_users_emails(send_type):
@@ -65,26 +75,33 @@ def get_users_emails(send_type):
                 'user_id': ...
               }]
     """
-    with TokuTransaction():
-        emails = db['notificationdigest'].group(
-            key={'user_id': 1},
-            condition={
-                'send_type': send_type
-            },
-            initial={'info': []},
-            reduce=Code(
-                """
-                function(curr, result) {
-                    result.info.push({
-                        'message': curr.message,
-                        'node_lineage': curr.node_lineage,
-                        '_id': curr._id
-                    });
-                };
-                """
-            )
-        )
-    return emails
+    return list(iter_users_emails(send_type))
+
+
+def iter_users_emails(send_type):
+    """Stream pending emails grouped by user, in the format returned by
+    `get_users_emails`. Digests are read through a cursor sorted on the
+    `(send_type, user_id, _id)` index, so only one user's messages are held in
+    memory at a time.
+
+    :param send_type: from NOTIFICATION_TYPES
+    """
+    cursor = db['notificationdigest'].find(
+        {'send_type': send_type},
+        {'user_id': True, 'message': True, 'node_lineage': True},
+    ).sort([('user_id', 1), ('_id', 1)])
+    for user_id, digests in itertools.groupby(cursor, key=operator.itemgetter('user_id')):
+        yield {
+            'user_id': user_id,
+            'info': [
+                {
+                    'message': digest['message'],
+                    'node_lineage': digest['node_lineage'],
+                    '_id': digest['_id'],
+                }
+                for digest in digests
+            ],
+        }
 
 
 def group_by_node(notifications):
@@ -105,5 +122,5 @@ def remove_notifications(email_notification_ids=None):
     :param email_notification_ids:
     :return:
     """
-    for email_id in email_notification_ids:
-        NotificationDigest.remove(Q('_id', 'eq', email_id))
+    if email_notification_ids:
+        NotificationDigest.remove(Q('_id', 'in', email_notification_ids))
@@ -3,7 +3,6 @@ import uuid
 
 from .model import Node, PrivateLink
 from framework.mongo.utils import from_mongo
-from modularodm import Q
 from modularodm.exceptions import ValidationValueError
 from website.exceptions import NodeStateError
 from website.util.sanitize import strip_html
@@ -68,12 +67,7 @@ def new_dashboard(user):
     :return Node: Created node
 
     """
-    existing_dashboards = user.node__contributed.find(
-        Q('category', 'eq', 'project') &
-        Q('is_dashboard', 'eq', True)
-    )
-
-    if existing_dashboards.count() > 0:
+    if user.dashboard_id:
         raise NodeStateError("Users may only have one dashboard")
 
     node = Node(
@@ -61,6 +61,9 @@ from website.project.licenses import (
     NodeLicenseRecord,
 )
 from website.project import signals as project_signals
+from website.project.resolver import get_resolver, clear_resolver, filter_viewable
+from website.dashboard.model import DashboardCacheEntry
+from website.conferences.model import ConferenceSubmission
 
 logger = logging.getLogger(__name__)
 
@@ -439,7 +442,11 @@ class NodeLog(StoredObject):
 
 class Tag(StoredObject):
 
+    __normalized_fields__ = {'_id': 'key'}
+
     _id = fields.StringField(primary=True, validate=MaxLengthValidator(128))
+    #: Lower-cased tag, for case-insensitive lookups
+    key = fields.StringField(index=True)
 
     def __repr__(self):
         return '<Tag() with id {self._id!r}>'.format(self=self)
@@ -448,6 +455,11 @@ class Tag(StoredObject):
     def url(self):
         return '/search/?tags={}'.format(self._id)
 
+    def save(self, *args, **kwargs):
+        if self._id:
+            self.key = self._id.lower()
+        return super(Tag, self).save(*args, **kwargs)
+
 
 class Pointer(StoredObject):
     """A link to a Node. The Pointer delegates all but a few methods to its
@@ -467,6 +479,7 @@ class Pointer(StoredObject):
             clone = self.clone()
             clone.node = self.node
             clone.save()
+            self.node.increment_counters(pointed_count=1)
             return clone
 
     def fork_node(self, *args, **kwargs):
@@ -508,6 +521,76 @@ def get_pointer_parent(pointer):
     return parent_refs[0]
 
 
+def _load_uncached(schema, keys):
+    """Load the records of `schema` among `keys` that aren't in the object
+    cache with one query, leaving cached records untouched.
+    """
+    missing = [key for key in keys if not schema._is_cached(key)]
+    if missing:
+        list(schema.find(Q('_id', 'in', missing)))
+
+
+class NodeSubtree(object):
+    """A node, all of its primary descendants and the pointers they contain,
+    loaded up front: descendants with queries on the `ancestors` index and
+    pointers with one more. Records already in the object cache are used as
+    they are, so that unsaved changes to them aren't overwritten. Walking the
+    tree afterwards does not hit the database, except for children not yet
+    listed in `ancestors`, which are loaded one at a time as before.
+
+    :param Node root: Node at the top of the subtree
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.nodes = {root._id: root}
+        if root.nodes:
+            node_ids = [
+                record['_id'] for record in Node._storage[0].store.find(
+                    {'ancestors': root._id}, {'_id': True}
+                )
+            ]
+            _load_uncached(Node, node_ids)
+            for node_id in node_ids:
+                self.nodes[node_id] = Node.load(node_id)
+        pointer_ids = [
+            key
+            for node in self.nodes.values()
+            for key in node.nodes._to_primary_keys()
+            if key not in self.nodes
+        ]
+        _load_uncached(Pointer, pointer_ids)
+        pointers = (Pointer.load(pointer_id) for pointer_id in pointer_ids)
+        self.pointers = {
+            pointer._id: pointer for pointer in pointers if pointer is not None
+        }
+
+    def children(self, node):
+        """Return the entries of `node.nodes`, in order."""
+        children = []
+        for index, key in enumerate(node.nodes._to_primary_keys()):
+            child = self.nodes.get(key) or self.pointers.get(key)
+            if child is None:
+                child = node.nodes[index]
+            children.append(child)
+        return children
+
+    def iter_descendants(self, include=lambda n: True):
+        """Yield descendants depth-first, in the same order as walking
+        `nodes` recursively. Pointers are yielded but not followed.
+
+        :param include: Predicate deciding which nodes are yielded; the
+            children of excluded nodes are still visited
+        """
+        stack = list(reversed(self.children(self.root)))
+        while stack:
+            node = stack.pop()
+            if include(node):
+                yield node
+            if node.primary:
+                stack.extend(reversed(self.children(node)))
+
+
 def validate_category(value):
     """Validator for Node#category. Makes sure that the value is one of the
     categories defined in CATEGORY_MAP.
@@ -555,6 +638,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     #: Whether this is a pointer or not
     primary = True
 
+    __normalized_fields__ = {'tags': 'tag_keys'}
+
     __indices__ = [{
         'unique': False,
         'key_or_list': [
@@ -562,6 +647,18 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             ('is_public', pymongo.ASCENDING),
             ('is_deleted', pymongo.ASCENDING),
         ]
+    }, {
+        'unique': False,
+        'key_or_list': [
+            ('tag_keys', pymongo.ASCENDING),
+            ('is_public', pymongo.ASCENDING),
+            ('is_deleted', pymongo.ASCENDING),
+        ]
+    }, {
+        'unique': False,
+        'key_or_list': [
+            ('ancestors', pymongo.ASCENDING),
+        ]
     }]
 
     # Node fields that trigger an update to Solr on save
@@ -582,6 +679,12 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         'node_license',
     }
 
+    # Node fields that trigger a Piwik access sync on save
+    PIWIK_UPDATE_FIELDS = {
+        'contributors',
+        'is_public',
+    }
+
     # Maps category identifier => Human-readable representation for use in
     # titles, menus, etc.
     # Use an OrderedDict so that menu items show in the correct order
@@ -625,6 +728,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     # Project Organization
     is_dashboard = fields.BooleanField(default=False, index=True)
     is_folder = fields.BooleanField(default=False, index=True)
+    # IDs of all ancestors, root first, including deleted ones; kept up to
+    # date by `update_child_ancestors`
+    ancestors = fields.StringField(list=True)
 
     # Expanded: Dictionary field mapping user IDs to expand state of this node:
     # {
@@ -672,6 +778,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
     logs = fields.ForeignField('nodelog', list=True, backref='logged')
     tags = fields.ForeignField('tag', list=True, backref='tagged')
+    #: Lower-cased tags, for case-insensitive lookups; set on save
+    tag_keys = fields.StringField(list=True)
 
     # Tags for internal use
     system_tags = fields.StringField(list=True)
@@ -683,6 +791,23 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     # The node (if any) used as a template for this node's creation
     template_node = fields.ForeignField('node', backref='template_node', index=True)
 
+    # IDs of the nodes that the pointers in `nodes` point to, maintained by
+    # `add_pointer` and `rm_pointer`
+    pointer_node_ids = fields.StringField(list=True, index=True)
+
+    # Counters of related nodes, maintained with `increment_counters`; see
+    # `scripts/migration/migrate_node_counters.py` to recompute them
+    #: Forks that are neither deleted nor registrations
+    fork_count = fields.IntegerField(default=0)
+    #: Registrations, including deleted ones
+    registration_count = fields.IntegerField(default=0)
+    #: Nodes created from this one as a template that are not deleted
+    templated_count = fields.IntegerField(default=0)
+    #: Users watching this node
+    watched_count = fields.IntegerField(default=0)
+    #: Pointers to this node from nodes that are neither folders nor deleted
+    pointed_count = fields.IntegerField(default=0)
+
     piwik_site_id = fields.StringField()
 
     # Dictionary field mapping user id to a list of nodes in node.nodes which the user has subscriptions for
@@ -724,6 +849,31 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     def pk(self):
         return self._id
 
+    COUNTER_FIELDS = (
+        'fork_count',
+        'registration_count',
+        'templated_count',
+        'watched_count',
+        'pointed_count',
+    )
+
+    def increment_counters(self, **amounts):
+        """Atomically add `amounts`, keyed by field name, to counters of this
+        node. The in-memory copy is updated to match without marking the
+        counters as changed, so that a later `save` doesn't overwrite them.
+        """
+        self._storage[0].store.update({'_id': self._id}, {'$inc': amounts})
+        cached_data = self._get_cached_data(self._id)
+        for field, amount in amounts.items():
+            setattr(self, field, (getattr(self, field) or 0) + amount)
+            if cached_data is not None:
+                cached_data[field] = (cached_data.get(field) or 0) + amount
+
+    def _clear_counters(self):
+        # Counters are copied by `clone`
+        for field in self.COUNTER_FIELDS:
+            setattr(self, field, 0)
+
     @property
     def license(self):
         node_license = self.node_license
@@ -883,22 +1033,10 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
                 yield contrib
 
     def is_admin_parent(self, user):
-        if self.has_permission(user, 'admin', check_parent=False):
-            return True
-        if self.parent_node:
-            return self.parent_node.is_admin_parent(user)
-        return False
+        return get_resolver().is_admin_parent(self, user)
 
     def can_view(self, auth):
-        if not auth and not self.is_public:
-            return False
-
-        return (
-            self.is_public or
-            (auth.user and self.has_permission(auth.user, 'read')) or
-            auth.private_key in self.private_link_keys_active or
-            self.is_admin_parent(auth.user)
-        )
+        return get_resolver().can_view(self, auth)
 
     def is_expanded(self, user=None):
         """Return if a user is has expanded the folder in the dashboard view.
@@ -1002,14 +1140,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         :param str permission: Required permission
         :returns: User has required permission
         """
-        if user is None:
-            logger.warn('User is ``None``.')
-            return False
-        if permission in self.permissions.get(user._id, []):
-            return True
-        if permission == 'read' and check_parent:
-            return self.is_admin_parent(user)
-        return False
+        return get_resolver().has_permission(self, user, permission, check_parent=check_parent)
 
     def has_permission_on_children(self, user, permission):
         """Checks if the given user has a given permission on any child nodes
@@ -1017,14 +1148,19 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         """
         if self.has_permission(user, permission):
             return True
-
-        for node in self.nodes:
-            if not node.primary or node.is_deleted:
-                continue
-
-            if node.has_permission_on_children(user, permission):
+        if not self.nodes:
+            return False
+        subtree = NodeSubtree(self)
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            children = [
+                child for child in subtree.children(node)
+                if child.primary and not child.is_deleted
+            ]
+            if any(child.has_permission(user, permission) for child in children):
                 return True
-
+            stack.extend(children)
         return False
 
     def has_addon_on_children(self, addon):
@@ -1064,11 +1200,52 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             for _id in self.visible_contributor_ids
         ]
 
+    @property
+    def ancestor_nodes(self):
+        """All ancestors of this node, root first, including deleted ones.
+        """
+        # Components not yet migrated by migrate_node_ancestors.py have no
+        # `ancestors`; find them through the parents
+        if not self.ancestors and self.node__parent:
+            parent = self.node__parent[0]
+            return parent.ancestor_nodes + [parent]
+        _load_uncached(Node, self.ancestors)
+        ancestors = [Node.load(each) for each in self.ancestors]
+        return [each for each in ancestors if each is not None]
+
     @property
     def parents(self):
-        if self.parent_node:
-            return [self.parent_node] + self.parent_node.parents
-        return []
+        """Ancestors of this node, nearest first, up to the first deleted one.
+        """
+        parents = []
+        for ancestor in reversed(self.ancestor_nodes):
+            if ancestor.is_deleted:
+                break
+            parents.append(ancestor)
+        return parents
+
+    def update_child_ancestors(self):
+        """Set the `ancestors` of this node's primary children from its own.
+        Children whose ancestors change are saved, which in turn updates their
+        own children.
+        """
+        lineage = [each._id for each in self.ancestor_nodes] + [self._id]
+        # Find the children to update with one query, without loading
+        # pointers or children that are up to date
+        child_ids = [key for key, schema in self.nodes._to_data() if schema == Node._name]
+        if not child_ids:
+            return
+        stale_ids = [
+            record['_id'] for record in Node._storage[0].store.find(
+                {'_id': {'$in': child_ids}, 'ancestors': {'$ne': lineage}},
+                {'_id': True}
+            )
+        ]
+        for child_id in stale_ids:
+            child = Node.load(child_id)
+            if list(child.ancestors) != lineage:
+                child.ancestors = lineage
+                child.save(update_piwik=False)
 
     @property
     def admin_contributor_ids(self, contributors=None):
@@ -1264,12 +1441,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
         first_save = not self._is_loaded
 
-        if first_save and self.is_dashboard:
-            existing_dashboards = self.creator.node__contributed.find(
-                Q('is_dashboard', 'eq', True)
-            )
-            if existing_dashboards.count() > 0:
-                raise NodeStateError("Only one dashboard allowed per user.")
+        if first_save and self.is_dashboard and self.creator.dashboard_id:
+            raise NodeStateError("Only one dashboard allowed per user.")
 
         is_original = not self.is_registration and not self.is_fork
         if 'suppress_log' in kwargs.keys():
@@ -1278,7 +1451,21 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         else:
             suppress_log = False
 
+        if first_save and getattr(self, 'parent', None):
+            self.ancestors = [each._id for each in self.parent.ancestor_nodes] + [self.parent._id]
+
+        self.tag_keys = [key.lower() for key in self.tags._to_primary_keys()]
+
         saved_fields = super(Node, self).save(*args, **kwargs)
+        clear_resolver()
+        DashboardCacheEntry.invalidate_for_node(self, saved_fields)
+
+        if 'nodes' in saved_fields or 'ancestors' in saved_fields:
+            self.update_child_ancestors()
+
+        if first_save and self.is_dashboard:
+            self.creator.dashboard_id = self._id
+            self.creator.save()
 
         if first_save and is_original and not suppress_log:
             # TODO: This logic also exists in self.use_as_template()
@@ -1318,6 +1505,10 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         if need_update:
             self.update_search()
 
+        if ConferenceSubmission.NODE_FIELDS.intersection(saved_fields):
+            if self.tags or not first_save:
+                ConferenceSubmission.update_node(self)
+
         if 'node_license' in saved_fields:
             children = [c for c in self.get_descendants_recursive(
                 include=lambda n: n.node_license is None
@@ -1326,9 +1517,10 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             if children:
                 Node.bulk_update_search(children)
 
-        # This method checks what has changed.
-        if settings.PIWIK_HOST and update_piwik:
-            piwik_tasks.update_node(self._id, saved_fields)
+        # Only provisioning and access changes need a sync
+        if settings.PIWIK_HOST and update_piwik and (
+                not self.piwik_site_id or self.PIWIK_UPDATE_FIELDS.intersection(saved_fields)):
+            piwik_tasks.update_node(self._id)
 
         # Return expected value for StoredObject::save
         return saved_fields
@@ -1356,6 +1548,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             attributes = dict()
 
         new = self.clone()
+        new.ancestors = []
+        new._clear_counters()
 
         # clear permissions, which are not cleared by the clone method
         new.permissions = {}
@@ -1397,6 +1591,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         )
 
         new.save(suppress_log=True)
+        self.increment_counters(templated_count=1)
 
         # Log the creation
         new.add_log(
@@ -1426,6 +1621,11 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             for x in self.nodes
             if x.can_view(auth)
         ]
+        new.pointer_node_ids = [
+            x.node._id
+            for x in new.nodes
+            if not x.primary
+        ]
 
         new.save()
         return new
@@ -1469,6 +1669,9 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         pointer = Pointer(node=node)
         pointer.save()
         self.nodes.append(pointer)
+        self.pointer_node_ids.append(node._id)
+        if not self.is_folder:
+            node.increment_counters(pointed_count=1)
 
         # Add log
         self.add_log(
@@ -1491,6 +1694,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         if save:
             self.save()
 
+        project_signals.pointer_added.send(self, pointer=pointer)
         return pointer
 
     def rm_pointer(self, pointer, auth):
@@ -1505,6 +1709,11 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         # Remove `Pointer` object; will also remove self from `nodes` list of
         # parent node
         Pointer.remove_one(pointer)
+        if pointer.node._id in self.pointer_node_ids:
+            self.pointer_node_ids.remove(pointer.node._id)
+        if not self.is_folder:
+            pointer.node.increment_counters(pointed_count=-1)
+        project_signals.pointer_removed.send(self, pointer=pointer)
 
         # Add log
         self.add_log(
@@ -1549,35 +1758,30 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     def depth(self):
         return len(self.parents)
 
-    def next_descendants(self, auth, condition=lambda auth, node: True):
+    def next_descendants(self, auth, condition=lambda auth, node: True, subtree=None):
         """
         Recursively find the first set of descedants under a given node that meet a given condition
 
         returns a list of [(node, [children]), ...]
         """
+        subtree = subtree or NodeSubtree(self)
         ret = []
-        for node in self.nodes:
+        for node in subtree.children(self):
             if condition(auth, node):
                 # base case
                 ret.append((node, []))
+            elif node.primary:
+                ret.append((node, node.next_descendants(auth, condition, subtree=subtree)))
             else:
                 ret.append((node, node.next_descendants(auth, condition)))
         ret = [item for item in ret if item[1] or condition(auth, item[0])]  # prune empty branches
         return ret
 
     def get_descendants_recursive(self, include=lambda n: True):
-        for node in self.nodes:
-            if include(node):
-                yield node
-            if node.primary:
-                for descendant in node.get_descendants_recursive(include):
-                    if include(descendant):
-                        yield descendant
+        return NodeSubtree(self).iter_descendants(include)
 
     def get_aggregate_logs_queryset(self, auth):
-        ids = [self._id] + [n._id
-                            for n in self.get_descendants_recursive()
-                            if n.can_view(auth)]
+        ids = [self._id] + [n._id for n in filter_viewable(self.get_descendants_recursive(), auth)]
         query = Q('__backrefs.logged.node.logs', 'in', ids) & Q('should_hide', 'ne', True)
         return NodeLog.find(query).sort('-_id')
 
@@ -1605,6 +1809,12 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
     def pointed(self):
         return getattr(self, '_pointed', [])
 
+    def has_pointer_to(self, node_id):
+        """Whether one of the pointers in `nodes` points to the node with ID
+        `node_id`; unlike `pointing_at`, doesn't load the pointers.
+        """
+        return node_id in self.pointer_node_ids
+
     def pointing_at(self, pointed_node_id):
         """This node is pointed at another node.
 
@@ -1660,6 +1870,10 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             raise ValueError('Could not fork node')
 
         self.nodes[index] = forked
+        if node._id in self.pointer_node_ids:
+            self.pointer_node_ids.remove(node._id)
+        if not self.is_folder:
+            node.increment_counters(pointed_count=-1)
 
         # Add log
         self.add_log(
@@ -1861,6 +2075,15 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         self.deleted_date = date
         self.save()
 
+        # Deleted nodes no longer count as forks, templated nodes or pointers
+        if self.is_fork and not self.is_registration:
+            self.forked_from.increment_counters(fork_count=-1)
+        if self.template_node:
+            self.template_node.increment_counters(templated_count=-1)
+        if not self.is_folder:
+            for pointer in self.nodes_pointer:
+                pointer.node.increment_counters(pointed_count=-1)
+
         auth_signals.node_deleted.send(self)
 
         return True
@@ -1891,6 +2114,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         # the cloned node must pass itself to its wiki objects to build the
         # correct URLs to that content.
         forked = original.clone()
+        forked.ancestors = []
+        forked._clear_counters()
 
         forked.logs = self.logs
         forked.tags = self.tags
@@ -1942,6 +2167,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         )
 
         forked.save()
+        original.increment_counters(fork_count=1)
         # After fork callback
         for addon in original.get_addons():
             _, message = addon.after_fork(original, forked, user)
@@ -1984,6 +2210,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             raise NodeStateError('Cannot register deleted node.')
 
         registered = original.clone()
+        registered.ancestors = []
+        registered._clear_counters()
 
         registered.is_registration = True
         registered.registered_date = when
@@ -2003,6 +2231,7 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         registered.node_license = original.license.copy() if original.license else None
 
         registered.save()
+        original.increment_counters(registration_count=1)
 
         if parent:
             registered.parent_node = parent
@@ -2207,10 +2436,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
 
     @property
     def root(self):
-        if self.parent_node:
-            return self.parent_node.root
-        else:
-            return self
+        parents = self.parents
+        return parents[-1] if parents else self
 
     @property
     def archiving(self):
@@ -2812,11 +3039,13 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
         :param content: A string, the posted content.
         :param auth: All the auth information including user, API key.
         """
+        from website.addons.wiki import versions as wiki_versions
         from website.addons.wiki.model import NodeWikiPage
 
         name = (name or '').strip()
         key = to_mongo_key(name)
 
+        current = None
         if key not in self.wiki_pages_current:
             if key in self.wiki_pages_versions:
                 version = len(self.wiki_pages_versions[key]) + 1
@@ -2837,6 +3066,8 @@ class Node(GuidStoredObject, AddonModelMixin, IdentifierMixin):
             content=content
         )
         new_page.save()
+        if current:
+            wiki_versions.compress(current, new_page)
 
         # check if the wiki page already exists in versions (existed once and is now deleted)
         if key not in self.wiki_pages_versions:
@@ -3177,6 +3408,11 @@ class PrivateLink(StoredObject):
         node_ids = [node._id for node in self.nodes]
         return node_ids
 
+    def save(self, *args, **kwargs):
+        rv = super(PrivateLink, self).save(*args, **kwargs)
+        clear_resolver()
+        return rv
+
     def node_scale(self, node):
         # node may be None if previous node's parent is deleted
         if node is None or node.parent_id not in self.node_ids:
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Request-scoped resolution of effective node permissions.
+
+Checking whether a user can view a node walks up its ancestors, since admins
+of a parent can read all of its children, and collects the node's active
+view-only link keys. A `PermissionResolver` attached to the current request
+remembers each node's parent and link keys, so that the many checks made
+while serving a request share one walk of each ancestor chain. Permissions
+themselves are always read from the nodes, so unsaved changes are honored.
+
+Outside of a request, `get_resolver` returns a new resolver on every call
+and nothing is cached.
+"""
+
+import logging
+
+from flask import g
+
+from website.util.permissions import READ, ADMIN
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionResolver(object):
+
+    def __init__(self):
+        self.parents = {}
+        self.link_keys = {}
+        #: Number of permission checks made, for instrumentation
+        self.checks = 0
+
+    def clear(self):
+        """Forget cached parents and link keys, e.g. after a node or private
+        link is saved.
+        """
+        self.parents.clear()
+        self.link_keys.clear()
+
+    def get_parent(self, node):
+        try:
+            return self.parents[node._id]
+        except KeyError:
+            parent = self.parents[node._id] = node.parent_node
+            return parent
+
+    def get_lineage(self, node):
+        """Return `node` followed by its ancestors, nearest first."""
+        lineage = []
+        while node is not None:
+            lineage.append(node)
+            node = self.get_parent(node)
+        return lineage
+
+    def get_private_link_keys(self, node):
+        try:
+            return self.link_keys[node._id]
+        except KeyError:
+            keys = self.link_keys[node._id] = frozenset(node.private_link_keys_active)
+            return keys
+
+    def _is_admin_parent(self, node, user, memo):
+        """Check whether `user` is an admin on `node` or any of its
+        ancestors. Results are stored in `memo` for every node visited, so
+        that siblings checked with the same memo share the walk.
+        """
+        visited = []
+        result = False
+        for each in self.get_lineage(node):
+            if each._id in memo:
+                result = memo[each._id]
+                break
+            visited.append(each)
+            if ADMIN in each.permissions.get(user._id, []):
+                result = True
+                break
+        for each in visited:
+            memo[each._id] = result
+        return result
+
+    def is_admin_parent(self, node, user):
+        self.checks += 1
+        if user is None:
+            return False
+        return self._is_admin_parent(node, user, {})
+
+    def has_permission(self, node, user, permission, check_parent=True):
+        self.checks += 1
+        if user is None:
+            logger.warn('User is ``None``.')
+            return False
+        if permission in node.permissions.get(user._id, []):
+            return True
+        if permission == READ and check_parent:
+            return self._is_admin_parent(node, user, {})
+        return False
+
+    def _can_view(self, node, auth, memo):
+        self.checks += 1
+        if node.is_public:
+            return True
+        if not auth:
+            return False
+        user = auth.user
+        return (
+            (user is not None and READ in node.permissions.get(user._id, [])) or
+            auth.private_key in self.get_private_link_keys(node) or
+            (user is not None and self._is_admin_parent(node, user, memo))
+        )
+
+    def can_view(self, node, auth):
+        return self._can_view(node, auth, {})
+
+    def filter_viewable(self, nodes, auth):
+        """Return the nodes in `nodes` that `auth` can view."""
+        memo = {}
+        return [node for node in nodes if self._can_view(node, auth, memo)]
+
+    def get_permissions(self, nodes, user):
+        """Return the effective permissions of `user` on each of `nodes`,
+        including read access inherited from an admin ancestor.
+
+        :return dict: Sets of permissions keyed by node ID
+        """
+        memo = {}
+        permissions = {}
+        for node in nodes:
+            self.checks += 1
+            granted = set(node.permissions.get(user._id, []))
+            if READ not in granted and self._is_admin_parent(node, user, memo):
+                granted.add(READ)
+            permissions[node._id] = granted
+        return permissions
+
+
+def get_resolver():
+    """Return the resolver of the current request, or a new one outside of a
+    request.
+    """
+    try:
+        return g._permission_resolver
+    except (AttributeError, RuntimeError):
+        return PermissionResolver()
+
+
+def clear_resolver():
+    try:
+        g._permission_resolver.clear()
+    except (AttributeError, RuntimeError):
+        pass
+
+
+def filter_viewable(nodes, auth):
+    return get_resolver().filter_viewable(nodes, auth)
+
+
+def resolver_before_request():
+    g._permission_resolver = PermissionResolver()
+
+
+def resolver_teardown_request(error=None):
+    resolver = getattr(g, '_permission_resolver', None)
+    if resolver is None:
+        return
+    del g._permission_resolver
+    logger.debug('{0} permission check(s) in request'.format(resolver.checks))
+
+
+handlers = {
+    'before_request': resolver_before_request,
+    'teardown_request': resolver_teardown_request,
+}
@@ -4,6 +4,8 @@ signals = blinker.Namespace()
 contributor_added = signals.signal('contributor-added')
 contributor_removed = signals.signal('contributor-removed')
 unreg_contributor_added = signals.signal('unreg-contributor-added')
+pointer_added = signals.signal('pointer-added')
+pointer_removed = signals.signal('pointer-removed')
 write_permissions_revoked = signals.signal('write-permissions-revoked')
 
 after_create_registration = signals.signal('post-create-registration')
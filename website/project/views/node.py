@@ -32,6 +32,7 @@ from website.project.decorators import (
 from website.tokens import process_token_or_pass
 from website.util.permissions import ADMIN, READ, WRITE
 from website.util.rubeus import collect_addon_js
+from website.addons.base import hooks as addon_hooks
 from website.project.model import has_anonymous_link, get_pointer_parent, NodeUpdateError, validate_title
 from website.project.forms import NewNodeForm
 from website.models import Node, Pointer, WatchConfig, PrivateLink
@@ -518,7 +519,7 @@ def watch_post(auth, node, **kwargs):
 
     return {
         'status': 'success',
-        'watchCount': len(node.watchconfig__watched)
+        'watchCount': node.watched_count
     }
 
 
@@ -537,7 +538,7 @@ def unwatch_post(auth, node, **kwargs):
 
     return {
         'status': 'success',
-        'watchCount': len(node.watchconfig__watched)
+        'watchCount': node.watched_count
     }
 
 
@@ -565,7 +566,7 @@ def togglewatch_post(auth, node, **kwargs):
 
     return {
         'status': 'success',
-        'watchCount': len(node.watchconfig__watched),
+        'watchCount': node.watched_count,
         'watched': user.is_watching(node)
     }
 
@@ -706,7 +707,7 @@ def _view_project(node, auth, primary=False):
     if user:
         dashboard = find_dashboard(user)
         dashboard_id = dashboard._id
-        in_dashboard = dashboard.pointing_at(node._primary_key) is not None
+        in_dashboard = dashboard.has_pointer_to(node._primary_key)
     else:
         in_dashboard = False
         dashboard_id = ''
@@ -717,10 +718,8 @@ def _view_project(node, auth, primary=False):
 
     # Before page load callback; skip if not primary call
     if primary:
-        for addon in node.get_addons():
-            messages = addon.before_page_load(node, user) or []
-            for message in messages:
-                status.push_status_message(message, kind='info', dismissible=False, trust=True)
+        for message in addon_hooks.before_page_load(node, user):
+            status.push_status_message(message, kind='info', dismissible=False, trust=True)
     data = {
         'node': {
             'id': node._primary_key,
@@ -760,18 +759,18 @@ def _view_project(node, auth, primary=False):
                 }
                 for meta in node.registered_meta or []
             ],
-            'registration_count': len(node.node__registrations),
+            'registration_count': node.registration_count,
             'is_fork': node.is_fork,
             'forked_from_id': node.forked_from._primary_key if node.is_fork else '',
             'forked_from_display_absolute_url': node.forked_from.display_absolute_url if node.is_fork else '',
             'forked_date': iso8601format(node.forked_date) if node.is_fork else '',
-            'fork_count': len(node.forks),
-            'templated_count': len(node.templated_list),
-            'watched_count': len(node.watchconfig__watched),
+            'fork_count': node.fork_count,
+            'templated_count': node.templated_count,
+            'watched_count': node.watched_count,
             'private_links': [x.to_json() for x in node.private_links_active],
             'link': view_only_link,
             'anonymous': anonymous,
-            'points': len(node.get_points(deleted=False, folders=False)),
+            'points': node.pointed_count,
             'piwik_site_id': node.piwik_site_id,
             'comment_level': node.comment_level,
             'has_comments': bool(getattr(node, 'commented', [])),
@@ -5,6 +5,7 @@ from modularodm.exceptions import ValidationError
 
 from framework.auth.decorators import collect_auth
 from website.project.model import Tag
+from website.project.resolver import filter_viewable
 from website.project.decorators import (
     must_be_valid_project, must_have_permission, must_not_be_registration
 )
@@ -16,7 +17,7 @@ from website.project.decorators import (
 def project_tag(tag, auth, **kwargs):
     tag_obj = Tag.load(tag)
     nodes = tag_obj.node__tagged if tag_obj else []
-    visible_nodes = [obj for obj in nodes if obj.can_view(auth)]
+    visible_nodes = filter_viewable(nodes, auth)
     return {
         'nodes': [
             {
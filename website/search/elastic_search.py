@@ -5,6 +5,7 @@ from __future__ import division
 import re
 import copy
 import math
+import time
 import logging
 import unicodedata
 import functools
@@ -21,13 +22,14 @@ from elasticsearch import (
 )
 
 from framework import sentry
+from framework.cache import LRUCache
 from framework.tasks import app as celery_app
 
 from website import settings
 from website.filters import gravatar
 from website.models import User, Node
 from website.search import exceptions
-from website.search.util import build_query
+from website.search.util import build_query_string
 from website.util import sanitize
 from website.views import validate_page_num
 from website.project.licenses import serialize_node_license_record
@@ -51,8 +53,49 @@ NOT_ANALYZED_PROPERTY = {'type': 'string', 'index': 'not_analyzed'}
 # Perform stemming on the field it's applied to.
 ENGLISH_ANALYZER_PROPERTY = {'type': 'string', 'analyzer': 'english'}
 
+# Index the edge n-grams of each word (e.g. "j", "jo", "joh", "john"), so
+# that prefixes are matched with a term lookup; search terms are only
+# lower-cased and folded to ASCII.
+INDEX_SETTINGS = {
+    'analysis': {
+        'filter': {
+            'autocomplete_filter': {
+                'type': 'edgeNGram',
+                'min_gram': 1,
+                'max_gram': 20,
+            },
+        },
+        'analyzer': {
+            'autocomplete': {
+                'type': 'custom',
+                'tokenizer': 'standard',
+                'filter': ['lowercase', 'asciifolding', 'autocomplete_filter'],
+            },
+            'autocomplete_search': {
+                'type': 'custom',
+                'tokenizer': 'standard',
+                'filter': ['lowercase', 'asciifolding'],
+            },
+        },
+    },
+}
+
+AUTOCOMPLETE_PROPERTY = {
+    'type': 'string',
+    'index_analyzer': 'autocomplete',
+    'search_analyzer': 'autocomplete_search',
+}
+
 INDEX = settings.ELASTIC_INDEX
 
+# Contributed node IDs and the time they were loaded, by user ID; see
+# `get_contributed_node_ids`
+_contributed_cache = LRUCache(settings.CONTRIBUTOR_SEARCH_CACHE_SIZE)
+
+# Indices known to have the field searched by `search_contributor`; see
+# `has_autocomplete_field`
+_autocomplete_indices = set()
+
 try:
     es = Elasticsearch(
         settings.ELASTIC_URI,
@@ -270,10 +313,58 @@ def update_node_async(self, node_id, index=None, bulk=False):
     except Exception as exc:
         self.retry(exc=exc)
 
+def serialize_node(node, category, parent_id=None):
+    """Return the search document of a public `node`."""
+    from website.addons.wiki.model import NodeWikiPage
+
+    try:
+        normalized_title = six.u(node.title)
+    except TypeError:
+        normalized_title = node.title
+    normalized_title = unicodedata.normalize('NFKD', normalized_title).encode('ascii', 'ignore')
+
+    elastic_document = {
+        'id': node._id,
+        'contributors': [
+            {
+                'fullname': x.fullname,
+                'url': x.profile_url if x.is_active else None
+            }
+            for x in node.visible_contributors
+            if x is not None
+        ],
+        'title': node.title,
+        'normalized_title': normalized_title,
+        'category': category,
+        'public': node.is_public,
+        'tags': [tag._id for tag in node.tags if tag],
+        'description': node.description,
+        'url': node.url,
+        'is_registration': node.is_registration,
+        'is_pending_registration': node.is_pending_registration,
+        'is_retracted': node.is_retracted,
+        'is_pending_retraction': node.is_pending_retraction,
+        'embargo_end_date': node.embargo_end_date.strftime("%A, %b. %d, %Y") if node.embargo_end_date else False,
+        'is_pending_embargo': node.is_pending_embargo,
+        'registered_date': node.registered_date,
+        'wikis': {},
+        'parent_id': parent_id,
+        'date_created': node.date_created,
+        'license': serialize_node_license_record(node.license),
+        'boost': int(not node.is_registration) + 1,  # This is for making registered projects less relevant
+    }
+    if not node.is_retracted:
+        for wiki in [
+            NodeWikiPage.load(x)
+            for x in node.wiki_pages_current.values()
+        ]:
+            elastic_document['wikis'][wiki.page_name] = wiki.raw_text(node)
+    return elastic_document
+
+
 @requires_search
 def update_node(node, index=None, bulk=False):
     index = index or INDEX
-    from website.addons.wiki.model import NodeWikiPage
 
     category = get_doctype_from_node(node)
 
@@ -296,49 +387,7 @@ def update_node(node, index=None, bulk=False):
     if node.is_deleted or not node.is_public or node.archiving:
         delete_doc(elastic_document_id, node)
     else:
-        try:
-            normalized_title = six.u(node.title)
-        except TypeError:
-            normalized_title = node.title
-        normalized_title = unicodedata.normalize('NFKD', normalized_title).encode('ascii', 'ignore')
-
-        elastic_document = {
-            'id': elastic_document_id,
-            'contributors': [
-                {
-                    'fullname': x.fullname,
-                    'url': x.profile_url if x.is_active else None
-                }
-                for x in node.visible_contributors
-                if x is not None
-            ],
-            'title': node.title,
-            'normalized_title': normalized_title,
-            'category': category,
-            'public': node.is_public,
-            'tags': [tag._id for tag in node.tags if tag],
-            'description': node.description,
-            'url': node.url,
-            'is_registration': node.is_registration,
-            'is_pending_registration': node.is_pending_registration,
-            'is_retracted': node.is_retracted,
-            'is_pending_retraction': node.is_pending_retraction,
-            'embargo_end_date': node.embargo_end_date.strftime("%A, %b. %d, %Y") if node.embargo_end_date else False,
-            'is_pending_embargo': node.is_pending_embargo,
-            'registered_date': node.registered_date,
-            'wikis': {},
-            'parent_id': parent_id,
-            'date_created': node.date_created,
-            'license': serialize_node_license_record(node.license),
-            'boost': int(not node.is_registration) + 1,  # This is for making registered projects less relevant
-        }
-        if not node.is_retracted:
-            for wiki in [
-                NodeWikiPage.load(x)
-                for x in node.wiki_pages_current.values()
-            ]:
-                elastic_document['wikis'][wiki.page_name] = wiki.raw_text(node)
-
+        elastic_document = serialize_node(node, category, parent_id)
         if bulk:
             return elastic_document
         else:
@@ -382,17 +431,8 @@ def serialize_contributors(node):
 bulk_update_contributors = functools.partial(bulk_update_nodes, serialize_contributors)
 
 
-@requires_search
-def update_user(user, index=None):
-
-    index = index or INDEX
-    if not user.is_active:
-        try:
-            es.delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
-        except NotFoundError:
-            pass
-        return
-
+def serialize_user(user):
+    """Return the search document of an active `user`."""
     names = dict(
         fullname=user.fullname,
         given_name=user.given_name,
@@ -410,7 +450,7 @@ def update_user(user, index=None):
                 pass  # This is fine, will only happen in 2.x if val is already unicode
             normalized_names[key] = unicodedata.normalize('NFKD', val).encode('ascii', 'ignore')
 
-    user_doc = {
+    return {
         'id': user._id,
         'user': user.fullname,
         'normalized_user': normalized_names['fullname'],
@@ -427,23 +467,22 @@ def update_user(user, index=None):
         'boost': 2,  # TODO(fabianvf): Probably should make this a constant or something
     }
 
-    es.index(index=index, doc_type='user', body=user_doc, id=user._id, refresh=True)
 
 @requires_search
-def update_file(file_, index=None, delete=False):
+def update_user(user, index=None):
 
     index = index or INDEX
-
-    if not file_.node.is_public or delete or file_.node.is_deleted or file_.node.archiving:
-        es.delete(
-            index=index,
-            doc_type='file',
-            id=file_._id,
-            refresh=True,
-            ignore=[404]
-        )
+    if not user.is_active:
+        try:
+            es.delete(index=index, doc_type='user', id=user._id, refresh=True, ignore=[404])
+        except NotFoundError:
+            pass
         return
 
+    es.index(index=index, doc_type='user', body=serialize_user(user), id=user._id, refresh=True)
+
+def serialize_file(file_):
+    """Return the search document of a file on a public node."""
     # We build URLs manually here so that this function can be
     # run outside of a Flask request context (e.g. in a celery task)
     file_deep_url = '/{node_id}/files/{provider}{path}/'.format(
@@ -454,7 +493,7 @@ def update_file(file_, index=None, delete=False):
     node_url = '/{node_id}/'.format(node_id=file_.node._id)
 
     parent_url = '/{}/'.format(file_.node.parent_node._id) if file_.node.parent_node else None,
-    file_doc = {
+    return {
         'id': file_._id,
         'deep_url': file_deep_url,
         'tags': [tag._id for tag in file_.tags],
@@ -467,10 +506,26 @@ def update_file(file_, index=None, delete=False):
         'is_registration': file_.node.is_registration,
     }
 
+
+@requires_search
+def update_file(file_, index=None, delete=False):
+
+    index = index or INDEX
+
+    if not file_.node.is_public or delete or file_.node.is_deleted or file_.node.archiving:
+        es.delete(
+            index=index,
+            doc_type='file',
+            id=file_._id,
+            refresh=True,
+            ignore=[404]
+        )
+        return
+
     es.index(
         index=index,
         doc_type='file',
-        body=file_doc,
+        body=serialize_file(file_),
         id=file_._id,
         refresh=True
     )
@@ -495,7 +550,7 @@ def create_index(index=None):
     project_like_types = ['project', 'component', 'registration']
     analyzed_fields = ['title', 'description']
 
-    es.indices.create(index, ignore=[400])  # HTTP 400 if index already exists
+    es.indices.create(index, body={'settings': INDEX_SETTINGS}, ignore=[400])  # HTTP 400 if index already exists
     for type_ in document_types:
         mapping = {
             'properties': {
@@ -533,6 +588,12 @@ def create_index(index=None):
                 },
             }
             mapping['properties'].update(fields)
+            mapping['properties']['normalized_user'] = {
+                'type': 'string',
+                'fields': {
+                    'autocomplete': AUTOCOMPLETE_PROPERTY,
+                },
+            }
         es.indices.put_mapping(index=index, doc_type=type_, body=mapping, ignore=[400, 404])
 
 @requires_search
@@ -542,11 +603,54 @@ def delete_doc(elastic_document_id, node, index=None, category=None):
     es.delete(index=index, doc_type=category, id=elastic_document_id, refresh=True, ignore=[404])
 
 
+def normalize(text):
+    try:
+        text = six.u(text)
+    except TypeError:
+        pass  # This is fine, will only happen in 2.x if text is already unicode
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore')
+
+
+def get_contributed_node_ids(user):
+    """Return the IDs of the nodes `user` contributes to, cached for
+    `CONTRIBUTOR_SEARCH_CACHE_TTL` seconds.
+    """
+    entry = _contributed_cache.get(user._id)
+    if entry is None or time.time() - entry[0] > settings.CONTRIBUTOR_SEARCH_CACHE_TTL:
+        entry = (time.time(), frozenset(user.node__contributed._to_primary_keys()))
+        _contributed_cache.set(user._id, entry)
+    return entry[1]
+
+
+def has_autocomplete_field(index):
+    """Whether the user mapping of `index` has ``normalized_user.autocomplete``,
+    which indices created before the field was added lack until they are
+    rebuilt. Only indices that have it are remembered, so that rebuilt
+    indices are picked up.
+    """
+    if index not in _autocomplete_indices:
+        field = 'normalized_user.autocomplete'
+        mappings = es.indices.get_field_mapping(index=index, doc_type='user', field=field)
+        if not any(
+            each.get('mappings', {}).get('user', {}).get(field)
+            for each in mappings.values()
+        ):
+            return False
+        _autocomplete_indices.add(index)
+    return True
+
+
 @requires_search
 def search_contributor(query, page=0, size=10, exclude=None, current_user=None):
     """Search for contributors to add to a project using elastic search. Request must
     include JSON data with a "query" field.
 
+    Each word of the query matches the start of a word of a user's name,
+    using the edge n-grams of the ``normalized_user.autocomplete`` field, in
+    a single search request. Users are then loaded in one query. Indices
+    without that field, until they are rebuilt with ``inv migrate_search``,
+    are searched with the fuzzy wildcard query used before it.
+
     :param query: The substring of the username to search for
     :param page: For pagination, the page number to use for results
     :param size: For pagination, the number of results per page
@@ -558,41 +662,63 @@ def search_contributor(query, page=0, size=10, exclude=None, current_user=None):
 
     """
     start = (page * size)
-    items = re.split(r'[\s-]+', query)
+    items = [normalize(item) for item in re.split(r'[\s-]+', query) if item]
     exclude = exclude or []
-    normalized_items = []
-    for item in items:
-        try:
-            normalized_item = six.u(item)
-        except TypeError:
-            normalized_item = item
-        normalized_item = unicodedata.normalize('NFKD', normalized_item).encode('ascii', 'ignore')
-        normalized_items.append(normalized_item)
-    items = normalized_items
-
-    query = "  AND ".join('{}*~'.format(re.escape(item)) for item in items) + \
-            "".join(' NOT id:"{}"'.format(excluded._id) for excluded in exclude)
-
-    results = search(build_query(query, start=start, size=size), index=INDEX, doc_type='user')
-    docs = results['results']
-    pages = math.ceil(results['counts'].get('user', 0) / size)
+
+    if has_autocomplete_field(INDEX):
+        name_query = {
+            'match': {
+                'normalized_user.autocomplete': {
+                    'query': ' '.join(items),
+                    'operator': 'and',
+                },
+            },
+        }
+    else:
+        logger.warning('Index {0} has no autocomplete field; run inv migrate_search'.format(INDEX))
+        name_query = build_query_string(
+            ' AND '.join('{}*~'.format(re.escape(item)) for item in items)
+        )
+    body = {
+        'query': {
+            'filtered': {
+                'query': name_query,
+            },
+        },
+        'from': start,
+        'size': size,
+    }
+    excluded_ids = [excluded._id for excluded in exclude if excluded]
+    if excluded_ids:
+        body['query']['filtered']['filter'] = {'not': {'ids': {'values': excluded_ids}}}
+
+    results = es.search(index=INDEX, doc_type='user', body=body)
+    hits = results['hits']['hits']
+    total = results['hits']['total']
+    pages = math.ceil(total / size)
     validate_page_num(page, pages)
 
+    loaded = dict(
+        (user._id, user)
+        for user in User.find(Q('_id', 'in', [hit['_id'] for hit in hits]))
+    ) if hits else {}
+    current_node_ids = get_contributed_node_ids(current_user) if current_user else None
+
     users = []
-    for doc in docs:
+    for hit in hits:
         # TODO: use utils.serialize_user
-        user = User.load(doc['id'])
+        user = loaded.get(hit['_id'])
+        if user is None:
+            logger.error('Could not load user {0}'.format(hit['_id']))
+            continue
 
         if current_user and current_user._id == user._id:
             n_projects_in_common = -1
         elif current_user:
-            n_projects_in_common = current_user.n_projects_in_common(user)
+            n_projects_in_common = len(current_node_ids & get_contributed_node_ids(user))
         else:
             n_projects_in_common = 0
 
-        if user is None:
-            logger.error('Could not load user {0}'.format(doc['id']))
-            continue
         if user.is_active:  # exclude merged, unregistered, etc.
             current_employment = None
             education = None
@@ -604,8 +730,8 @@ def search_contributor(query, page=0, size=10, exclude=None, current_user=None):
                 education = user.schools[0]['institution']
 
             users.append({
-                'fullname': doc['user'],
-                'id': doc['id'],
+                'fullname': hit['_source']['user'],
+                'id': user._id,
                 'employment': current_employment,
                 'education': education,
                 'n_projects_in_common': n_projects_in_common,
@@ -622,7 +748,7 @@ def search_contributor(query, page=0, size=10, exclude=None, current_user=None):
 
     return {
         'users': users,
-        'total': results['counts']['total'],
+        'total': total,
         'pages': pages,
         'page': page,
     }
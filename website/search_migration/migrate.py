@@ -3,64 +3,339 @@
 '''Migration script for Search-enabled Models.'''
 from __future__ import absolute_import
 
+import time
 import logging
+import itertools
+import threading
+import collections
+import multiprocessing
 
+import pymongo
 from elasticsearch import helpers
 from modularodm.query.querydialect import DefaultQueryDialect as Q
 
 from website import settings
 from framework.auth import User
+from framework.mongo import database, handlers as mongo_handlers, StoredObject
 from website.models import Node
 from website.app import init_app
 import website.search.search as search
 from scripts import utils as script_utils
+from website.search import elastic_search as search_engine
 from website.search.elastic_search import es
 
 
 logger = logging.getLogger(__name__)
 
-def migrate_nodes(index):
-    logger.info("Migrating nodes to index: {}".format(index))
-    n_iter = 0
-    nodes = Node.find(Q('is_public', 'eq', True) & Q('is_deleted', 'eq', False))
-    for node in nodes:
-        search.update_node(node, index=index, async=False)
-        n_iter += 1
+# Tracks unfinished migrations by alias, so that they can be resumed
+PROGRESS_COLLECTION = 'searchmigration'
 
-    logger.info('Nodes migrated: {}'.format(n_iter))
+# Records serialized per task in the worker pool
+BATCH_SIZE = 500
+# Documents per bulk request, and bulk requests sent concurrently
+BULK_CHUNK_SIZE = 500
+BULK_THREADS = 4
 
+# Settings of the new index while it is built; `set_up_alias` restores the
+# original ones
+BUILD_SETTINGS = {
+    'refresh_interval': '-1',
+    'number_of_replicas': 0,
+}
 
-def migrate_users(index):
-    logger.info("Migrating users to index: {}".format(index))
-    n_migr = 0
-    n_iter = 0
-    for user in User.find():
-        if user.is_active:
-            search.update_user(user, index=index)
-            n_migr += 1
-        n_iter += 1
 
-    logger.info('Users iterated: {0}\nUsers migrated: {1}'.format(n_iter, n_migr))
+def stream_ids(collection, query, after=None, batch_size=BATCH_SIZE):
+    """Yield the IDs of the records of `collection` matching `query`, in
+    batches and in ID order, starting after the ID `after`.
+    """
+    while True:
+        page = query if after is None else {'$and': [query, {'_id': {'$gt': after}}]}
+        ids = [
+            record['_id'] for record in
+            collection.find(page, {'_id': True}).sort('_id', pymongo.ASCENDING).limit(batch_size)
+        ]
+        if not ids:
+            return
+        yield ids
+        after = ids[-1]
 
 
-def migrate(delete, index=None, app=None):
+def _action(index, doc_type, doc_id, document):
+    return {
+        '_index': index,
+        '_type': doc_type,
+        '_id': doc_id,
+        '_source': document,
+    }
+
+
+def serialize_nodes(args):
+    """Return the bulk actions indexing the nodes `node_ids` and their files.
+
+    :param tuple args: Index and node IDs
+    :return tuple: Last ID of the batch, number of IDs and actions
+    """
+    from website.files.models.base import FileNode
+
+    index, node_ids = args
+    actions = []
+    indexed = []
+    for node in Node.find(Q('_id', 'in', node_ids)):
+        if node.archiving:
+            continue
+        category = search_engine.get_doctype_from_node(node)
+        parent_id = None
+        if category != 'project':
+            try:
+                parent_id = node.parent_id
+            except IndexError:
+                # Skip orphaned components
+                continue
+        actions.append(_action(index, category, node._id, search_engine.serialize_node(node, category, parent_id)))
+        indexed.append(node._id)
+    if indexed:
+        files = FileNode.find(
+            Q('node', 'in', indexed) &
+            Q('provider', 'eq', 'osfstorage') &
+            Q('is_file', 'eq', True)
+        )
+        for file_ in files:
+            actions.append(_action(index, 'file', file_._id, search_engine.serialize_file(file_)))
+    StoredObject._clear_caches()
+    return node_ids[-1], len(node_ids), actions
+
+
+def serialize_users(args):
+    """Return the bulk actions indexing the active users among `user_ids`.
+
+    :param tuple args: Index and user IDs
+    :return tuple: Last ID of the batch, number of IDs and actions
+    """
+    index, user_ids = args
+    actions = [
+        _action(index, 'user', user._id, search_engine.serialize_user(user))
+        for user in User.find(Q('_id', 'in', user_ids))
+        if user.is_active
+    ]
+    StoredObject._clear_caches()
+    return user_ids[-1], len(user_ids), actions
+
+
+def _init_worker():
+    # Don't share the MongoDB connection of the parent process
+    mongo_handlers._mongo_client = mongo_handlers.get_mongo_client()
+
+
+class Backlog(object):
+    """Counts of the work done by each stage of `index_batches`, so that a
+    stage can wait while the next one is too far behind.
+    """
+
+    def __init__(self):
+        self.counts = collections.defaultdict(int)
+        self.stopped = False
+        self._condition = threading.Condition()
+
+    def add(self, key, count=1):
+        with self._condition:
+            self.counts[key] += count
+            self._condition.notify_all()
+
+    def wait(self, ahead, behind, limit):
+        """Wait until the count `ahead` is at most `limit` more than the
+        count `behind`.
+
+        :return bool: False if the backlog was stopped meanwhile
+        """
+        with self._condition:
+            while not self.stopped and self.counts[ahead] - self.counts[behind] > limit:
+                self._condition.wait(1)
+            return not self.stopped
+
+    def stop(self):
+        with self._condition:
+            self.stopped = True
+            self._condition.notify_all()
+
+
+def index_batches(progress, stage, id_batches, serialize, processes=None):
+    """Serialize batches of records in a pool of `processes` processes (all
+    CPUs by default, none if 0) and send the documents with a single
+    `parallel_bulk` call, which keeps `BULK_THREADS` bulk requests in flight.
+    `parallel_bulk` reads its actions as fast as they come, so serialization
+    waits while a few batches' worth of documents aren't indexed yet. The
+    last ID of each indexed batch is recorded in `progress`, so that an
+    interrupted migration can be resumed.
+
+    :return dict: Records read, documents indexed and seconds taken
+    """
+    pool = None
+    mapper = itertools.imap
+    if processes != 0:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker)
+        mapper = pool.imap
+    # Batches serialized ahead of the bulk requests
+    window = (processes or multiprocessing.cpu_count()) * 2
+    # Documents sent and not yet indexed; more than a chunk, so that waiting
+    # for them can't hold back the chunk being filled
+    limit = BULK_CHUNK_SIZE * BULK_THREADS * 2
+    backlog = Backlog()
+    # Batches sent, in order: (<documents sent up to the batch>, <last ID>,
+    # <number of IDs>)
+    sent = collections.deque()
+
+    def tasks():
+        for ids in id_batches:
+            if not backlog.wait('tasks', 'serialized', window):
+                return
+            backlog.add('tasks')
+            yield progress['new_index'], ids
+
+    def actions():
+        for last_id, count, batch in mapper(serialize, tasks()):
+            backlog.add('serialized')
+            if not backlog.wait('sent', 'indexed', limit):
+                return
+            backlog.add('sent', len(batch))
+            sent.append((backlog.counts['sent'], last_id, count))
+            for action in batch:
+                yield action
+
+    totals = {'records': 0, 'documents': 0}
+    start = time.time()
+
+    def flush():
+        """Record the batches whose documents are all indexed."""
+        while sent and sent[0][0] <= totals['documents']:
+            _, last_id, count = sent.popleft()
+            totals['records'] += count
+            save_progress(progress, stage, last_id)
+            elapsed = time.time() - start
+            logger.info('{0}: {1} records, {2} documents indexed ({3:.1f} records/s)'.format(
+                stage, totals['records'], totals['documents'],
+                totals['records'] / elapsed if elapsed else 0
+            ))
+
+    # Keep the generator referenced until the producers are released below
+    results = helpers.parallel_bulk(es, actions(), thread_count=BULK_THREADS, chunk_size=BULK_CHUNK_SIZE)
+    try:
+        for _ in results:
+            totals['documents'] += 1
+            backlog.add('indexed')
+            flush()
+        # Batches without documents at the end
+        flush()
+    finally:
+        # Release the producers, so that the pools can be shut down
+        backlog.stop()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    totals['seconds'] = time.time() - start
+    return totals
+
+
+def migrate_nodes(progress, processes=None, batch_size=BATCH_SIZE):
+    logger.info("Migrating nodes to index: {}".format(progress['new_index']))
+    id_batches = stream_ids(
+        Node._storage[0].store,
+        {'is_public': True, 'is_deleted': False},
+        after=progress.get('nodes'),
+        batch_size=batch_size,
+    )
+    stats = index_batches(progress, 'nodes', id_batches, serialize_nodes, processes=processes)
+    logger.info('Nodes migrated: {records} ({documents} documents) in {seconds:.1f}s'.format(**stats))
+    return stats
+
+
+def migrate_users(progress, processes=None, batch_size=BATCH_SIZE):
+    logger.info("Migrating users to index: {}".format(progress['new_index']))
+    id_batches = stream_ids(
+        User._storage[0].store,
+        {'is_registered': True},
+        after=progress.get('users'),
+        batch_size=batch_size,
+    )
+    stats = index_batches(progress, 'users', id_batches, serialize_users, processes=processes)
+    logger.info('Users iterated: {records}\nUsers migrated: {documents} in {seconds:.1f}s'.format(**stats))
+    return stats
+
+
+def get_progress(index):
+    return database[PROGRESS_COLLECTION].find_one({'_id': index})
+
+
+def save_progress(progress, stage, last_id):
+    progress[stage] = last_id
+    database[PROGRESS_COLLECTION].update({'_id': progress['_id']}, {'$set': {stage: last_id}})
+
+
+def migrate(delete, index=None, app=None, processes=None, resume=False, batch_size=BATCH_SIZE):
+    """Build a new version of `index` in bulk and point the alias `index`
+    at it.
+
+    :param bool delete: Delete the previous version
+    :param int processes: Worker processes serializing documents; all CPUs
+        by default, none if 0
+    :param bool resume: Continue the last unfinished migration of `index`
+        rather than starting a new one
+    :return dict: Throughput of each stage, see `index_batches`
+    """
     index = index or settings.ELASTIC_INDEX
     app = app or init_app("website.settings", set_backends=True, routes=True)
 
     script_utils.add_file_logger(logger, __file__)
     ctx = app.test_request_context()
     ctx.push()
-    new_index = set_up_index(index)
+    try:
+        return _migrate(delete, index, processes, resume, batch_size)
+    finally:
+        ctx.pop()
+
 
-    migrate_nodes(new_index)
-    migrate_users(new_index)
+def _migrate(delete, index, processes, resume, batch_size):
+    progress = get_progress(index) if resume else None
+    if progress is None:
+        new_index = set_up_index(index)
+        progress = {
+            '_id': index,
+            'new_index': new_index,
+            'index_settings': prepare_index(new_index),
+        }
+        database[PROGRESS_COLLECTION].save(progress)
+    else:
+        new_index = progress['new_index']
+        logger.info("Resuming migration to {0} after node {1} and user {2}".format(
+            new_index, progress.get('nodes'), progress.get('users')
+        ))
+
+    stats = {
+        'nodes': migrate_nodes(progress, processes=processes, batch_size=batch_size),
+        'users': migrate_users(progress, processes=processes, batch_size=batch_size),
+    }
 
-    set_up_alias(index, new_index)
+    set_up_alias(index, new_index, progress['index_settings'])
+    database[PROGRESS_COLLECTION].remove({'_id': index})
 
     if delete:
         delete_old(new_index)
 
-    ctx.pop()
+    return stats
+
+
+def prepare_index(index):
+    """Apply `BUILD_SETTINGS` to `index`, so that documents are neither
+    refreshed nor replicated while it is built.
+
+    :return dict: The settings replaced
+    """
+    current = es.indices.get_settings(index=index)[index]['settings']['index']
+    original = {
+        'refresh_interval': current.get('refresh_interval', '1s'),
+        'number_of_replicas': current.get('number_of_replicas', 1),
+    }
+    es.indices.put_settings(index=index, body={'index': BUILD_SETTINGS})
+    return original
 
 
 def set_up_index(idx):
@@ -85,7 +360,11 @@ def set_up_index(idx):
     return index
 
 
-def set_up_alias(old_index, index):
+def set_up_alias(old_index, index, index_settings=None):
+    if index_settings:
+        logger.info("Restoring settings of {0}: {1}".format(index, index_settings))
+        es.indices.put_settings(index=index, body={'index': index_settings})
+    es.indices.refresh(index=index)
     alias = es.indices.get_aliases(index=old_index)
     if alias:
         logger.info("Removing old aliases to {}".format(old_index))
@@ -106,4 +385,5 @@ def delete_old(index):
 
 
 if __name__ == '__main__':
-    migrate(False)
+    import sys
+    migrate('delete' in sys.argv, resume='resume' in sys.argv)
@@ -67,6 +67,10 @@ SEARCH_ENGINE = 'elastic'  # Can be 'elastic', or None
 ELASTIC_URI = 'localhost:9200'
 ELASTIC_TIMEOUT = 10
 ELASTIC_INDEX = 'website'
+# Contributor search caches the node IDs of each user it counts "projects in
+# common" for, per process, for the TTL (seconds)
+CONTRIBUTOR_SEARCH_CACHE_TTL = 300
+CONTRIBUTOR_SEARCH_CACHE_SIZE = 10000
 SHARE_ELASTIC_URI = ELASTIC_URI
 SHARE_ELASTIC_INDEX = 'share'
 # For old indices
@@ -82,6 +86,42 @@ SECRET_KEY = 'CHANGEME'
 # Change if using `scripts/cron.py` to manage crontab
 CRON_USER = None
 
+# Maximum number of `mod-meta` embeds rendered concurrently per page. Nested
+# views run in threads with a copy of the request context; keep at 1 while
+# requests rely on TokuMX transactions, which are bound to a connection.
+MOD_META_EMBED_WORKERS = 1
+
+# Addon `before_page_load` callbacks, which may call remote APIs, run in a
+# shared pool of this many threads; with 1, they run serially, and the
+# timeout (in seconds) applies to each of their remote requests instead.
+# Callbacks that take longer than the timeout (for all callbacks of a page)
+# are skipped; results are cached for the TTL (seconds).
+# Callbacks read models, so as with MOD_META_EMBED_WORKERS keep at 1 while
+# requests rely on TokuMX transactions and the request-keyed object cache.
+ADDON_HOOK_WORKERS = 1
+ADDON_HOOK_TIMEOUT = 2
+ADDON_HOOK_CACHE_TTL = 60
+ADDON_HOOK_CACHE_SIZE = 10000
+
+# Outbound HTTP from addons, see `website.addons.base.http_client`. Pools
+# keep up to ADDON_HTTP_POOL_SIZE connections per host. Failed requests are
+# retried up to ADDON_HTTP_RETRIES times, waiting ADDON_HTTP_BACKOFF seconds,
+# doubled after each attempt, or as long as the provider asks, up to
+# ADDON_HTTP_MAX_BACKOFF seconds. Rate limits are in requests per second per
+# process; providers without one are unlimited.
+ADDON_HTTP_POOL_CONNECTIONS = 10
+ADDON_HTTP_POOL_SIZE = 10
+ADDON_HTTP_RETRIES = 3
+ADDON_HTTP_BACKOFF = 0.5
+ADDON_HTTP_MAX_BACKOFF = 10
+ADDON_HTTP_CACHE_SIZE = 1000
+ADDON_HTTP_RATE_LIMITS = {
+    'waterbutler': 10,
+    'figshare': 10,
+    'mendeley': 10,
+    'zotero': 10,
+}
+
 # External services
 USE_CDN_FOR_CLIENT_LIBS = True
 
@@ -160,6 +200,9 @@ PROFILE_IMAGE_SMALL = 20
 
 # Conference options
 CONFERENCE_MIN_COUNT = 5
+# Default and maximum number of submissions per page, when a page of
+# submissions is requested
+CONFERENCE_SUBMISSIONS_PAGE_SIZE = 250
 
 WIKI_WHITELIST = {
     'tags': [
@@ -214,6 +257,15 @@ SYSTEM_ADDED_ADDONS = {
 PIWIK_HOST = None
 PIWIK_ADMIN_TOKEN = None
 PIWIK_SITE_ID = None
+# Node saves queue a Piwik access sync, run by a periodic task once the node
+# has been queued for the window; later saves are coalesced into it
+PIWIK_SYNC_WINDOW = timedelta(seconds=30)
+# Most nodes synced per run, and API calls per bulk request
+PIWIK_SYNC_BATCH_SIZE = 500
+PIWIK_BULK_SIZE = 100
+# Popular projects on the activity page are read from a snapshot of Piwik
+# data, refreshed at this interval
+ACTIVITY_SNAPSHOT_REFRESH_INTERVAL = timedelta(hours=1)
 
 SENTRY_DSN = None
 SENTRY_DSN_JS = None
@@ -227,6 +279,27 @@ ALL_MY_PROJECTS_ID = '-amp'
 ALL_MY_REGISTRATIONS_ID = '-amr'
 ALL_MY_PROJECTS_NAME = 'All my projects'
 ALL_MY_REGISTRATIONS_NAME = 'All my registrations'
+# Cache serialized project organizer data per user and folder
+DASHBOARD_CACHE_ENABLED = True
+DASHBOARD_CACHE_TTL = datetime.timedelta(hours=1)
+
+# Citations
+# Mendeley and Zotero libraries are cached and synced with the provider at
+# most once per TTL
+CITATION_CACHE_TTL = datetime.timedelta(minutes=1)
+# Citations per page in citation widgets, when a page is requested
+CITATION_PAGE_SIZE = 100
+# Compiled CSL styles kept per process for server-side rendering
+CITATION_STYLE_CACHE_SIZE = 50
+# Most nodes whose citations can be rendered in one request
+CITATION_RENDER_MAX_NODES = 100
+
+# GUIDs
+# Claim new GUIDs from a pool of pre-validated IDs, refilled by a periodic task
+GUID_POOL_ENABLED = True
+GUID_POOL_SIZE = 10000
+# Reload the in-memory filter of blacklisted GUIDs after this long
+GUID_BLACKLIST_FILTER_TTL = datetime.timedelta(hours=1)
 
 # FOR EMERGENCIES ONLY: Setting this to True will disable forks, registrations,
 # and uploads in order to save disk space.
@@ -235,6 +308,9 @@ DISK_SAVING_MODE = False
 # Seconds before another notification email can be sent to a contributor when added to a project
 CONTRIBUTOR_ADDED_EMAIL_THROTTLE = 24 * 3600
 
+# Number of users whose pending notifications are sent per batch
+NOTIFICATION_DIGEST_CHUNK_SIZE = 100
+
 # Google Analytics
 GOOGLE_ANALYTICS_ID = None
 GOOGLE_SITE_VERIFICATION = None
@@ -291,9 +367,11 @@ CELERY_IMPORTS = (
     'framework.tasks.signals',
     'framework.email.tasks',
     'framework.analytics.tasks',
+    'framework.guid.tasks',
     'website.mailchimp_utils',
     'website.notifications.tasks',
     'website.archiver.tasks',
+    'website.discovery.tasks',
     'website.search.search',
 )
 
@@ -315,6 +393,18 @@ else:
             'schedule': crontab(minute=0, hour=0),
             'args': ('email_digest',),
         },
+        'refill-guid-pool': {
+            'task': 'guid.refill_pool',
+            'schedule': crontab(minute='*'),
+        },
+        'sync-piwik': {
+            'task': 'piwik.sync_queued_nodes',
+            'schedule': crontab(minute='*'),
+        },
+        'refresh-activity-snapshot': {
+            'task': 'discovery.refresh_activity_snapshot',
+            'schedule': ACTIVITY_SNAPSHOT_REFRESH_INTERVAL,
+        },
     }
 
 WATERBUTLER_JWE_SALT = 'yusaltydough'
@@ -11,6 +11,11 @@ from framework.exceptions import HTTPError
 
 class BaseClient(object):
 
+    @property
+    def _session(self):
+        """Session or module used to send requests"""
+        return requests
+
     @property
     def _auth(self):
         return None
@@ -25,7 +30,7 @@ class BaseClient(object):
 
         kwargs['headers'] = self._build_headers(**kwargs.get('headers', {}))
 
-        response = requests.request(method, url, params=params, auth=self._auth, **kwargs)
+        response = self._session.request(method, url, params=params, auth=self._auth, **kwargs)
         if expects and response.status_code not in expects:
             raise throws if throws else HTTPError(response.status_code, message=response.content)
 
@@ -30,6 +30,7 @@ from website.project import model
 from website.util import web_url_for
 from website.util import permissions
 from website.project import new_dashboard
+from website.dashboard.model import DashboardCacheEntry
 from website.settings import ALL_MY_PROJECTS_ID
 from website.settings import ALL_MY_REGISTRATIONS_ID
 
@@ -110,34 +111,70 @@ def index(auth):
 
 
 def find_dashboard(user):
-    dashboard_folder = user.node__contributed.find(
-        Q('is_dashboard', 'eq', True)
-    )
-
-    if dashboard_folder.count() == 0:
-        new_dashboard(user)
-        dashboard_folder = user.node__contributed.find(
-            Q('is_dashboard', 'eq', True)
-        )
-    return dashboard_folder[0]
+    """Return the dashboard of `user`, creating it if needed."""
+    if user.dashboard_id:
+        dashboard = Node.load(user.dashboard_id)
+        if dashboard is not None:
+            return dashboard
+    # Users whose dashboard predates `dashboard_id`
+    dashboards = user.node__contributed.find(Q('is_dashboard', 'eq', True))
+    if dashboards.count():
+        dashboard = dashboards[0]
+        user.dashboard_id = dashboard._id
+        user.save()
+        return dashboard
+    if user.dashboard_id:
+        # The dashboard was removed; `new_dashboard` refuses to replace it
+        user.dashboard_id = None
+        user.save()
+    return new_dashboard(user)
+
+
+def _dashboard_node_ids(items, folder=None):
+    """Return the IDs of the nodes serialized in `items`, of their children
+    and of `folder`, i.e. the nodes whose changes affect the data.
+    """
+    node_ids = {
+        item['node_id']
+        for item in items
+        if not item.get('isSmartFolder')
+    }
+    for node in Node.find(Q('_id', 'in', list(node_ids))):
+        node_ids.update(node.node_ids)
+    if folder is not None:
+        node_ids.add(folder._id)
+    return node_ids
 
 
 @must_be_logged_in
 def get_dashboard(auth, nid=None, **kwargs):
     user = auth.user
-    if nid is None:
-        node = find_dashboard(user)
-        dashboard_projects = [rubeus.to_project_root(node, auth, **kwargs)]
-        return_value = {'data': dashboard_projects}
-    elif nid == ALL_MY_PROJECTS_ID:
-        return_value = {'data': get_all_projects_smart_folder(**kwargs)}
-    elif nid == ALL_MY_REGISTRATIONS_ID:
-        return_value = {'data': get_all_registrations_smart_folder(**kwargs)}
-    else:
-        node = Node.load(nid)
-        dashboard_projects = rubeus.to_project_hgrid(node, auth, **kwargs)
-        return_value = {'data': dashboard_projects}
-
+    folder = nid or 'root'
+    # View-only links can change what is visible; don't share their results
+    cacheable = not auth.private_key
+    data = DashboardCacheEntry.get_data(user, folder) if cacheable else None
+
+    if data is None:
+        node = None
+        smart = True
+        if nid is None:
+            node = find_dashboard(user)
+            data = [rubeus.to_project_root(node, auth, **kwargs)]
+            smart = False
+        elif nid == ALL_MY_PROJECTS_ID:
+            data = get_all_projects_smart_folder(**kwargs)
+        elif nid == ALL_MY_REGISTRATIONS_ID:
+            data = get_all_registrations_smart_folder(**kwargs)
+        else:
+            node = Node.load(nid)
+            data = rubeus.to_project_hgrid(node, auth, **kwargs)
+            # Only the dashboard lists the smart folders
+            smart = node.is_dashboard
+        # Archiving status is not tracked on the node; don't cache until done
+        if cacheable and not any(item.get('archiving') for item in data):
+            DashboardCacheEntry.set_data(user, folder, data, _dashboard_node_ids(data, node), smart=smart)
+
+    return_value = {'data': data}
     return_value['timezone'] = user.timezone
     return_value['locale'] = user.locale
     return_value['id'] = user._id